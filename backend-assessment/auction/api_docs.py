@@ -0,0 +1,233 @@
+"""Module implementing the OpenAPI schema, generated once and served with an ETag
+
+drf_yasg used to walk every view and build every swagger_auto_schema definition
+on each request for the schema, and was imported when the process started. Views
+now take openapi and swagger_auto_schema from here: the stand-ins only record the
+definitions, which are built with drf_yasg the first time the schema is needed.
+The schema is generated once per process, without a request (so without host
+and schemes, which clients take from the page), or read from API_SCHEMA['PATH']
+when manage.py generate_api_schema wrote it at build time. It is served as JSON
+or YAML with an ETag, so clients revalidate it with a 304 and no body.
+
+The Swagger UI and ReDoc pages are drf_yasg's, built on their first request;
+the schema they fetch from ?format=openapi is the stored one.
+"""
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from functools import partial
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition, require_safe
+
+DEFAULTS = {
+    'PATH': None,
+}
+
+FORMATS = {'.json': 'application/json', '.yaml': 'application/yaml'}
+OPENAPI_MEDIA_TYPE = 'application/openapi+json'
+
+
+def get_setting(name):
+    """Returns an API_SCHEMA setting, falling back to the defaults"""
+    return getattr(settings, 'API_SCHEMA', {}).get(name, DEFAULTS[name])
+
+
+class Deferred:
+    """A drf_yasg.openapi object to build when the schema is generated"""
+
+    def __init__(self, class_name, /, *args, **kwargs):
+        self.class_name = class_name
+        self.args = args
+        self.kwargs = kwargs
+
+    def build(self):
+        """Returns the drf_yasg.openapi object"""
+        from drf_yasg import openapi as yasg_openapi
+        return getattr(yasg_openapi, self.class_name)(*resolve(self.args), **resolve(self.kwargs))
+
+
+def resolve(value):
+    """Returns value with the Deferred objects in it built"""
+    if isinstance(value, Deferred):
+        return value.build()
+    if isinstance(value, dict):
+        return {key: resolve(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return type(value)(resolve(item) for item in value)
+    return value
+
+
+class LazyOpenAPI:
+    """Stand-in for drf_yasg.openapi: its constants, and classes returning Deferred objects"""
+
+    TYPE_OBJECT = 'object'
+    TYPE_STRING = 'string'
+    TYPE_NUMBER = 'number'
+    TYPE_INTEGER = 'integer'
+    TYPE_BOOLEAN = 'boolean'
+    TYPE_ARRAY = 'array'
+    TYPE_FILE = 'file'
+    FORMAT_DATE = 'date'
+    FORMAT_DATETIME = 'date-time'
+    FORMAT_DECIMAL = 'decimal'
+    FORMAT_URI = 'uri'
+    IN_BODY = 'body'
+    IN_PATH = 'path'
+    IN_QUERY = 'query'
+    IN_FORM = 'formData'
+    IN_HEADER = 'header'
+
+    def __getattr__(self, name):
+        if not name[:1].isupper():
+            raise AttributeError(name)
+        return partial(Deferred, name)
+
+
+openapi = LazyOpenAPI()
+
+INFO = openapi.Info(
+    title="Auction API",
+    default_version='v1',
+    description="API for a simple auction system",
+    terms_of_service="https://www.google.com/policies/terms/",
+    contact=openapi.Contact(email="contact@auction.local"),
+    license=openapi.License(name="BSD License"),
+)
+
+# Handlers decorated by swagger_auto_schema() whose definitions are not applied yet
+_pending = []
+_lock = threading.Lock()
+_document = None
+
+
+def swagger_auto_schema(**kwargs):
+    """Records drf_yasg's swagger_auto_schema() arguments for a view handler, applied when the schema is generated"""
+    def decorator(handler):
+        _pending.append((handler, kwargs))
+        return handler
+    return decorator
+
+
+def apply_pending():
+    """Applies the recorded swagger_auto_schema() definitions with drf_yasg"""
+    from drf_yasg.utils import swagger_auto_schema as yasg_swagger_auto_schema
+    while _pending:
+        handler, kwargs = _pending.pop(0)
+        yasg_swagger_auto_schema(**resolve(kwargs))(handler)
+
+
+def generate_schema():
+    """Walks the URLconf's views and returns the schema as compact JSON bytes"""
+    from drf_yasg.codecs import OpenAPICodecJson
+    from drf_yasg.generators import OpenAPISchemaGenerator
+    with _lock:
+        apply_pending()
+    generator = OpenAPISchemaGenerator(INFO.build())
+    return OpenAPICodecJson(validators=[]).encode(generator.get_schema(request=None, public=True))
+
+
+class SchemaDocument:
+    """The schema's JSON, with its ETag, and its YAML made on first use"""
+
+    def __init__(self, content):
+        self.content = content
+        self.etag = hashlib.sha256(content).hexdigest()[:32]
+        self._yaml = None
+
+    def render(self, format):
+        """Returns the schema's bytes in a format of FORMATS"""
+        if format == '.json':
+            return self.content
+        if self._yaml is None:
+            from drf_yasg.codecs import yaml_sane_dump
+            self._yaml = yaml_sane_dump(json.loads(self.content, object_pairs_hook=OrderedDict), binary=True)
+        return self._yaml
+
+
+def load_document():
+    """Returns the schema written at build time to API_SCHEMA['PATH'], or else a freshly generated one"""
+    path = get_setting('PATH')
+    if path:
+        try:
+            with open(path, 'rb') as schema_file:
+                return SchemaDocument(schema_file.read())
+        except FileNotFoundError:
+            pass
+    return SchemaDocument(generate_schema())
+
+
+def get_document():
+    """Returns the process-wide schema document, loading it on first use"""
+    global _document
+    # Not under _lock: generate_schema() takes it
+    document = _document
+    if document is None:
+        document = _document = load_document()
+    return document
+
+
+def reset_document():
+    """Discards the process-wide schema document so the next request loads it again"""
+    global _document
+    _document = None
+
+
+def schema_response(request, format, content_type):
+    """Returns the schema in a format, with ETag and Cache-Control headers, or 304 when the client has it"""
+    document = get_document()
+    etag = document.etag if format == '.json' else document.etag + '-yaml'
+
+    @condition(etag_func=lambda request: etag)
+    def send(request):
+        return HttpResponse(document.render(format), content_type=content_type)
+
+    response = send(request)
+    # Browsers and proxies keep the schema but revalidate it on every use
+    patch_cache_control(response, no_cache=True)
+    return response
+
+
+@require_safe
+def schema_view(request, format):
+    """Serves the schema as swagger.json or swagger.yaml."""
+    if format not in FORMATS:
+        raise Http404('Unknown schema format')
+    return schema_response(request, format, FORMATS[format])
+
+
+_pages = {}
+
+
+def build_page(renderer):
+    """Returns drf_yasg's view rendering a documentation page, which shows the schema's title and version"""
+    from drf_yasg import openapi as yasg_openapi
+    from drf_yasg.views import get_schema_view
+    from rest_framework import permissions
+    from rest_framework.response import Response
+
+    class DocsPageView(get_schema_view(INFO.build(), public=True, permission_classes=(permissions.AllowAny,))):
+        def get(self, request, version='', format=None):
+            return Response(yasg_openapi.Swagger(info=INFO.build(), _prefix='/', paths=yasg_openapi.Paths({})))
+
+    return DocsPageView.with_ui(renderer, cache_timeout=0)
+
+
+def page_view(renderer):
+    """Returns the view of the Swagger UI or ReDoc page, which fetches the schema from ?format=openapi"""
+    @require_safe
+    def view(request):
+        if request.GET.get('format') == 'openapi':
+            return schema_response(request, '.json', OPENAPI_MEDIA_TYPE)
+        page = _pages.get(renderer)
+        if page is None:
+            page = _pages[renderer] = build_page(renderer)
+        return page(request)
+    return view
+
+
+swagger_ui_view = page_view('swagger')
+redoc_view = page_view('redoc')
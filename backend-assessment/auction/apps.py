@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class AuctionConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'auction'
+
+    def ready(self):
+        # Registers the signal handlers keeping the JWT user cache and the
+        # live auction cache current, tuning every new SQLite connection and
+        # creating the search index
+        from . import authentication, live_cache, search, sqlite  # noqa: F401
@@ -0,0 +1,116 @@
+"""Module implementing the archive of bids on long closed auctions
+
+archive_bids() moves the bids of auctions closed more than a number of days ago
+into the ArchivedBid table, a batch of auctions at a time and one bounded chunk
+of bids per short write transaction that copies the chunk and deletes it from
+the hot bids table. Auction rows still point at their winning (current high)
+bids, so those are copied but stay hot as well. Once a batch's bids are copied,
+compact AuctionArchive summaries (winner, final price, bid count and the times
+of the first and last bids) mark its auctions archived. Copies ignore rows
+already archived, so an interrupted run resumes where it stopped.
+bid_history() reads an auction's bids from both tables alike.
+"""
+
+import time
+from datetime import timedelta
+from django.db.models import Count, Max, Min
+from django.utils import timezone
+from .models import ArchivedBid, Auction, AuctionArchive, Bid
+from .read_serializers import bid_reader
+from .sqlite import write_transaction
+
+DEFAULT_ARCHIVE_AFTER_DAYS = 30
+DEFAULT_CHUNK_SIZE = 1000
+AUCTION_BATCH_SIZE = 500
+
+
+def archivable_auctions(now, after_days):
+    """Returns the closed auctions that ended over after_days ago and are not archived yet"""
+    return Auction.objects.filter(
+        status=Auction.Status.CLOSED,
+        end_time__lt=now - timedelta(days=after_days),
+        archive__isnull=True,
+    ).order_by('end_time', 'id')
+
+
+def _copy(rows):
+    """Inserts archived copies of the given bid rows, skipping ones already archived"""
+    ArchivedBid.objects.bulk_create([
+        ArchivedBid(id=bid_id, auction_id=auction_id, bidder_id=bidder_id, amount=amount, timestamp=timestamp)
+        for bid_id, auction_id, bidder_id, amount, timestamp in rows
+    ], ignore_conflicts=True)
+
+
+def move_bids(auction_ids, kept_ids, chunk_size=DEFAULT_CHUNK_SIZE, pause=0):
+    """Copies the auctions' bids to the archive, deleting all but the kept ones, and returns the bids copied"""
+    columns = ('id', 'auction_id', 'bidder_id', 'amount', 'timestamp')
+    with write_transaction():
+        kept = list(Bid.objects.filter(id__in=kept_ids).values_list(*columns))
+        _copy(kept)
+    moved = len(kept)
+    while True:
+        with write_transaction():
+            # Moved rows leave the table, so every chunk is simply the first remaining one
+            rows = list(
+                Bid.objects.filter(auction_id__in=auction_ids).exclude(id__in=kept_ids)
+                .order_by().values_list(*columns)[:chunk_size]
+            )
+            if not rows:
+                return moved
+            _copy(rows)
+            Bid.objects.filter(id__in=[row[0] for row in rows]).delete()
+        moved += len(rows)
+        if pause:
+            time.sleep(pause)
+
+
+def summarize(auctions, now):
+    """Writes the summaries marking (id, winning_bid_id) auctions, whose bids are all archived, as archived"""
+    auction_ids = [auction_id for auction_id, winning_bid_id in auctions]
+    stats = {
+        row['auction_id']: row for row in ArchivedBid.objects.filter(auction_id__in=auction_ids)
+        .values('auction_id').annotate(count=Count('id'), first=Min('timestamp'), last=Max('timestamp'))
+        .order_by()
+    }
+    winners = {
+        bid_id: (bidder_id, amount) for bid_id, bidder_id, amount in ArchivedBid.objects.filter(
+            id__in=[winning_bid_id for auction_id, winning_bid_id in auctions if winning_bid_id]
+        ).values_list('id', 'bidder_id', 'amount')
+    }
+    summaries = []
+    for auction_id, winning_bid_id in auctions:
+        row = stats.get(auction_id, {'count': 0, 'first': None, 'last': None})
+        winner_id, final_price = winners.get(winning_bid_id, (None, None))
+        summaries.append(AuctionArchive(
+            auction_id=auction_id, winner_id=winner_id, final_price=final_price, bid_count=row['count'],
+            first_bid_at=row['first'], last_bid_at=row['last'], archived_at=now,
+        ))
+    with write_transaction():
+        AuctionArchive.objects.bulk_create(summaries)
+
+
+def archive_bids(after_days=DEFAULT_ARCHIVE_AFTER_DAYS, chunk_size=DEFAULT_CHUNK_SIZE, pause=0, now=None):
+    """Archives every auction closed over after_days ago and returns (auctions, bids) archived"""
+    now = now or timezone.now()
+    auctions, bids = 0, 0
+    while True:
+        batch = list(
+            archivable_auctions(now, after_days)
+            .values_list('id', 'winning_bid_id', 'current_high_bid_id')[:AUCTION_BATCH_SIZE]
+        )
+        if not batch:
+            return auctions, bids
+        kept_ids = {bid_id for row in batch for bid_id in row[1:] if bid_id is not None}
+        bids += move_bids([row[0] for row in batch], kept_ids, chunk_size, pause)
+        summarize([row[:2] for row in batch], now)
+        auctions += len(batch)
+
+
+def bid_history(auction_id, after_id=None):
+    """Returns an auction's bids from the hot and archive tables as bid_reader rows ordered by id"""
+    hot = Bid.objects.filter(auction_id=auction_id)
+    archived = ArchivedBid.objects.filter(auction_id=auction_id)
+    if after_id is not None:
+        hot, archived = hot.filter(id__gt=after_id), archived.filter(id__gt=after_id)
+    # UNION drops the rows present in both tables: the winning bid, or a chunk being moved
+    return bid_reader.values(hot.order_by()).union(bid_reader.values(archived)).order_by('id')
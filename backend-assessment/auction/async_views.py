@@ -0,0 +1,201 @@
+"""Module defining native async endpoints for ASGI deployments (simple_auction/asgi.py)
+
+DRF's APIView is sync only, so under an ASGI server every request to auction/views.py
+is pushed onto a worker thread for the whole request. These views run on the
+event loop instead: token checks are CPU only once the user's claims cutoff is
+cached, and the in-process cache is called directly (see auction/caching.py), so
+a warm read never leaves the event loop.
+Database work still does. In Django 5.2 the async ORM (aget, afirst, async
+iteration) wraps each query in sync_to_async, and the transactional bid write
+takes one sync_to_async hop, so only those steps run on a thread. They return
+the same payloads as their sync counterparts.
+"""
+
+import json
+import math
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import status
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+from .bidding import BidRejected, aplace_bid
+from .leaderboard import get_leaderboards
+from .models import Auction
+from .proxy import aget_engine
+from .read_serializers import auction_reader, bid_reader
+from .views import parse_amount
+from . import authentication, conditional, events, group_commit, live_cache, metrics, routing, throttling
+
+
+def error(message, status_code):
+    """Returns an error payload in the same shape as the DRF views"""
+    return JsonResponse({'error': message}, status=status_code)
+
+
+def throttled(wait):
+    """Returns the 429 sent when a rate limit is exhausted, like DRF's Throttled"""
+    wait = math.ceil(wait)
+    response = error('Request was throttled. Expected available in %d second%s.' % (wait, '' if wait == 1 else 's'), status.HTTP_429_TOO_MANY_REQUESTS)
+    response['Retry-After'] = str(wait)
+    return response
+
+
+async def authenticate(request):
+    """Returns the user of the request's access token, or None when there is no token.
+
+    Validating the token is CPU only and, like the sync views, trusted claims
+    spare the user lookup (see auction/authentication.py).
+    Raises AuthenticationFailed for invalid tokens and inactive users.
+    """
+    with metrics.timed('authentication'):
+        user = await _authenticate(request)
+    if user is not None:
+        routing.authenticated(user.id)
+    return user
+
+
+async def _authenticate(request):
+    """Validates the request's access token and returns its user, or None when there is none"""
+    jwt = JWTAuthentication()
+    header = jwt.get_header(request)
+    raw_token = jwt.get_raw_token(header) if header else None
+    if raw_token is None:
+        return None
+    try:
+        token = jwt.get_validated_token(raw_token)
+        user_id = authentication.token_user_id(token)
+    except InvalidToken:
+        raise AuthenticationFailed('Given token not valid for any token type')
+    if not authentication.get_setting('ENABLED'):
+        user_lookup = User.objects.aget(**{api_settings.USER_ID_FIELD: user_id})
+    elif await authentication.aclaims_are_current(token):
+        return TokenUser(token)
+    else:
+        user_lookup = authentication.user_cache.aget(user_id)
+    try:
+        user = await user_lookup
+    except User.DoesNotExist:
+        raise AuthenticationFailed('User not found')
+    return authentication.check_active(user)
+
+
+class AsyncAPIView(View):
+    """Base class for async JSON endpoints authenticated by JWT rather than session cookies"""
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        """Returns the view exempt from CSRF checks, which only apply to cookie sessions"""
+        return csrf_exempt(super().as_view(**initkwargs))
+
+
+class AsyncEnterBidView(AsyncAPIView):
+    """Async API endpoint for placing a Bid on an auction (authenticated users only)."""
+
+    async def post(self, request):
+        """Places a Bid if the auction is active and the Bid is higher than the current highest."""
+        try:
+            user = await authenticate(request)
+        except AuthenticationFailed as exc:
+            return error(str(exc.detail), status.HTTP_401_UNAUTHORIZED)
+        if user is None:
+            return error('Authentication credentials were not provided.', status.HTTP_401_UNAUTHORIZED)
+
+        try:
+            data = json.loads(request.body or b'{}')
+        except ValueError:
+            data = None
+        if not isinstance(data, dict):
+            return error('Invalid JSON body', status.HTTP_400_BAD_REQUEST)
+        auction_id = data.get('auction_id')
+        if not auction_id:
+            return error('Auction ID is required', status.HTTP_400_BAD_REQUEST)
+        try:
+            amount = parse_amount(data.get('amount'))
+        except ValueError as exc:
+            return error(str(exc), status.HTTP_400_BAD_REQUEST)
+        if throttling.get_setting('ENABLED'):
+            wait = await throttling.get_limiter().acheck(
+                'bid', user_id=user.id, ip=throttling.client_ip(request), auction_id=throttling.auction_key(auction_id)
+            )
+            if wait:
+                return throttled(wait)
+
+        try:
+            if group_commit.is_enabled():
+                bid = await group_commit.aplace_bid(auction_id, user, amount)
+            else:
+                bid = await aplace_bid(auction_id, user, amount)
+        except BidRejected as exc:
+            return error(exc.message, exc.status_code)
+
+        proxy_bids = []
+        if bid.proxy_version:
+            # Only auctions with registered maximums need a trip to the proxy engine
+            engine = await aget_engine()
+            proxy_bids = await sync_to_async(engine.respond_to_bid)(bid)
+        await live_cache.arecord_bid(proxy_bids[-1] if proxy_bids else bid)
+        get_leaderboards().record_bids([bid, *proxy_bids])
+        events.publish_bids([bid, *proxy_bids])
+        return JsonResponse({
+            'message': 'Bid placed successfully',
+            'bid': bid_reader.encode_instance(bid),
+            'outbid': bool(proxy_bids)
+        }, status=status.HTTP_200_OK)
+
+
+class AsyncAuctionDetailView(AsyncAPIView):
+    """Async public API endpoint returning a single auction."""
+
+    async def get(self, request, auction_id):
+        """Returns the auction with its current high bid, or 304 when the client's ETag has its version."""
+        if request.headers.get('If-None-Match'):
+            version = await Auction.objects.filter(id=auction_id).values_list('version', flat=True).afirst()
+            if version is not None:
+                response = conditional.not_modified(request, conditional.auction_etag(auction_id, version))
+                if response is not None:
+                    return response
+        row = await auction_reader.values(Auction.objects.filter(id=auction_id)).afirst()
+        if row is None:
+            return error('Auction not found', status.HTTP_404_NOT_FOUND)
+        return conditional.with_etag(
+            JsonResponse(auction_reader.encode(row), status=status.HTTP_200_OK), conditional.auction_etag(row.id, row.version)
+        )
+
+
+class AsyncLiveAuctionsView(AsyncAPIView):
+    """Async public API endpoint listing active auctions with their current high bid."""
+
+    async def get(self, request):
+        """Serves active auctions from the live auction cache, or 304 when the client's ETag is current."""
+        now = timezone.now()
+        # Taken before the listing, so a write landing in between changes the next ETag
+        etag = await live_cache.aget_listing_etag(now)
+        response = conditional.not_modified(request, etag)
+        if response is not None:
+            return response
+        return conditional.with_etag(
+            JsonResponse(await live_cache.aget_live_auctions(now), safe=False, status=status.HTTP_200_OK), etag
+        )
+
+
+class AsyncBidStreamView(AsyncAPIView):
+    """Public server-sent events stream of the bids accepted on one auction."""
+
+    async def get(self, request, auction_id):
+        """Streams the auction's current high, then each accepted bid until the auction ends."""
+        if not hasattr(request, 'scope'):
+            # A WSGI worker would be held for the whole life of the stream
+            return error('Streaming requires the ASGI server', status.HTTP_501_NOT_IMPLEMENTED)
+        if not await Auction.objects.filter(id=auction_id).aexists():
+            return error('Auction not found', status.HTTP_404_NOT_FOUND)
+        response = StreamingHttpResponse(events.stream_bids(auction_id), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
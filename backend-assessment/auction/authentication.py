@@ -0,0 +1,299 @@
+"""Module implementing JWT authentication without a user query per request
+
+Tokens issued by the API carry the user's username and staff flag as claims, so
+ClaimsJWTAuthentication builds a lightweight TokenUser from the token alone.
+Tokens without those claims, or issued no later than the last change to the
+user's staff or active flag, fall back to the full User, served from a bounded
+LRU cache with a time to live. Triggers on the users table record every such
+change, and every deletion, as a ClaimsCutoff row, so QuerySet.update() and raw
+SQL are covered too. Each process reads a user's cutoff through a cache of the
+same kind: it drops the entry at once when it saves or deletes the user itself,
+and sees changes made by other processes within USER_CACHE_TTL seconds.
+Select it with JWT_CLAIMS_AUTH['ENABLED'] in settings; when disabled every
+request loads the User row like simplejwt's JWTAuthentication.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connections, router, transaction
+from django.db.models.signals import post_delete, post_init, post_migrate, post_save
+from django.dispatch import receiver
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from .models import ClaimsCutoff
+from . import metrics, revocation, routing
+
+DEFAULTS = {
+    'ENABLED': True,
+    'USER_CACHE_SIZE': 10000,
+    'USER_CACHE_TTL': 60,
+}
+
+CLAIMS = ('username', 'is_staff')
+CREATE_TRIGGERS = (
+    "CREATE TRIGGER IF NOT EXISTS auction_claims_cutoff_update AFTER UPDATE OF is_staff, is_active ON auth_user "
+    "WHEN old.is_staff IS NOT new.is_staff OR old.is_active IS NOT new.is_active BEGIN "
+    "INSERT OR REPLACE INTO auction_claimscutoff(user_id, changed_at) "
+    "VALUES (new.id, CAST(strftime('%s', 'now') AS INTEGER)); END",
+    "CREATE TRIGGER IF NOT EXISTS auction_claims_cutoff_delete AFTER DELETE ON auth_user BEGIN "
+    "INSERT OR REPLACE INTO auction_claimscutoff(user_id, changed_at) "
+    "VALUES (old.id, CAST(strftime('%s', 'now') AS INTEGER)); END",
+)
+
+_MISSING = object()
+
+
+def get_setting(name):
+    """Returns a JWT_CLAIMS_AUTH setting, falling back to the defaults"""
+    return getattr(settings, 'JWT_CLAIMS_AUTH', {}).get(name, DEFAULTS[name])
+
+
+class ClaimsRefreshToken(RefreshToken):
+    """Refresh token whose claims, copied to its access tokens, describe the user.
+
+    Blacklist checks go through the in-memory revocation index (auction/revocation.py).
+    """
+
+    @classmethod
+    def for_user(cls, user):
+        """Returns a refresh token for the user carrying its username and staff flag"""
+        token = super().for_user(user)
+        token['username'] = user.username
+        token['is_staff'] = user.is_staff
+        return token
+
+    def check_blacklist(self):
+        """Raises TokenError if the token was revoked, asking the database only when the index cannot tell"""
+        if revocation.get_setting('ENABLED'):
+            revoked = revocation.get_index().is_revoked(self.payload[api_settings.JTI_CLAIM])
+            if revoked:
+                raise TokenError('Token is blacklisted')
+            if revoked is False:
+                return
+        super().check_blacklist()
+
+    def blacklist(self):
+        """Blacklists the token and, once committed, revokes it in every process's index"""
+        blacklisted = super().blacklist()
+        if revocation.get_setting('ENABLED'):
+            jti, expires_at = self.payload[api_settings.JTI_CLAIM], self.payload['exp']
+            transaction.on_commit(lambda: revocation.revoke(jti, expires_at))
+        return blacklisted
+
+
+class ClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """Token pair serializer for /api/token/ issuing ClaimsRefreshToken"""
+    token_class = ClaimsRefreshToken
+
+
+class ClaimsTokenRefreshSerializer(TokenRefreshSerializer):
+    """Token refresh serializer for /api/token/refresh/ checking revocations in memory"""
+    token_class = ClaimsRefreshToken
+
+
+class UserCache:
+    """Bounded LRU of User rows, each kept for at most ttl seconds"""
+
+    def __init__(self, max_size=None, ttl=None):
+        self.max_size = max_size or get_setting('USER_CACHE_SIZE')
+        self.ttl = ttl if ttl is not None else get_setting('USER_CACHE_TTL')
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        """Returns the number of cached users, including expired ones not yet dropped"""
+        return len(self._entries)
+
+    def _lookup(self, user_id):
+        """Returns the cached entry, or _MISSING when it is missing or expired"""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return _MISSING
+            if entry[0] < time.monotonic():
+                del self._entries[user_id]
+                return _MISSING
+            self._entries.move_to_end(user_id)
+            return entry[1]
+
+    def _store(self, user_id, value):
+        """Caches a loaded entry for ttl seconds, evicting the least recently used past max_size"""
+        with self._lock:
+            self._entries[user_id] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def load(self, user_id):
+        """Returns the user from the database. Raises User.DoesNotExist"""
+        return User.objects.get(**{api_settings.USER_ID_FIELD: user_id})
+
+    async def aload(self, user_id):
+        """Async counterpart of load"""
+        return await User.objects.aget(**{api_settings.USER_ID_FIELD: user_id})
+
+    def get(self, user_id):
+        """Returns the user, loading it on a miss. Raises User.DoesNotExist"""
+        value = self._lookup(user_id)
+        if value is _MISSING:
+            value = self.load(user_id)
+            self._store(user_id, value)
+        return value
+
+    async def aget(self, user_id):
+        """Async counterpart of get"""
+        value = self._lookup(user_id)
+        if value is _MISSING:
+            value = await self.aload(user_id)
+            self._store(user_id, value)
+        return value
+
+    def invalidate(self, user_id):
+        """Drops a user from the cache"""
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        """Drops every cached user"""
+        with self._lock:
+            self._entries.clear()
+
+
+class ClaimsCutoffCache(UserCache):
+    """UserCache of the users' ClaimsCutoff times, None for users whose flags never changed"""
+
+    def load(self, user_id):
+        """Returns the user's cutoff from the primary, where the triggers write it"""
+        with routing.use_primary():
+            return ClaimsCutoff.objects.filter(user_id=user_id).values_list('changed_at', flat=True).first()
+
+    async def aload(self, user_id):
+        """Async counterpart of load"""
+        with routing.use_primary():
+            return await ClaimsCutoff.objects.filter(user_id=user_id).values_list('changed_at', flat=True).afirst()
+
+
+user_cache = UserCache()
+cutoff_cache = ClaimsCutoffCache()
+
+
+def ensure_triggers(using='default'):
+    """Creates the triggers recording flag changes and deletions where missing"""
+    with connections[using].cursor() as cursor:
+        for statement in CREATE_TRIGGERS:
+            cursor.execute(statement)
+
+
+@receiver(post_migrate)
+def triggers_after_migrate(sender, using, **kwargs):
+    """Ensures the triggers after the auction app is migrated, as rebuilding the users table drops them"""
+    if sender.name != 'auction' or connections[using].vendor != 'sqlite':
+        return
+    if router.allow_migrate_model(using, ClaimsCutoff):
+        ensure_triggers(using)
+
+
+def _trusted(token, changed_at):
+    """Returns true if the token was issued after the user's last recorded flag change"""
+    return changed_at is None or token.get('iat', 0) > changed_at
+
+
+def claims_are_current(token):
+    """Returns true if the token's user claims can be trusted without loading the user.
+
+    Tokens issued no later than the user's ClaimsCutoff, the last change to its
+    staff or active flag or its deletion, are not trusted.
+    """
+    if any(claim not in token for claim in CLAIMS):
+        return False
+    return _trusted(token, cutoff_cache.get(token[api_settings.USER_ID_CLAIM]))
+
+
+async def aclaims_are_current(token):
+    """Async counterpart of claims_are_current"""
+    if any(claim not in token for claim in CLAIMS):
+        return False
+    return _trusted(token, await cutoff_cache.aget(token[api_settings.USER_ID_CLAIM]))
+
+
+def check_active(user):
+    """Returns the user, raising AuthenticationFailed if it is inactive and simplejwt checks that"""
+    if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+        raise AuthenticationFailed('User is inactive', code='user_inactive')
+    return user
+
+
+def token_user_id(token):
+    """Returns the user id claim of a validated token. Raises InvalidToken without one"""
+    try:
+        return token[api_settings.USER_ID_CLAIM]
+    except KeyError:
+        raise InvalidToken('Token contained no recognizable user identification')
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication returning a TokenUser built from trusted claims, else a cached User"""
+
+    def authenticate(self, request):
+        """Authenticates the request, timing it and marking the user for read routing"""
+        with metrics.timed('authentication'):
+            result = super().authenticate(request)
+        if result is not None:
+            routing.authenticated(result[0].id)
+        return result
+
+    def get_user(self, validated_token):
+        """Returns a TokenUser when the token's claims are current, else the cached User"""
+        if not get_setting('ENABLED'):
+            return super().get_user(validated_token)
+        user_id = token_user_id(validated_token)
+        if claims_are_current(validated_token):
+            return TokenUser(validated_token)
+        try:
+            return check_active(user_cache.get(user_id))
+        except User.DoesNotExist:
+            raise AuthenticationFailed('User not found', code='user_not_found')
+
+
+def _flags(user):
+    """Returns the user's staff and active flags, None for deferred ones"""
+    # Read from __dict__ so deferred fields are not loaded
+    return user.__dict__.get('is_staff'), user.__dict__.get('is_active')
+
+
+@receiver(post_init, sender=User)
+def remember_flags(sender, instance, **kwargs):
+    """Keeps the flags a user was loaded with so saves can tell whether they changed"""
+    instance._auth_flags = _flags(instance)
+
+
+def user_changed(user_id):
+    """Drops the cached user and claims cutoff, so this process sees the triggers' new cutoff at once"""
+    user_cache.invalidate(user_id)
+    cutoff_cache.invalidate(user_id)
+
+
+@receiver(post_save, sender=User)
+def flags_saved(sender, instance, created, **kwargs):
+    """Distrusts the user's claims when a save changed its staff or active flag"""
+    flags = _flags(instance)
+    if created:
+        # A reused primary key must not resolve to the previous user's row
+        user_changed(instance.pk)
+    elif flags != instance._auth_flags:
+        user_changed(instance.pk)
+    instance._auth_flags = flags
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    """Distrusts the claims of a deleted user's tokens"""
+    user_changed(instance.pk)
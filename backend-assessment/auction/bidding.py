@@ -0,0 +1,115 @@
+"""Module implementing bid placement against the denormalized auction high bid"""
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ValidationError
+from django.core.validators import DecimalValidator
+from django.db.models import F, Q
+from django.utils import timezone
+from rest_framework import status
+from .models import Auction, Bid
+from .sqlite import write_transaction
+
+_amount_field = Bid._meta.get_field('amount')
+# The amount columns' bounds, which the database cannot store values beyond
+AMOUNT_VALIDATOR = DecimalValidator(_amount_field.max_digits, _amount_field.decimal_places)
+
+
+class BidRejected(Exception):
+    """Raised when a bid is not accepted, carrying the error message and HTTP status"""
+
+    def __init__(self, message, status_code=status.HTTP_400_BAD_REQUEST):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+def _accept(auction_id, bidder, amount, now):
+    """Runs the guarded write and returns the created Bid, or None if it matched no rows"""
+    with write_transaction():
+        accepted = Auction.objects.filter(
+            Q(current_high_amount__lt=amount) |
+            Q(current_high_amount__isnull=True, starting_price__lte=amount),
+            id=auction_id,
+            status=Auction.Status.OPEN,
+            start_time__lte=now,
+            end_time__gte=now,
+        ).update(current_high_amount=amount, bid_count=F('bid_count') + 1, version=F('version') + 1)
+        if not accepted:
+            return None
+        # The auction row is now write-locked until commit
+        bid = Bid.objects.create(auction_id=auction_id, bidder_id=bidder.id, amount=amount)
+        Auction.objects.filter(id=auction_id).update(current_high_bid=bid)
+        # Read under the lock, so maximums registered by any process are seen
+        bid.proxy_version, bid.auction_version = Auction.objects.filter(id=auction_id).values_list(
+            'proxy_version', 'version'
+        ).get()
+        return bid
+
+
+def place_bid(auction_id, bidder, amount, now=None):
+    """Places a bid with a single guarded UPDATE on the auction row.
+
+    The UPDATE only matches when the auction is open and active and the amount
+    beats the current high (or meets the starting price when there are no bids),
+    so the write itself decides acceptance and concurrent bidders cannot both win.
+    Returns the created Bid or raises BidRejected.
+    """
+    now = now or timezone.now()
+    bid = _accept(auction_id, bidder, amount, now)
+    if bid is None:
+        raise _rejection(_rejection_queryset(auction_id).first(), amount, now)
+    return bid
+
+
+async def aplace_bid(auction_id, bidder, amount, now=None):
+    """Async counterpart of place_bid.
+
+    The async ORM cannot run transactions yet, so the guarded write takes a single
+    thread hop; the rejection lookup uses the async ORM.
+    """
+    now = now or timezone.now()
+    bid = await sync_to_async(_accept)(auction_id, bidder, amount, now)
+    if bid is None:
+        raise _rejection(await _rejection_queryset(auction_id).afirst(), amount, now)
+    return bid
+
+
+def check_amount(amount):
+    """Returns a BidRejected when the Decimal is not a positive amount the bid columns can store, or None"""
+    if not amount.is_finite():
+        return BidRejected('Invalid amount')
+    if amount <= 0:
+        return BidRejected('Amount must be positive')
+    try:
+        # Trailing zeros count as decimal places, and fit the column all the same
+        AMOUNT_VALIDATOR(amount.normalize())
+    except ValidationError as exc:
+        return BidRejected(exc.messages[0])
+    return None
+
+
+def check_bid(auction, amount, now):
+    """Returns a BidRejected explaining why the bid fails against this auction state, or None"""
+    if auction.status != Auction.Status.OPEN or now < auction.start_time or now > auction.end_time:
+        return BidRejected('Auction not active')
+    if auction.current_high_amount is None:
+        if amount < auction.starting_price:
+            return BidRejected('Bid must be at least the starting price')
+    elif amount <= auction.current_high_amount:
+        return BidRejected('Bid must be higher than current highest bid')
+    return None
+
+
+def _rejection_queryset(auction_id):
+    """Returns the lookup of the fields needed to explain a rejection"""
+    return Auction.objects.filter(id=auction_id).only(
+        'starting_price', 'start_time', 'end_time', 'current_high_amount', 'status'
+    )
+
+
+def _rejection(auction, amount, now):
+    """Works out why the guarded UPDATE matched no rows"""
+    if auction is None:
+        return BidRejected('Auction not found', status.HTTP_404_NOT_FOUND)
+    # A concurrent bid may have raised the high between the UPDATE and this read
+    return check_bid(auction, amount, now) or BidRejected('Bid must be higher than current highest bid')
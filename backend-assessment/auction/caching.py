@@ -0,0 +1,15 @@
+"""Module with helpers for using Django's cache from async code"""
+
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+
+
+async def acache(method, *args, **kwargs):
+    """Calls a cache method without blocking the event loop.
+
+    Django's built-in backends implement the async API by hopping to a thread, so
+    the in-process locmem cache, which cannot block, is called directly instead.
+    """
+    if isinstance(caches['default'], LocMemCache):
+        return getattr(cache, method)(*args, **kwargs)
+    return await getattr(cache, 'a' + method)(*args, **kwargs)
@@ -0,0 +1,119 @@
+"""Module implementing the scheduler that closes auctions at their end time"""
+
+import heapq
+import logging
+import threading
+from datetime import timedelta
+from django.db.models import F
+from django.utils import timezone
+from .models import Auction
+from .sqlite import write_transaction
+from . import events, live_cache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_POLL_SECONDS = 1
+
+
+def close_auctions(auction_ids, now=None, batch_size=DEFAULT_BATCH_SIZE):
+    """Closes the given auctions if they are still open and past their end time.
+
+    Each batch is one transaction that reads the ids of the due auctions and
+    closes them with one UPDATE copying the denormalized current high bid into
+    winning_bid, so no bid rows are read. Streams of the closed auctions are
+    ended. Returns the number of auctions closed.
+    """
+    now = now or timezone.now()
+    closed = 0
+    for start in range(0, len(auction_ids), batch_size):
+        batch = auction_ids[start:start + batch_size]
+        with write_transaction():
+            # Read under the write lock, so these are exactly the auctions the UPDATE closes
+            batch = list(Auction.objects.filter(
+                id__in=batch, status=Auction.Status.OPEN, end_time__lte=now
+            ).values_list('id', flat=True))
+            closed += Auction.objects.filter(id__in=batch).update(
+                status=Auction.Status.CLOSED,
+                winning_bid=F('current_high_bid'),
+                closed_at=now,
+                version=F('version') + 1,
+            )
+        live_cache.auctions_closed(batch)
+        events.publish_end(batch)
+    return closed
+
+
+class AuctionCloser:
+    """Keeps a min-heap of upcoming end times and closes auctions as they fall due.
+
+    The deadline of every open auction is loaded once, when the worker starts.
+    After that the worker sleeps until the earliest deadline, waking every poll
+    interval to push the auctions created since. It finds them with a range
+    read on the primary key past the highest id seen, so a new auction ending
+    sooner than the rest is closed at most one poll interval late.
+    """
+
+    def __init__(self, batch_size=DEFAULT_BATCH_SIZE, poll_seconds=DEFAULT_POLL_SECONDS):
+        self.batch_size = batch_size
+        self.poll = timedelta(seconds=poll_seconds)
+        self.heap = []
+        self.seen_id = None
+        self.poll_at = None
+        self._stop = threading.Event()
+
+    def load(self):
+        """Builds the heap from the deadlines of every open auction"""
+        self.heap = []
+        self.seen_id = 0
+        self.push(Auction.objects.filter(status=Auction.Status.OPEN))
+
+    def poll_new(self, now):
+        """Pushes the deadlines of auctions created since the last load or poll"""
+        self.poll_at = now + self.poll
+        self.push(Auction.objects.filter(id__gt=self.seen_id, status=Auction.Status.OPEN))
+
+    def push(self, queryset):
+        """Adds the (end_time, id) of the given auctions to the heap and remembers the highest id"""
+        for end_time, pk in queryset.order_by('id').values_list('end_time', 'id'):
+            heapq.heappush(self.heap, (end_time, pk))
+            self.seen_id = max(self.seen_id, pk)
+
+    def pop_due(self, now):
+        """Removes and returns the ids of every auction whose deadline has passed"""
+        due = []
+        while self.heap and self.heap[0][0] <= now:
+            due.append(heapq.heappop(self.heap)[1])
+        return due
+
+    def run_once(self, now=None):
+        """Closes everything due at the given time and returns how many were closed"""
+        now = now or timezone.now()
+        if self.seen_id is None:
+            self.load()
+        if self.poll_at is None or now >= self.poll_at:
+            self.poll_new(now)
+        due = self.pop_due(now)
+        if not due:
+            return 0
+        closed = close_auctions(due, now, self.batch_size)
+        if closed < len(due):
+            # Auctions still open had their end time moved later, or were deleted
+            self.push(Auction.objects.filter(id__in=due, status=Auction.Status.OPEN))
+        logger.info('Closed %d auctions due by %s', closed, now.isoformat())
+        return closed
+
+    def seconds_until_next(self, now):
+        """Returns how long to sleep before the next deadline or poll"""
+        wake_at = min(self.heap[0][0], self.poll_at) if self.heap else self.poll_at
+        return max((wake_at - now).total_seconds(), 0)
+
+    def run_forever(self):
+        """Closes auctions at each deadline until stop() is called"""
+        while not self._stop.is_set():
+            self.run_once()
+            self._stop.wait(self.seconds_until_next(timezone.now()))
+
+    def stop(self):
+        """Wakes the worker and makes run_forever return"""
+        self._stop.set()
@@ -0,0 +1,39 @@
+"""Module implementing weak ETags of auction reads, derived from auction versions
+
+Auction.version is bumped by every write that changes what reading the auction
+returns: bids, bid deletions, edits and closing. A single auction's ETag is its
+id and version, and a page of auctions' is a digest of their (id, version)
+pairs, so a polling client's If-None-Match is answered with a 304 after reading
+those versions alone, without serializing the auctions or querying their bids.
+The live listing, served from the cache, digests a counter the cache bumps with
+every such write instead (see auction/live_cache.py).
+"""
+
+import hashlib
+from django.utils.cache import get_conditional_response
+
+
+def auction_etag(auction_id, version):
+    """Returns the weak ETag of an auction at a version"""
+    return 'W/"%d.%d"' % (auction_id, version)
+
+
+def listing_etag(versions):
+    """Returns the weak ETag of a listing from the (id, version) pairs, or other counters, it was built from"""
+    return 'W/"%s"' % hashlib.blake2b(repr(list(versions)).encode(), digest_size=16).hexdigest()
+
+
+def not_modified(request, etag):
+    """Returns the 304 answering a request whose If-None-Match holds the ETag, or None"""
+    if not request.headers.get('If-None-Match'):
+        return None
+    response = get_conditional_response(request, etag=etag)
+    if response is not None:
+        response['ETag'] = etag
+    return response
+
+
+def with_etag(response, etag):
+    """Sets a response's ETag and returns it"""
+    response['ETag'] = etag
+    return response
@@ -0,0 +1,245 @@
+"""Module implementing chunked deletion of auctions and bids
+
+Deleting an auction through the ORM makes Django's collector load every one of
+its bids first (bids cannot be fast deleted, as auctions point at their high and
+winning bids) and cascade in one long write transaction. delete_auctions()
+instead deletes the auctions' bids and archived bids with raw DELETE statements
+of at most CHUNK_SIZE primary keys, each in its own short write transaction,
+sparing only the bids the auctions point at, read again in every chunk; the ORM
+then deletes the auctions along with the few rows left. The auctions are closed
+first, so no bid, proxy or otherwise, is placed on them while that runs.
+Deleted rows leave the tables, so every chunk is simply the first remaining one
+and an interrupted deletion resumes by running again.
+
+Deletions of more than INLINE_MAX_BIDS bids (by the auctions' bid counters)
+become a DeletionJob, which records its progress with every chunk. Jobs run on a
+background thread of the process that created them (RUN_IN_PROCESS), and
+manage.py run_deletion_jobs resumes the ones a stopped process left behind, or
+runs every job when RUN_IN_PROCESS is off.
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.conf import settings
+from django.db import connection, connections
+from django.db.models import DateTimeField, F, Q, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from .leaderboard import get_leaderboards
+from .models import ArchivedBid, Auction, Bid, DeletionJob
+from .proxy import get_engine
+from .sqlite import write_transaction
+from . import events, live_cache
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'CHUNK_SIZE': 1000,
+    'PAUSE_SECONDS': 0,
+    'INLINE_MAX_BIDS': 10000,
+    'MAX_BATCH_IDS': 1000,
+    'RUN_IN_PROCESS': True,
+    'STALE_SECONDS': 60,
+}
+
+DEFAULT_POLL_SECONDS = 5
+
+
+def get_setting(name):
+    """Returns a DELETION_JOBS setting, falling back to the defaults"""
+    return getattr(settings, 'DELETION_JOBS', {}).get(name, DEFAULTS[name])
+
+
+def bids_to_delete(auction_ids):
+    """Returns the number of bids the auctions' deletion removes, from their bid counters"""
+    return Auction.objects.filter(id__in=auction_ids).aggregate(bids=Sum('bid_count'))['bids'] or 0
+
+
+def kept_bids(auction_ids):
+    """Returns the ids of the bids the auctions point at, deleted along with the auctions"""
+    return {
+        bid_id for row in Auction.objects.filter(id__in=auction_ids).values_list('current_high_bid_id', 'winning_bid_id')
+        for bid_id in row if bid_id is not None
+    }
+
+
+def close_for_deletion(auction_ids, now):
+    """Closes the auctions still open, so bids are rejected while they are deleted"""
+    with write_transaction():
+        Auction.objects.filter(id__in=auction_ids, status=Auction.Status.OPEN).update(
+            status=Auction.Status.CLOSED,
+            winning_bid=F('current_high_bid'),
+            closed_at=now,
+            version=F('version') + 1,
+        )
+    live_cache.auctions_closed(auction_ids)
+
+
+def delete_chunk(model, auction_ids, kept_ids, chunk_size):
+    """Deletes up to chunk_size of the auctions' rows of model, sparing kept_ids, and returns how many"""
+    ids = list(
+        model.objects.filter(auction_id__in=auction_ids).exclude(id__in=kept_ids)
+        .order_by().values_list('id', flat=True)[:chunk_size]
+    )
+    if not ids:
+        return 0
+    # Raw, so nothing is collected: no other row references these
+    with connection.cursor() as cursor:
+        cursor.execute('DELETE FROM %s WHERE id IN (%s)' % (
+            connection.ops.quote_name(model._meta.db_table), ', '.join(['%s'] * len(ids))
+        ), ids)
+        return cursor.rowcount
+
+
+def delete_auctions(auction_ids, chunk_size=None, pause=None, progress=None):
+    """Deletes auctions with their bids in chunks and returns the number of auctions deleted.
+
+    progress(rows) is called inside each chunk's transaction with the rows it deleted.
+    """
+    chunk_size = chunk_size or get_setting('CHUNK_SIZE')
+    pause = get_setting('PAUSE_SECONDS') if pause is None else pause
+    auction_ids = list(auction_ids)
+    close_for_deletion(auction_ids, timezone.now())
+    for model in (Bid, ArchivedBid):
+        while True:
+            with write_transaction():
+                # Bid deletions meanwhile may have moved the auctions' high bids
+                deleted = delete_chunk(model, auction_ids, kept_bids(auction_ids), chunk_size)
+                if deleted and progress:
+                    progress(deleted)
+            if deleted < chunk_size:
+                break
+            if pause:
+                time.sleep(pause)
+    with write_transaction():
+        counts = Auction.objects.filter(id__in=auction_ids).delete()[1]
+        # The bids the auctions pointed at went with them
+        bids = counts.get(Bid._meta.label, 0) + counts.get(ArchivedBid._meta.label, 0)
+        if bids and progress:
+            progress(bids)
+    deleted = counts.get(Auction._meta.label, 0)
+    engine, leaderboards = get_engine(), get_leaderboards()
+    for auction_id in auction_ids:
+        live_cache.auction_deleted(auction_id)
+        engine.forget(auction_id)
+        leaderboards.forget(auction_id)
+    events.publish_end(auction_ids)
+    return deleted
+
+
+def delete_bids(bid_ids):
+    """Deletes bids in chunks, refreshing their auctions' high bids, and returns how many were deleted"""
+    chunk_size = get_setting('CHUNK_SIZE')
+    bid_ids = list(bid_ids)
+    auctions = set()
+    deleted = 0
+    for start in range(0, len(bid_ids), chunk_size):
+        chunk = bid_ids[start:start + chunk_size]
+        with write_transaction():
+            chunk_auctions = set(Bid.objects.filter(id__in=chunk).values_list('auction_id', flat=True))
+            # Through the ORM, which clears the auctions' references to these bids
+            deleted += Bid.objects.filter(id__in=chunk).delete()[1].get(Bid._meta.label, 0)
+            for auction in Auction.objects.filter(id__in=chunk_auctions):
+                auction.refresh_current_high()
+        auctions |= chunk_auctions
+    leaderboards = get_leaderboards()
+    for auction_id in auctions:
+        live_cache.auction_changed(auction_id)
+        leaderboards.forget(auction_id)
+    return deleted
+
+
+def create_job(auction_ids, user=None):
+    """Records a deletion job for the auctions and starts it when jobs run in process"""
+    total_bids = bids_to_delete(auction_ids)
+    with write_transaction():
+        job = DeletionJob.objects.create(auction_ids=list(auction_ids), total_bids=total_bids, requested_by=user)
+    if get_setting('RUN_IN_PROCESS'):
+        get_executor().submit(run_job_in_thread, job.id)
+    return job
+
+
+def claimable(now, retry_failed=False):
+    """Returns the filter of pending jobs, jobs abandoned by a stopped process and, with retry_failed, failed ones"""
+    condition = Q(status=DeletionJob.Status.PENDING) | Q(
+        status=DeletionJob.Status.RUNNING, heartbeat_at__lt=now - timedelta(seconds=get_setting('STALE_SECONDS'))
+    )
+    if retry_failed:
+        condition |= Q(status=DeletionJob.Status.FAILED)
+    return condition
+
+
+def claim_job(job_id, now, retry_failed=False):
+    """Marks a claimable job as running here and returns whether it was claimable"""
+    with write_transaction():
+        return bool(DeletionJob.objects.filter(claimable(now, retry_failed), id=job_id).update(
+            status=DeletionJob.Status.RUNNING, heartbeat_at=now, error='',
+            started_at=Coalesce('started_at', Value(now, output_field=DateTimeField())),
+        ))
+
+
+def run_job(job_id, retry_failed=False):
+    """Runs a deletion job if it can be claimed and returns whether it ran to completion"""
+    if not claim_job(job_id, timezone.now(), retry_failed):
+        return False
+    job = DeletionJob.objects.get(id=job_id)
+
+    def progress(rows):
+        DeletionJob.objects.filter(id=job_id).update(deleted_bids=F('deleted_bids') + rows, heartbeat_at=timezone.now())
+
+    try:
+        deleted = delete_auctions(job.auction_ids, progress=progress)
+    except Exception as exc:
+        logger.exception('Deletion job %d failed', job_id)
+        with write_transaction():
+            DeletionJob.objects.filter(id=job_id).update(status=DeletionJob.Status.FAILED, error=str(exc)[:1000])
+        return False
+    with write_transaction():
+        DeletionJob.objects.filter(id=job_id).update(
+            status=DeletionJob.Status.DONE, deleted_auctions=F('deleted_auctions') + deleted, finished_at=timezone.now(),
+        )
+    return True
+
+
+def run_job_in_thread(job_id):
+    """Runs a job on the executor's thread, then closes the thread's connections"""
+    try:
+        run_job(job_id)
+    finally:
+        connections.close_all()
+
+
+def resumable_jobs(now=None, retry_failed=False):
+    """Returns the ids of the jobs waiting to run or left behind by a stopped process, oldest first"""
+    claimable_jobs = DeletionJob.objects.filter(claimable(now or timezone.now(), retry_failed))
+    return list(claimable_jobs.order_by('id').values_list('id', flat=True))
+
+
+def run_pending_jobs(retry_failed=False):
+    """Runs every resumable job and returns how many completed"""
+    return sum(run_job(job_id, retry_failed) for job_id in resumable_jobs(retry_failed=retry_failed))
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Returns the process-wide single thread running deletion jobs one after another"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='deletion-jobs')
+        return _executor
+
+
+def reset_executor():
+    """Waits for the running jobs and discards the executor so the next job starts a new one"""
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=True)
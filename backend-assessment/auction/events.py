@@ -0,0 +1,196 @@
+"""Module implementing the in-process fan-out of accepted bids to stream subscribers
+
+Bid views publish every accepted bid once; the broker encodes it as a server-sent
+event a single time and hands the same bytes to each subscriber of the auction.
+Subscribers wait on an event loop with a small bounded queue: once a consumer
+falls QUEUE_SIZE events behind its oldest events are dropped, so the queue
+coalesces towards the latest high and a slow client never holds up bidders.
+Closing or deleting an auction publishes an end event that stops its streams.
+Subscriptions are per process, so only writes made by the process serving a
+stream reach it. Tune it with BID_STREAM in settings.
+"""
+
+import asyncio
+import json
+import threading
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from .models import Auction
+from .read_serializers import bid_reader
+
+DEFAULTS = {
+    'QUEUE_SIZE': 16,
+    'HEARTBEAT_SECONDS': 15,
+}
+
+
+def get_setting(name):
+    """Returns a BID_STREAM setting, falling back to the defaults"""
+    return getattr(settings, 'BID_STREAM', {}).get(name, DEFAULTS[name])
+
+
+def encode_event(event, data, event_id=None):
+    """Returns one server-sent event as bytes"""
+    lines = ['event: %s' % event, 'data: %s' % json.dumps(data, cls=DjangoJSONEncoder, separators=(',', ':'))]
+    if event_id is not None:
+        lines.insert(0, 'id: %s' % event_id)
+    return ('\n'.join(lines) + '\n\n').encode()
+
+
+KEEP_ALIVE = b': keep-alive\n\n'
+
+
+def _deliver(subscribers, payload, end):
+    """Queues an event for subscribers sharing one event loop. Runs on that loop"""
+    for subscriber in subscribers:
+        subscriber.put(payload, end)
+
+
+class Subscriber:
+    """One stream's bounded queue of encoded events, owned by an event loop.
+
+    An idle subscriber is a slotted object, an empty list and a pending future.
+    """
+    __slots__ = ('auction_id', 'loop', 'queue_size', 'pending', 'dropped', 'ended', '_waiter')
+
+    def __init__(self, auction_id, loop, queue_size):
+        self.auction_id = auction_id
+        self.loop = loop
+        self.queue_size = queue_size
+        self.pending = []
+        self.dropped = 0
+        # Set once the auction's end event is queued, which is never dropped as the newest
+        self.ended = False
+        self._waiter = None
+
+    def put(self, payload, end=False):
+        """Queues an event, dropping the oldest pending one when the queue is full"""
+        if len(self.pending) >= self.queue_size:
+            del self.pending[0]
+            self.dropped += 1
+        self.pending.append(payload)
+        self.ended = self.ended or end
+        if self._waiter is not None and not self._waiter.done():
+            self._waiter.set_result(None)
+
+    async def get(self, timeout=None):
+        """Returns and clears the pending events, waiting up to timeout seconds for one"""
+        if not self.pending:
+            self._waiter = self.loop.create_future()
+            try:
+                await asyncio.wait_for(self._waiter, timeout)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                self._waiter = None
+        events, self.pending = self.pending, []
+        return events
+
+
+class Broker:
+    """Subscribers grouped by auction and event loop; publish() is safe from any thread"""
+
+    def __init__(self):
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, auction_id):
+        """Registers a subscriber on the running event loop"""
+        subscriber = Subscriber(auction_id, asyncio.get_running_loop(), get_setting('QUEUE_SIZE'))
+        with self._lock:
+            self._subscribers.setdefault(auction_id, {}).setdefault(subscriber.loop, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        """Removes a subscriber, dropping empty groups"""
+        with self._lock:
+            by_loop = self._subscribers.get(subscriber.auction_id, {})
+            subscribers = by_loop.get(subscriber.loop, set())
+            subscribers.discard(subscriber)
+            if not subscribers:
+                by_loop.pop(subscriber.loop, None)
+            if not by_loop:
+                self._subscribers.pop(subscriber.auction_id, None)
+
+    def has_subscribers(self, auction_id):
+        """Returns true if an auction has streams in this process, without taking the lock"""
+        return auction_id in self._subscribers
+
+    def subscriber_count(self, auction_id):
+        """Returns the number of streams of an auction in this process"""
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._subscribers.get(auction_id, {}).values())
+
+    def publish(self, auction_id, payload, end=False):
+        """Schedules delivery of an encoded event on each subscriber's loop without waiting for it.
+
+        An end event stops the streams once delivered.
+        """
+        with self._lock:
+            targets = [(loop, tuple(subscribers)) for loop, subscribers in self._subscribers.get(auction_id, {}).items()]
+        for loop, subscribers in targets:
+            try:
+                loop.call_soon_threadsafe(_deliver, subscribers, payload, end)
+            except RuntimeError:
+                # The loop has closed and its streams with it
+                for subscriber in subscribers:
+                    self.unsubscribe(subscriber)
+
+
+broker = Broker()
+
+
+def publish_bids(bids):
+    """Publishes accepted bids in the order they were placed"""
+    for bid in bids:
+        if broker.has_subscribers(bid.auction_id):
+            broker.publish(bid.auction_id, encode_event('bid', bid_reader.encode_instance(bid), bid.id))
+
+
+def publish_end(auction_ids):
+    """Ends the streams of closed or deleted auctions"""
+    for auction_id in auction_ids:
+        if broker.has_subscribers(auction_id):
+            broker.publish(auction_id, encode_event('end', {'auction_id': auction_id}), end=True)
+
+
+def _snapshot(auction):
+    """Returns the stream's opening event data"""
+    return {
+        'auction_id': auction.id,
+        'status': auction.status,
+        'end_time': auction.end_time,
+        'current_high_amount': auction.current_high_amount,
+        'current_high_bid': auction.current_high_bid_id,
+        'bid_count': auction.bid_count,
+    }
+
+
+async def stream_bids(auction_id):
+    """Yields an auction's snapshot, then its accepted bids until the auction ends.
+
+    The subscription starts before the snapshot is read, so no bid falls between
+    them. The stream stops at the end time read with the snapshot, or earlier
+    when the auction is closed or deleted. Keep-alive comments are sent while
+    idle so proxies keep the connection.
+    """
+    subscriber = broker.subscribe(auction_id)
+    try:
+        auction = await Auction.objects.filter(id=auction_id).afirst()
+        if auction is None:
+            return
+        yield encode_event('snapshot', _snapshot(auction))
+        heartbeat = get_setting('HEARTBEAT_SECONDS')
+        while auction.status == Auction.Status.OPEN:
+            remaining = (auction.end_time - timezone.now()).total_seconds()
+            if remaining <= 0:
+                break
+            events = await subscriber.get(timeout=min(heartbeat, remaining))
+            yield b''.join(events) if events else KEEP_ALIVE
+            if subscriber.ended:
+                # Closed or deleted, and the published end event was the last one sent
+                return
+        yield encode_event('end', {'auction_id': auction.id})
+    finally:
+        broker.unsubscribe(subscriber)
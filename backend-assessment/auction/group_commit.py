@@ -0,0 +1,208 @@
+"""Module implementing opt-in group commit of bids for end-of-auction surges
+
+Instead of one transaction per request, bids are queued and a single writer thread
+decides them in arrival order in micro-batches. Every batch is committed with one
+transaction and one bulk_create, and each caller still gets its own answer; a
+batch the database refuses is retried bid by bid, so only the failing bids fail.
+Enable it with BID_GROUP_COMMIT['ENABLED'] in settings.
+"""
+
+import asyncio
+import queue
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import Future
+from django.conf import settings
+from django.db import connection
+from django.db.models import F
+from django.utils import timezone
+from rest_framework import status
+from .bidding import BidRejected, check_amount, check_bid
+from .models import Auction, Bid
+from .sqlite import write_transaction
+
+DEFAULTS = {
+    'ENABLED': False,
+    'MAX_BATCH_SIZE': 200,
+    'MAX_WAIT_MS': 2,
+}
+
+
+def get_setting(name):
+    """Returns a BID_GROUP_COMMIT setting, falling back to the defaults"""
+    return getattr(settings, 'BID_GROUP_COMMIT', {}).get(name, DEFAULTS[name])
+
+
+def is_enabled():
+    """Returns true if bids should go through the group commit writer"""
+    return get_setting('ENABLED')
+
+
+class PendingBid:
+    """A queued bid and the future its caller is waiting on"""
+    __slots__ = ('auction_id', 'bidder', 'amount', 'now', 'future')
+
+    def __init__(self, auction_id, bidder, amount, now):
+        self.auction_id = auction_id
+        self.bidder = bidder
+        self.amount = amount
+        self.now = now
+        self.future = Future()
+
+
+class BidBatcher:
+    """Single writer thread deciding queued bids in micro-batches"""
+
+    def __init__(self, max_batch_size=None, max_wait_ms=None):
+        self.max_batch_size = max_batch_size or get_setting('MAX_BATCH_SIZE')
+        self.max_wait = (max_wait_ms if max_wait_ms is not None else get_setting('MAX_WAIT_MS')) / 1000
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self._run, name='bid-group-commit', daemon=True)
+        self.thread.start()
+
+    def submit(self, auction_id, bidder, amount, now=None):
+        """Queues a bid and blocks until its batch commits. Returns the Bid or raises BidRejected"""
+        return self._enqueue(auction_id, bidder, amount, now).result()
+
+    async def asubmit(self, auction_id, bidder, amount, now=None):
+        """Queues a bid and awaits its batch without blocking the event loop"""
+        return await asyncio.wrap_future(self._enqueue(auction_id, bidder, amount, now))
+
+    def _enqueue(self, auction_id, bidder, amount, now):
+        """Hands a bid to the writer thread and returns the future of its answer"""
+        try:
+            auction_id = int(auction_id)
+        except (TypeError, ValueError):
+            raise BidRejected('Auction not found', status.HTTP_404_NOT_FOUND)
+        # An amount the database cannot store would fail the whole batch
+        rejection = check_amount(amount)
+        if rejection:
+            raise rejection
+        pending = PendingBid(auction_id, bidder, amount, now or timezone.now())
+        self.queue.put(pending)
+        return pending.future
+
+    def stop(self):
+        """Lets the writer finish the queued bids and exit"""
+        self.queue.put(None)
+        self.thread.join()
+
+    def _next_batch(self):
+        """Blocks for one bid, then gathers more until the batch is full or the wait expires"""
+        first = self.queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            try:
+                pending = self.queue.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                break
+            if pending is None:
+                # Requeue the stop marker so the loop exits after this batch
+                self.queue.put(None)
+                break
+            batch.append(pending)
+        return batch
+
+    def _run(self):
+        """Writer loop"""
+        try:
+            while True:
+                batch = self._next_batch()
+                if batch is None:
+                    return
+                self._commit(batch)
+        finally:
+            connection.close()
+
+    def _commit(self, batch):
+        """Commits a batch, retrying its bids one by one when it fails so only the failing ones get the error"""
+        try:
+            self.commit(batch)
+        except Exception as exc:
+            undecided = [pending for pending in batch if not pending.future.done()]
+            if len(undecided) == 1:
+                undecided[0].future.set_exception(exc)
+                return
+            for pending in undecided:
+                self._commit([pending])
+
+    def commit(self, batch):
+        """Decides a batch in arrival order and writes it in one transaction"""
+        by_auction = defaultdict(list)
+        for pending in batch:
+            by_auction[pending.auction_id].append(pending)
+
+        accepted = []
+        with write_transaction():
+            auctions = Auction.objects.select_for_update().in_bulk(list(by_auction))
+            for auction_id, bids in by_auction.items():
+                auction = auctions.get(auction_id)
+                for pending in bids:
+                    if auction is None:
+                        pending.future.set_exception(BidRejected('Auction not found', status.HTTP_404_NOT_FOUND))
+                        continue
+                    rejection = check_bid(auction, pending.amount, pending.now)
+                    if rejection:
+                        pending.future.set_exception(rejection)
+                        continue
+                    # Later bids in the batch are checked against this one
+                    auction.current_high_amount = pending.amount
+                    bid = Bid(auction_id=auction.id, bidder_id=pending.bidder.id, amount=pending.amount)
+                    bid.proxy_version = auction.proxy_version
+                    # The version the batch's update below leaves the auction at
+                    bid.auction_version = auction.version + 1
+                    accepted.append((pending, bid))
+
+            bids = Bid.objects.bulk_create([bid for pending, bid in accepted])
+            last_bids = {}
+            counts = defaultdict(int)
+            for bid in bids:
+                last_bids[bid.auction_id] = bid
+                counts[bid.auction_id] += 1
+            for auction_id, bid in last_bids.items():
+                Auction.objects.filter(id=auction_id).update(
+                    current_high_amount=bid.amount,
+                    current_high_bid=bid,
+                    bid_count=F('bid_count') + counts[auction_id],
+                    version=F('version') + 1,
+                )
+
+        # Only answer accepted callers once the transaction has committed
+        for pending, bid in accepted:
+            pending.future.set_result(bid)
+
+
+_batcher = None
+_batcher_lock = threading.Lock()
+
+
+def get_batcher():
+    """Returns the process-wide batcher, starting its writer thread on first use"""
+    global _batcher
+    with _batcher_lock:
+        if _batcher is None:
+            _batcher = BidBatcher()
+        return _batcher
+
+
+def reset_batcher():
+    """Stops the process-wide batcher's writer so the next use starts one from current settings"""
+    global _batcher
+    with _batcher_lock:
+        batcher, _batcher = _batcher, None
+    if batcher is not None:
+        batcher.stop()
+
+
+def place_bid(auction_id, bidder, amount):
+    """Group commit counterpart of auction.bidding.place_bid"""
+    return get_batcher().submit(auction_id, bidder, amount)
+
+
+async def aplace_bid(auction_id, bidder, amount):
+    """Async group commit counterpart of auction.bidding.place_bid"""
+    return await get_batcher().asubmit(auction_id, bidder, amount)
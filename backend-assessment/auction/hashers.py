@@ -0,0 +1,114 @@
+"""Module implementing password hashing on a bounded pool of threads
+
+PBKDF2 is deliberately slow, so a burst of logins or signups hashing on request
+threads takes the CPU away from bidding. PooledPBKDF2PasswordHasher, installed
+first in PASSWORD_HASHERS, runs every PBKDF2 computation (logins, signups and
+rehashes alike) on a pool of PASSWORD_HASHING['WORKERS'] threads; hashlib
+releases the GIL while hashing, so other requests keep running. At most
+MAX_QUEUE computations wait for a worker; beyond that HashingBusy is raised at
+once and the API answers 503 with Retry-After. The hasher's cost is
+PASSWORD_HASHING['ITERATIONS']; Django rehashes a password with the new cost
+the next time its user logs in.
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+DEFAULTS = {
+    'ENABLED': True,
+    'WORKERS': 2,
+    'MAX_QUEUE': 32,
+    'RETRY_AFTER_SECONDS': 1,
+    'ITERATIONS': PBKDF2PasswordHasher.iterations,
+}
+
+
+def get_setting(name):
+    """Returns a PASSWORD_HASHING setting, falling back to the defaults"""
+    return getattr(settings, 'PASSWORD_HASHING', {}).get(name, DEFAULTS[name])
+
+
+class HashingBusy(APIException):
+    """Raised when the hashing pool's queue is full"""
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Too many logins in progress, please retry shortly'
+    default_code = 'hashing_busy'
+
+    def __init__(self, wait=None):
+        super().__init__()
+        # DRF's exception handler turns wait into a Retry-After header
+        self.wait = wait if wait is not None else get_setting('RETRY_AFTER_SECONDS')
+
+
+class HashingPool:
+    """Thread pool that refuses work instead of queueing beyond max_queue"""
+
+    def __init__(self, workers=None, max_queue=None):
+        workers = workers or get_setting('WORKERS')
+        max_queue = max_queue if max_queue is not None else get_setting('MAX_QUEUE')
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hashing')
+        self.slots = threading.BoundedSemaphore(workers + max_queue)
+
+    def submit(self, fn, *args):
+        """Schedules fn(*args) and returns its future. Raises HashingBusy when full"""
+        if not self.slots.acquire(blocking=False):
+            raise HashingBusy()
+        try:
+            future = self.executor.submit(fn, *args)
+        except BaseException:
+            self.slots.release()
+            raise
+        future.add_done_callback(lambda _: self.slots.release())
+        return future
+
+    def run(self, fn, *args):
+        """Runs fn(*args) on the pool and returns its result"""
+        return self.submit(fn, *args).result()
+
+    def shutdown(self):
+        """Waits for the running and queued computations, then stops the workers"""
+        self.executor.shutdown(wait=True)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Returns the process-wide hashing pool, starting it on first use"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = HashingPool()
+        return _pool
+
+
+def reset_pool():
+    """Shuts the process-wide pool down so the next use starts one from current settings"""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown()
+
+
+class PooledPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """PBKDF2-SHA256 hasher with a tunable cost that hashes on the bounded pool.
+
+    It keeps the pbkdf2_sha256 algorithm name, so existing hashes verify as-is.
+    """
+
+    @property
+    def iterations(self):
+        """Returns the PBKDF2 cost new hashes are made with, from PASSWORD_HASHING"""
+        return get_setting('ITERATIONS')
+
+    def encode(self, password, salt, iterations=None):
+        """Hashes the password on the pool. Raises HashingBusy when the pool is full"""
+        if not get_setting('ENABLED'):
+            return super().encode(password, salt, iterations)
+        return get_pool().run(super().encode, password, salt, iterations)
@@ -0,0 +1,188 @@
+"""Module implementing Idempotency-Key handling for retried POST requests
+
+Clients resend a POST whose response timed out with the same Idempotency-Key
+header. Handlers decorated with @idempotent run the first request of a user's
+key and keep its response (status and compact JSON body, client errors included
+but not 5xx, which are worth retrying) for IDEMPOTENCY['TTL_SECONDS']: in the
+cache first and in the IdempotencyKey table, which outlives cache evictions and
+restarts. Retries are answered from the cache, or else from one indexed read of
+that table, with an Idempotent-Replayed header, and never reach the auction
+tables. Reusing a key for a different request (endpoint or body) answers 422.
+
+Concurrent duplicates collapse into one run: the first claims the key in the
+cache with an atomic add, and the others wait up to WAIT_SECONDS for its
+response (in the same process on an event, from other workers by polling the
+cache) and replay it, or get 409 while it is still running. The response is
+kept after the view's own transaction commits, so a worker dying in between lets
+a retry run the request again. prune_expired_keys() (manage.py
+prune_idempotency_keys) deletes expired rows.
+"""
+
+import functools
+import hashlib
+import json
+import threading
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+from .models import IdempotencyKey
+from .sqlite import write_transaction
+
+DEFAULTS = {
+    'ENABLED': True,
+    'TTL_SECONDS': 24 * 60 * 60,
+    'LOCK_SECONDS': 30,
+    'WAIT_SECONDS': 5,
+}
+
+HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = 255
+CACHE_KEY = 'idempotency:%d:%s'
+LOCK_KEY = 'idempotency-lock:%d:%s'
+POLL_SECONDS = 0.05
+DEFAULT_PRUNE_BATCH_SIZE = 5000
+
+# Cache keys of the requests this process is running, to the events set when they finish
+_running = {}
+_running_lock = threading.Lock()
+
+
+def get_setting(name):
+    """Returns an IDEMPOTENCY setting, falling back to the defaults"""
+    return getattr(settings, 'IDEMPOTENCY', {}).get(name, DEFAULTS[name])
+
+
+def request_fingerprint(request):
+    """Returns the SHA-256 of the request's method, path and parsed body"""
+    data = request.data
+    if hasattr(data, 'lists'):
+        data = dict(data.lists())
+    body = json.dumps(data, sort_keys=True, separators=(',', ':'), cls=JSONEncoder)
+    return hashlib.sha256(('%s %s %s' % (request.method, request.path, body)).encode()).hexdigest()
+
+
+def lookup(user_id, key, cache_key):
+    """Returns the (fingerprint, status code, body) kept for a user's key, or None"""
+    stored = cache.get(cache_key)
+    if stored is not None:
+        return stored
+    now = timezone.now()
+    row = IdempotencyKey.objects.filter(user_id=user_id, key=key, expires_at__gt=now).values_list(
+        'fingerprint', 'status_code', 'body', 'expires_at'
+    ).first()
+    if row is None:
+        return None
+    stored = row[:3]
+    cache.set(cache_key, stored, (row[3] - now).total_seconds())
+    return stored
+
+
+def keep(user_id, key, cache_key, stored):
+    """Keeps a first response in the cache and the database for TTL_SECONDS"""
+    ttl = get_setting('TTL_SECONDS')
+    cache.set(cache_key, stored, ttl)
+    fingerprint, status_code, body = stored
+    with write_transaction():
+        # One upsert, replacing an expired row left for the same key
+        IdempotencyKey.objects.bulk_create([IdempotencyKey(
+            user_id=user_id, key=key, fingerprint=fingerprint, status_code=status_code, body=body,
+            expires_at=timezone.now() + timedelta(seconds=ttl),
+        )], update_conflicts=True, unique_fields=['user', 'key'],
+            update_fields=['fingerprint', 'status_code', 'body', 'expires_at'])
+
+
+def replay(stored, fingerprint):
+    """Returns the response to a retry of the request a kept response answered"""
+    if stored[0] != fingerprint:
+        return Response({'error': 'Idempotency-Key was already used for a different request'},
+                        status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+    return Response(json.loads(stored[2]), status=stored[1], headers={REPLAYED_HEADER: 'true'})
+
+
+def wait_elsewhere(user_id, key, cache_key, lock_key):
+    """Polls until another worker's run of a key is kept or abandoned, returning what it kept"""
+    deadline = time.monotonic() + get_setting('WAIT_SECONDS')
+    while time.monotonic() < deadline:
+        time.sleep(POLL_SECONDS)
+        stored = cache.get(cache_key)
+        if stored is not None or cache.get(lock_key) is None:
+            return stored or lookup(user_id, key, cache_key)
+    return None
+
+
+def in_progress():
+    """Returns the 409 sent to a duplicate whose first request is still running"""
+    return Response({'error': 'A request with this Idempotency-Key is still in progress'},
+                    status=status.HTTP_409_CONFLICT)
+
+
+def run_once(user_id, key, fingerprint, run):
+    """Returns run()'s response for the first request of a user's key and the kept one for its duplicates"""
+    digest = hashlib.sha256(key.encode()).hexdigest()
+    cache_key, lock_key = CACHE_KEY % (user_id, digest), LOCK_KEY % (user_id, digest)
+    stored = lookup(user_id, key, cache_key)
+    if stored is not None:
+        return replay(stored, fingerprint)
+
+    with _running_lock:
+        finished = _running.get(cache_key)
+        if finished is None:
+            _running[cache_key] = threading.Event()
+    if finished is not None:
+        finished.wait(get_setting('WAIT_SECONDS'))
+        stored = lookup(user_id, key, cache_key)
+        return replay(stored, fingerprint) if stored is not None else in_progress()
+
+    try:
+        # The run this one waited behind may have just finished
+        stored = lookup(user_id, key, cache_key)
+        if stored is not None:
+            return replay(stored, fingerprint)
+        if not cache.add(lock_key, fingerprint, get_setting('LOCK_SECONDS')):
+            stored = wait_elsewhere(user_id, key, cache_key, lock_key)
+            return replay(stored, fingerprint) if stored is not None else in_progress()
+        try:
+            response = run()
+            if response.status_code < 500 and not response.streaming:
+                body = json.dumps(response.data, separators=(',', ':'), cls=JSONEncoder)
+                keep(user_id, key, cache_key, (fingerprint, response.status_code, body))
+            return response
+        finally:
+            cache.delete(lock_key)
+    finally:
+        with _running_lock:
+            _running.pop(cache_key).set()
+
+
+def idempotent(handler):
+    """Makes an APIView handler answer the retries of a request with an Idempotency-Key from its first response"""
+    @functools.wraps(handler)
+    def wrapper(view, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if key is None or not get_setting('ENABLED') or not request.user.is_authenticated:
+            return handler(view, request, *args, **kwargs)
+        if not key or len(key) > MAX_KEY_LENGTH:
+            return Response({'error': 'Idempotency-Key must be 1 to %d characters' % MAX_KEY_LENGTH},
+                            status=status.HTTP_400_BAD_REQUEST)
+        return run_once(request.user.id, key, request_fingerprint(request), lambda: handler(view, request, *args, **kwargs))
+    return wrapper
+
+
+def prune_expired_keys(now=None, batch_size=DEFAULT_PRUNE_BATCH_SIZE, pause=0):
+    """Deletes expired IdempotencyKey rows in batches, each in its own short transaction, and returns how many"""
+    now = now or timezone.now()
+    deleted = 0
+    while True:
+        ids = list(IdempotencyKey.objects.filter(expires_at__lte=now).values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        with write_transaction():
+            deleted += IdempotencyKey.objects.filter(id__in=ids).delete()[0]
+        if pause:
+            time.sleep(pause)
@@ -0,0 +1,161 @@
+"""Module implementing per-auction leaderboards of the highest bids, in process memory
+
+Each resident auction keeps its SIZE highest bids, serialized once, in a list
+ordered by amount (then id) alongside the sort keys, so a top-N read is a slice
+and an accepted bid, nearly always the new highest, is one bisect and insert.
+Boards are rebuilt from the bids and archived bids tables on first read and at
+most MAX_AUCTIONS stay resident, the least recently read evicted first.
+
+Bids may be placed or deleted by any process, so each board holds the auction
+version it reflects and a read serves it only while that is still the auction's
+version, at the cost of one primary key read. Accepted bids carry the version
+their write committed, so the process placing them moves its board along; a
+board that missed a write (placed elsewhere, deleted, closed) is rebuilt.
+"""
+
+import heapq
+import threading
+from bisect import bisect_left
+from collections import OrderedDict
+from django.conf import settings
+from .models import ArchivedBid, Auction, Bid
+from .read_serializers import bid_reader
+from .routing import use_primary
+
+DEFAULTS = {
+    'SIZE': 50,
+    'MAX_AUCTIONS': 1000,
+}
+
+DEFAULT_TOP = 10
+
+
+def get_setting(name):
+    """Returns a BID_LEADERBOARD setting, falling back to the defaults"""
+    return getattr(settings, 'BID_LEADERBOARD', {}).get(name, DEFAULTS[name])
+
+
+def sort_key(amount, bid_id):
+    """Returns the key ordering bids highest first, earliest first among equal amounts"""
+    return -amount, bid_id
+
+
+class Board:
+    """Highest bids of one auction, as sort keys and serialized bids in the same order"""
+    __slots__ = ('keys', 'rows', 'complete', 'version')
+
+    def __init__(self, keys, rows, complete, version):
+        self.keys = keys
+        self.rows = rows
+        # Whether the board holds every bid of the auction
+        self.complete = complete
+        # The auction's version the board reflects
+        self.version = version
+
+    def insert(self, key, row, size):
+        """Adds a bid unless it is already there or ranks below bids the board no longer holds"""
+        index = bisect_left(self.keys, key)
+        if index < len(self.keys) and self.keys[index] == key:
+            return
+        if index == len(self.keys) and not self.complete:
+            return
+        self.keys.insert(index, key)
+        self.rows.insert(index, row)
+        if len(self.keys) > size:
+            del self.keys[size:], self.rows[size:]
+            self.complete = False
+
+
+def top_rows(auction_id, size):
+    """Returns the bid_reader rows of an auction's size highest bids from both bid tables"""
+    ordering = ('-amount', 'id')
+    hot = bid_reader.values(Bid.objects.filter(auction_id=auction_id).order_by(*ordering)[:size])
+    archived = bid_reader.values(ArchivedBid.objects.filter(auction_id=auction_id).order_by(*ordering)[:size])
+    rows = []
+    for row in heapq.merge(hot, archived, key=lambda row: sort_key(row.amount, row.id)):
+        # A bid being archived, or the winning bid, is in both tables
+        if not rows or rows[-1].id != row.id:
+            rows.append(row)
+    return rows[:size]
+
+
+class Leaderboards:
+    """LRU of the boards of the auctions read lately"""
+
+    def __init__(self, size=None, max_auctions=None):
+        self.size = size or get_setting('SIZE')
+        self.max_auctions = max_auctions or get_setting('MAX_AUCTIONS')
+        self.boards = OrderedDict()
+        self.lock = threading.Lock()
+
+    def top(self, auction_id, n):
+        """Returns the serialized n highest bids of an auction, or None when it does not exist"""
+        with use_primary():
+            version = Auction.objects.filter(id=auction_id).values_list('version', flat=True).first()
+        if version is None:
+            self.forget(auction_id)
+            return None
+        with self.lock:
+            board = self.boards.get(auction_id)
+            if board is not None and board.version == version and (board.complete or n <= len(board.rows)):
+                self.boards.move_to_end(auction_id)
+                return board.rows[:n]
+        board = self.load(auction_id, version)
+        with self.lock:
+            resident = self.boards.get(auction_id)
+            # Another read or a recorded bid may have moved the board further meanwhile
+            if resident is None or resident.version <= version:
+                self.boards[auction_id] = board
+                self.boards.move_to_end(auction_id)
+                if len(self.boards) > self.max_auctions:
+                    self.boards.popitem(last=False)
+        return board.rows[:n]
+
+    def load(self, auction_id, version):
+        """Builds an auction's board from the database, read after its version was"""
+        # Rows read later can only be newer than the version, which a read then rebuilds
+        with use_primary():
+            rows = top_rows(auction_id, self.size + 1)
+        complete = len(rows) <= self.size
+        rows = rows[:self.size]
+        return Board([sort_key(row.amount, row.id) for row in rows], bid_reader.encode_rows(rows), complete, version)
+
+    def record_bids(self, bids):
+        """Adds accepted bids to the resident boards they follow on from, dropping boards that missed a write"""
+        rows = bid_reader.encode_instances(bids)
+        with self.lock:
+            for bid, row in zip(bids, rows):
+                board = self.boards.get(bid.auction_id)
+                if board is None:
+                    continue
+                version = getattr(bid, 'auction_version', None)
+                if version is None or not board.version <= version <= board.version + 1:
+                    del self.boards[bid.auction_id]
+                    continue
+                board.insert(sort_key(bid.amount, bid.id), row, self.size)
+                board.version = version
+
+    def forget(self, auction_id):
+        """Drops an auction's board, once the auction or some of its bids are deleted"""
+        with self.lock:
+            self.boards.pop(auction_id, None)
+
+
+_leaderboards = None
+_leaderboards_lock = threading.Lock()
+
+
+def get_leaderboards():
+    """Returns the process-wide leaderboards, creating them from current settings on first use"""
+    global _leaderboards
+    with _leaderboards_lock:
+        if _leaderboards is None:
+            _leaderboards = Leaderboards()
+        return _leaderboards
+
+
+def reset_leaderboards():
+    """Discards the process-wide leaderboards so the next use starts from current settings"""
+    global _leaderboards
+    with _leaderboards_lock:
+        _leaderboards = None
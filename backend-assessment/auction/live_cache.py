@@ -0,0 +1,221 @@
+"""Module caching the public live auction listing in Django's cache framework
+
+The listing is an index of (id, start_time, end_time) for every auction that has
+not ended, kept under a versioned key, plus one cache entry per auction. Creating
+or deleting an auction bumps the version so the index is rebuilt on the next read,
+while bids and edits drop only the entry of the auction they touch, reloaded from
+its row on the next read. Entries are filled from the primary rather than a
+lagging replica, and not at all when a write was reported while loading them, so
+a load racing a bid cannot cache the high it replaced.
+
+Every write reported here, each of which bumps an auction's version, also bumps
+a changes counter; with the ids live at the time it makes the listing's ETag,
+checked without reading the entries or the auction rows.
+"""
+
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.utils import timezone
+from .models import Auction
+from .read_serializers import live_auction_reader
+from .caching import acache
+from .conditional import listing_etag
+from .routing import use_primary
+
+VERSION_KEY = 'live-auctions:version'
+CHANGES_KEY = 'live-auctions:changes'
+INDEX_KEY = 'live-auctions:index:%d'
+ENTRY_KEY = 'live-auctions:auction:%d'
+
+
+def _timeout():
+    """Returns how long index and entries stay cached, in seconds"""
+    return getattr(settings, 'LIVE_AUCTIONS_CACHE_TIMEOUT', 60)
+
+
+def _version(key=VERSION_KEY):
+    """Returns the current index version, or another counter, seeding it if the key was evicted"""
+    version = cache.get(key)
+    if version is None:
+        # Seed from the clock so an evicted counter never reuses an old index key
+        cache.add(key, int(time.time() * 1000), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+async def _aversion(key=VERSION_KEY):
+    """Async counterpart of _version"""
+    version = await acache('get', key)
+    if version is None:
+        await acache('add', key, int(time.time() * 1000), timeout=None)
+        version = await acache('get', key)
+    return version
+
+
+def _bump_version(key=VERSION_KEY):
+    """Invalidates the index by moving readers to a new version, or bumps another counter"""
+    try:
+        cache.incr(key)
+    except ValueError:
+        _version(key)
+
+
+def _bump_changes():
+    """Changes the listing's ETag"""
+    _bump_version(CHANGES_KEY)
+
+
+async def _abump_changes():
+    """Async counterpart of _bump_changes"""
+    try:
+        await acache('incr', CHANGES_KEY)
+    except ValueError:
+        await _aversion(CHANGES_KEY)
+
+
+def _entries_queryset(ids):
+    """Returns the rows cached entries are built from for the given auctions"""
+    return live_auction_reader.values(Auction.objects.filter(id__in=ids))
+
+
+def _index_queryset(now):
+    """Returns the (id, start_time, end_time) rows of auctions that have not ended"""
+    return (
+        Auction.objects.filter(end_time__gte=now)
+        .order_by('end_time', 'id')
+        .values_list('id', 'start_time', 'end_time')
+    )
+
+
+def _live_keys(index, now):
+    """Returns the entry keys of indexed auctions that are active at the given time"""
+    return [ENTRY_KEY % pk for pk, start_time, end_time in index if start_time <= now <= end_time]
+
+
+def _missing_ids(keys, entries):
+    """Returns the auction ids whose entries were not found in the cache"""
+    return [int(key.rsplit(':', 1)[1]) for key in keys if key not in entries]
+
+
+def _index(now):
+    """Returns the cached index, loading it on a miss"""
+    index_key = INDEX_KEY % _version()
+    index = cache.get(index_key)
+    if index is None:
+        with use_primary():
+            index = list(_index_queryset(now))
+        cache.set(index_key, index, _timeout())
+    return index
+
+
+async def _aindex(now):
+    """Async counterpart of _index"""
+    index_key = INDEX_KEY % await _aversion()
+    index = await acache('get', index_key)
+    if index is None:
+        with use_primary():
+            index = [row async for row in _index_queryset(now)]
+        await acache('set', index_key, index, _timeout())
+    return index
+
+
+def _listing_etag(changes, index, now):
+    """Returns the listing's ETag from the changes counter and the ids live at the given time"""
+    return listing_etag([changes, *(pk for pk, start_time, end_time in index if start_time <= now <= end_time)])
+
+
+def get_listing_etag(now=None):
+    """Returns the ETag of the live listing at the given time, from the cache only"""
+    now = now or timezone.now()
+    return _listing_etag(_version(CHANGES_KEY), _index(now), now)
+
+
+async def aget_listing_etag(now=None):
+    """Async counterpart of get_listing_etag"""
+    now = now or timezone.now()
+    return _listing_etag(await _aversion(CHANGES_KEY), await _aindex(now), now)
+
+
+def get_live_auctions(now=None):
+    """Returns the active auctions, touching the database only for cache misses"""
+    now = now or timezone.now()
+    index = _index(now)
+
+    keys = _live_keys(index, now)
+    entries = cache.get_many(keys)
+    missing = _missing_ids(keys, entries)
+    if missing:
+        changes = _version(CHANGES_KEY)
+        with use_primary():
+            loaded = {ENTRY_KEY % row.id: live_auction_reader.encode(row) for row in _entries_queryset(missing)}
+        # A write reported while loading may be missing from the rows read
+        if _version(CHANGES_KEY) == changes:
+            cache.set_many(loaded, _timeout())
+        entries.update(loaded)
+    return [entries[key] for key in keys if key in entries]
+
+
+async def aget_live_auctions(now=None):
+    """Async counterpart of get_live_auctions using the async cache and ORM APIs"""
+    now = now or timezone.now()
+    index = await _aindex(now)
+
+    keys = _live_keys(index, now)
+    entries = await acache('get_many', keys)
+    missing = _missing_ids(keys, entries)
+    if missing:
+        changes = await _aversion(CHANGES_KEY)
+        with use_primary():
+            loaded = {ENTRY_KEY % row.id: live_auction_reader.encode(row) async for row in _entries_queryset(missing)}
+        if await _aversion(CHANGES_KEY) == changes:
+            await acache('set_many', loaded, _timeout())
+        entries.update(loaded)
+    return [entries[key] for key in keys if key in entries]
+
+
+def record_bid(bid):
+    """Drops the cached entry of an accepted bid's auction so the next read loads the new high"""
+    auction_changed(bid.auction_id)
+
+
+async def arecord_bid(bid):
+    """Async counterpart of record_bid"""
+    await _abump_changes()
+    await acache('delete', ENTRY_KEY % bid.auction_id)
+
+
+def auction_created(auction):
+    """Invalidates the index so the new auction is picked up"""
+    _bump_version()
+    _bump_changes()
+
+
+def auction_changed(auction_id):
+    """Drops a single auction's entry so it is reloaded on the next read"""
+    # Bumped first so a read loading the entry now does not cache the old row
+    _bump_changes()
+    cache.delete(ENTRY_KEY % auction_id)
+
+
+@receiver(post_save, sender=Auction)
+def auction_saved(sender, instance, created, **kwargs):
+    """Drops an edited auction's entry; views report created auctions themselves"""
+    if not created:
+        auction_changed(instance.id)
+
+
+def auction_deleted(auction_id):
+    """Drops a deleted auction from both its entry and the index"""
+    _bump_changes()
+    cache.delete(ENTRY_KEY % auction_id)
+    _bump_version()
+
+
+def auctions_closed(auction_ids):
+    """Drops closed auctions from both their entries and the index"""
+    _bump_changes()
+    cache.delete_many([ENTRY_KEY % pk for pk in auction_ids])
+    _bump_version()
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from auction.archiving import DEFAULT_ARCHIVE_AFTER_DAYS, DEFAULT_CHUNK_SIZE, archive_bids
+
+
+class Command(BaseCommand):
+    help = 'Moves the bids of long closed auctions to the archive table in bounded chunks and summarizes each auction'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=DEFAULT_ARCHIVE_AFTER_DAYS,
+                            help='Archive auctions that ended more than this many days ago')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                            help='Bids moved per transaction')
+        parser.add_argument('--pause', type=float, default=0,
+                            help='Seconds to sleep between chunks')
+
+    def handle(self, *args, **options):
+        auctions, bids = archive_bids(after_days=options['days'], chunk_size=options['chunk_size'], pause=options['pause'])
+        self.stdout.write(self.style.SUCCESS('Archived %d bids of %d auctions' % (bids, auctions)))
@@ -0,0 +1,21 @@
+import os
+from django.core.management.base import BaseCommand, CommandError
+from auction.api_docs import SchemaDocument, generate_schema, get_setting
+
+
+class Command(BaseCommand):
+    help = 'Generates the OpenAPI schema once, at build time, into the file the docs endpoints serve'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default=None, help="File to write, API_SCHEMA['PATH'] by default")
+
+    def handle(self, *args, **options):
+        path = options['output'] or get_setting('PATH')
+        if not path:
+            raise CommandError("Pass --output or set API_SCHEMA['PATH']")
+        document = SchemaDocument(generate_schema())
+        # Replaced in one step, so workers starting meanwhile never read half a schema
+        with open('%s.tmp' % path, 'wb') as schema_file:
+            schema_file.write(document.content)
+        os.replace('%s.tmp' % path, path)
+        self.stdout.write(self.style.SUCCESS('Wrote the API schema to %s (ETag %s)' % (path, document.etag)))
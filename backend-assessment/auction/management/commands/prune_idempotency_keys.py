@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from auction.idempotency import DEFAULT_PRUNE_BATCH_SIZE, prune_expired_keys
+
+
+class Command(BaseCommand):
+    help = 'Deletes expired idempotency keys and their kept responses in bounded batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_PRUNE_BATCH_SIZE,
+                            help='Rows deleted per transaction')
+        parser.add_argument('--pause', type=float, default=0,
+                            help='Seconds to sleep between batches')
+
+    def handle(self, *args, **options):
+        deleted = prune_expired_keys(batch_size=options['batch_size'], pause=options['pause'])
+        self.stdout.write(self.style.SUCCESS('Deleted %d expired idempotency keys' % deleted))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from auction.search import ensure_index, rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Recreates missing auction search index objects and reindexes every auction'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default', help='Database alias to reindex')
+
+    def handle(self, *args, **options):
+        ensure_index(options['database'])
+        rebuild_index(options['database'])
+        self.stdout.write(self.style.SUCCESS('Rebuilt the auction search index'))
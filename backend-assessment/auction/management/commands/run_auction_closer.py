@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from auction.closing import AuctionCloser, DEFAULT_BATCH_SIZE, DEFAULT_POLL_SECONDS
+
+
+class Command(BaseCommand):
+    help = 'Runs a worker that closes auctions at their end time and records the winning bid'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                            help='Auctions closed per transaction')
+        parser.add_argument('--poll', type=float, default=DEFAULT_POLL_SECONDS,
+                            help='Seconds between checks for newly created auctions')
+        parser.add_argument('--once', action='store_true',
+                            help='Close the auctions that are already due and exit')
+
+    def handle(self, *args, **options):
+        closer = AuctionCloser(batch_size=options['batch_size'], poll_seconds=options['poll'])
+        if options['once']:
+            closed = closer.run_once()
+            self.stdout.write(self.style.SUCCESS('Closed %d auctions' % closed))
+            return
+        self.stdout.write('Auction closer running, press CTRL+C to stop')
+        try:
+            closer.run_forever()
+        except KeyboardInterrupt:
+            closer.stop()
@@ -0,0 +1,31 @@
+import time
+from django.core.management.base import BaseCommand
+from auction.deletion import DEFAULT_POLL_SECONDS, run_pending_jobs
+
+
+class Command(BaseCommand):
+    help = 'Runs background auction deletions, resuming the ones a stopped process left unfinished'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--poll', type=float, default=DEFAULT_POLL_SECONDS,
+                            help='Seconds between looks for new jobs')
+        parser.add_argument('--retry-failed', action='store_true',
+                            help='Also rerun jobs that failed')
+        parser.add_argument('--once', action='store_true',
+                            help='Run the jobs waiting now and exit')
+
+    def handle(self, *args, **options):
+        if options['once']:
+            done = run_pending_jobs(retry_failed=options['retry_failed'])
+            self.stdout.write(self.style.SUCCESS('Completed %d deletion jobs' % done))
+            return
+        self.stdout.write('Deletion job runner running, press CTRL+C to stop')
+        retry_failed = options['retry_failed']
+        try:
+            while True:
+                run_pending_jobs(retry_failed=retry_failed)
+                # Failed jobs are retried once per start, not in a loop
+                retry_failed = False
+                time.sleep(options['poll'])
+        except KeyboardInterrupt:
+            pass
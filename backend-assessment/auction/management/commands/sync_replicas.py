@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from auction.routing import get_setting, sync_sqlite_replica
+
+
+class Command(BaseCommand):
+    help = 'Copies the primary SQLite database over local replicas (DATABASE_ROUTING REPLICAS by default)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('aliases', nargs='*', help='Replica aliases to refresh')
+
+    def handle(self, *args, **options):
+        for alias in options['aliases'] or get_setting('REPLICAS'):
+            sync_sqlite_replica(alias)
+            self.stdout.write(self.style.SUCCESS('Copied the primary database to %s' % alias))
@@ -0,0 +1,283 @@
+"""Module implementing per-view request metrics and their Prometheus exposition
+
+MetricsMiddleware times every request, and an execute wrapper installed on every
+new connection counts its queries and their time. The wrapper finds the request
+through a context variable: connections are per thread, and async views query
+on sync_to_async threads that the middleware's own connection never sees. Token
+authentication and JSON rendering add their own time to the request while it
+runs. When the response is ready the request's figures are folded into per
+(view, method) aggregates under one short lock: request counts by status, a
+latency histogram and totals of queries, database, authentication and
+serialization seconds. /metrics returns them in the Prometheus text format.
+
+Aggregates are per process, so scrape every worker. Requests slower than
+REQUEST_METRICS['SLOW_REQUEST_SECONDS'] are logged with their queries to the
+auction.metrics logger. Streaming bodies run after the middleware returns, so
+only the time to their first byte is measured.
+"""
+
+import bisect
+import contextlib
+import contextvars
+import hmac
+import logging
+import threading
+import time
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from rest_framework.renderers import JSONRenderer
+
+DEFAULTS = {
+    'ENABLED': True,
+    'BUCKETS': (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+    'SLOW_REQUEST_SECONDS': None,
+    'SLOW_REQUEST_MAX_QUERIES': 100,
+    'TOKEN': None,
+}
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+UNMATCHED_VIEW = 'unmatched'
+
+logger = logging.getLogger(__name__)
+
+_current = contextvars.ContextVar('request_metrics', default=None)
+
+
+def get_setting(name):
+    """Returns a REQUEST_METRICS setting, falling back to the defaults"""
+    return getattr(settings, 'REQUEST_METRICS', {}).get(name, DEFAULTS[name])
+
+
+class RequestMetrics:
+    """Figures of the request being handled, also timing its queries"""
+    __slots__ = ('queries', 'db_seconds', 'authentication_seconds', 'serialization_seconds', 'query_log', 'max_logged')
+
+    def __init__(self, log_queries=False):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.authentication_seconds = 0.0
+        self.serialization_seconds = 0.0
+        self.query_log = [] if log_queries else None
+        self.max_logged = get_setting('SLOW_REQUEST_MAX_QUERIES')
+
+    def __call__(self, execute, sql, params, many, context):
+        """Runs a query, counting it and its time and logging it when slow requests are logged"""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.queries += 1
+            self.db_seconds += elapsed
+            if self.query_log is not None and len(self.query_log) < self.max_logged:
+                self.query_log.append((elapsed, sql))
+
+
+def time_query(execute, sql, params, many, context):
+    """Execute wrapper passing the query to the current request's metrics, if any"""
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    return metrics(execute, sql, params, many, context)
+
+
+@receiver(connection_created)
+def install_query_timer(sender, connection, **kwargs):
+    """Installs time_query on a connection the first time it connects"""
+    if time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(time_query)
+
+
+def add_time(timer, started):
+    """Adds the time since started to the current request's authentication or serialization timer"""
+    metrics = _current.get()
+    if metrics is not None:
+        attribute = timer + '_seconds'
+        setattr(metrics, attribute, getattr(metrics, attribute) + time.perf_counter() - started)
+
+
+@contextlib.contextmanager
+def timed(timer):
+    """Adds the time spent in the block to the current request's timer"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_time(timer, started)
+
+
+class ViewStats:
+    """Aggregated figures of one (view, method) pair"""
+    __slots__ = ('statuses', 'buckets', 'latency_seconds', 'queries', 'db_seconds',
+                 'authentication_seconds', 'serialization_seconds')
+
+    def __init__(self, bucket_count):
+        self.statuses = {}
+        self.buckets = [0] * (bucket_count + 1)
+        self.latency_seconds = 0.0
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.authentication_seconds = 0.0
+        self.serialization_seconds = 0.0
+
+
+class Registry:
+    """Process-wide aggregates of request metrics"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Drops every aggregate and rereads the histogram buckets from settings"""
+        with self.lock:
+            self.bounds = tuple(sorted(get_setting('BUCKETS')))
+            self.views = {}
+
+    def observe(self, view, method, status_code, seconds, metrics):
+        """Folds one finished request into its view's aggregates"""
+        with self.lock:
+            bucket = bisect.bisect_left(self.bounds, seconds)
+            stats = self.views.get((view, method))
+            if stats is None:
+                stats = self.views[(view, method)] = ViewStats(len(self.bounds))
+            stats.statuses[status_code] = stats.statuses.get(status_code, 0) + 1
+            stats.buckets[bucket] += 1
+            stats.latency_seconds += seconds
+            stats.queries += metrics.queries
+            stats.db_seconds += metrics.db_seconds
+            stats.authentication_seconds += metrics.authentication_seconds
+            stats.serialization_seconds += metrics.serialization_seconds
+
+    def render(self):
+        """Returns the aggregates in the Prometheus text exposition format"""
+        lines = [
+            '# HELP http_requests_total Requests handled, by view, method and status.',
+            '# TYPE http_requests_total counter',
+        ]
+        with self.lock:
+            views = sorted(self.views.items())
+            for (view, method), stats in views:
+                for status_code, count in sorted(stats.statuses.items()):
+                    lines.append('http_requests_total{%s,status="%d"} %d' % (_labels(view, method), status_code, count))
+            lines += [
+                '# HELP http_request_duration_seconds Time to the response, by view and method.',
+                '# TYPE http_request_duration_seconds histogram',
+            ]
+            for (view, method), stats in views:
+                labels = _labels(view, method)
+                cumulative = 0
+                for bound, count in zip(self.bounds + (None,), stats.buckets):
+                    cumulative += count
+                    le = '+Inf' if bound is None else repr(float(bound))
+                    lines.append('http_request_duration_seconds_bucket{%s,le="%s"} %d' % (labels, le, cumulative))
+                lines.append('http_request_duration_seconds_sum{%s} %r' % (labels, stats.latency_seconds))
+                lines.append('http_request_duration_seconds_count{%s} %d' % (labels, cumulative))
+            for name, attribute, help_text in (
+                ('http_request_db_queries_total', 'queries', 'Database queries run by requests'),
+                ('http_request_db_seconds_total', 'db_seconds', 'Time requests spent in database queries'),
+                ('http_request_authentication_seconds_total', 'authentication_seconds', 'Time requests spent authenticating tokens'),
+                ('http_request_serialization_seconds_total', 'serialization_seconds', 'Time requests spent rendering JSON'),
+            ):
+                lines += ['# HELP %s %s, by view and method.' % (name, help_text), '# TYPE %s counter' % name]
+                for (view, method), stats in views:
+                    lines.append('%s{%s} %r' % (name, _labels(view, method), getattr(stats, attribute)))
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    """Escapes a label value for the Prometheus text format"""
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(view, method):
+    """Returns the label set of a (view, method) series"""
+    return 'view="%s",method="%s"' % (_escape(view), _escape(method))
+
+
+registry = Registry()
+
+
+def is_authorized(request):
+    """Returns whether the request may read /metrics, which REQUEST_METRICS['TOKEN'] guards when set"""
+    token = get_setting('TOKEN')
+    if not token:
+        return True
+    return hmac.compare_digest(request.headers.get('Authorization', ''), 'Bearer ' + token)
+
+
+class MetricsMiddleware:
+    """Measures every request and records it in the registry, for sync and async views alike"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def _start(self):
+        """Returns the new request's metrics and the token restoring the previous ones"""
+        metrics = RequestMetrics(log_queries=get_setting('SLOW_REQUEST_SECONDS') is not None)
+        return metrics, _current.set(metrics)
+
+    def _record(self, request, response, metrics, seconds):
+        """Folds a finished request into the registry, logging it when slow"""
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match is not None else UNMATCHED_VIEW
+        registry.observe(view, request.method, response.status_code, seconds, metrics)
+        threshold = get_setting('SLOW_REQUEST_SECONDS')
+        if threshold is not None and seconds >= threshold:
+            log_slow_request(request, response, seconds, metrics)
+
+    def __call__(self, request):
+        """Measures a request served by a sync handler"""
+        if self.is_async:
+            return self.__acall__(request)
+        if not get_setting('ENABLED'):
+            return self.get_response(request)
+        metrics, token = self._start()
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self._record(request, response, metrics, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        """Measures a request served by an async handler"""
+        if not get_setting('ENABLED'):
+            return await self.get_response(request)
+        metrics, token = self._start()
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        self._record(request, response, metrics, time.perf_counter() - started)
+        return response
+
+
+def log_slow_request(request, response, seconds, metrics):
+    """Logs a slow request with the queries it ran"""
+    queries = ''.join('\n  %.2f ms  %s' % (elapsed * 1000, sql) for elapsed, sql in metrics.query_log)
+    if metrics.queries > len(metrics.query_log):
+        queries += '\n  ... %d more' % (metrics.queries - len(metrics.query_log))
+    logger.warning(
+        'Slow request %s %s %d in %.1f ms: %d queries in %.1f ms, authentication %.1f ms, serialization %.1f ms%s',
+        request.method, request.get_full_path(), response.status_code, seconds * 1000, metrics.queries,
+        metrics.db_seconds * 1000, metrics.authentication_seconds * 1000, metrics.serialization_seconds * 1000, queries,
+    )
+
+
+class TimedJSONRenderer(JSONRenderer):
+    """JSONRenderer adding its time to the request's serialization timer"""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        """Renders the data as JSON, timing it"""
+        with timed('serialization'):
+            return super().render(data, accepted_media_type, renderer_context)
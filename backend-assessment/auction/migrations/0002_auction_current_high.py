@@ -0,0 +1,45 @@
+# Generated by Django 5.2 on 2026-10-18 05:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_current_high(apps, schema_editor):
+    """Populates the denormalized high bid fields for existing auctions"""
+    Auction = apps.get_model('auction', 'Auction')
+    Bid = apps.get_model('auction', 'Bid')
+    for auction in Auction.objects.iterator():
+        bids = Bid.objects.filter(auction_id=auction.pk)
+        # Ties go to the earliest bid, as in Auction.refresh_current_high
+        top = bids.order_by('-amount', 'id').first()
+        Auction.objects.filter(pk=auction.pk).update(
+            current_high_bid=top,
+            current_high_amount=top.amount if top else None,
+            bid_count=bids.count(),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auction', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='auction',
+            name='bid_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='auction',
+            name='current_high_amount',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='auction',
+            name='current_high_bid',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='auction.bid'),
+        ),
+        migrations.RunPython(backfill_current_high, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2 on 2026-10-18 05:28
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auction', '0002_auction_current_high'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='auction',
+            index=models.Index(fields=['end_time'], name='auction_auc_end_tim_c494fb_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='auction',
+            index=models.Index(fields=['start_time', 'end_time'], name='auction_auc_start_t_0ceaee_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bid',
+            index=models.Index(fields=['auction', '-amount'], name='auction_bid_auction_51aabe_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bid',
+            index=models.Index(fields=['auction', 'timestamp'], name='auction_bid_auction_637b92_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 08:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auction', '0008_deletion_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='auction',
+            name='version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
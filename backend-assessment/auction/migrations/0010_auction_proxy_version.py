@@ -0,0 +1,29 @@
+# Generated by Django 5.2 on 2026-10-18 10:12
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_proxy_version(apps, schema_editor):
+    """Gives auctions that already have maximums a non-zero proxy version"""
+    Auction = apps.get_model('auction', 'Auction')
+    ProxyBid = apps.get_model('auction', 'ProxyBid')
+    counts = ProxyBid.objects.values_list('auction_id').annotate(proxies=Count('id')).order_by()
+    for auction_id, proxies in counts:
+        Auction.objects.filter(pk=auction_id).update(proxy_version=proxies)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auction', '0009_auction_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='auction',
+            name='proxy_version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_proxy_version, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2 on 2026-10-18 09:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auction', '0010_auction_proxy_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClaimsCutoff',
+            fields=[
+                ('user_id', models.IntegerField(primary_key=True, serialize=False)),
+                ('changed_at', models.BigIntegerField()),
+            ],
+        ),
+    ]
@@ -13,11 +13,66 @@ class Auction(models.Model):
     end_time = models.DateTimeField()
     creator = models.ForeignKey(User, on_delete=models.CASCADE, related_name='auctions')
 
+    # Denormalized view of the bids table, maintained by auction.bidding
+    current_high_amount = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    current_high_bid = models.ForeignKey(
+        'Bid', on_delete=models.SET_NULL, null=True, blank=True, related_name='+'
+    )
+    bid_count = models.PositiveIntegerField(default=0)
+
+    class Status(models.TextChoices):
+        OPEN = 'open', 'Open'
+        CLOSED = 'closed', 'Closed'
+
+    # Materialized by the run_auction_closer worker once end_time has passed
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.OPEN)
+    winning_bid = models.ForeignKey(
+        'Bid', on_delete=models.SET_NULL, null=True, blank=True, related_name='+'
+    )
+    closed_at = models.DateTimeField(null=True, blank=True)
+
+    # Bumped by every write changing what reads of the auction return, which
+    # derive their ETags from it (see auction/conditional.py)
+    version = models.PositiveIntegerField(default=1)
+    # Bumped with every maximum registered or raised, so the proxy engine of
+    # any process can tell its book of the auction is stale (see auction/proxy.py)
+    proxy_version = models.PositiveIntegerField(default=0)
+
+    def save(self, *args, **kwargs):
+        """Saves the auction, bumping its version when an existing row is edited"""
+        if self._state.adding:
+            return super().save(*args, **kwargs)
+        self.version = models.F('version') + 1
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'version'}
+        super().save(*args, **kwargs)
+        self.refresh_from_db(fields=['version'])
+
     def is_active(self):
-        """Returns true if current time is within the auction period"""
+        """Returns true if the auction is open and current time is within the auction period"""
         from django.utils import timezone
         now = timezone.now()
-        return self.start_time <= now <= self.end_time
+        return self.status == self.Status.OPEN and self.start_time <= now <= self.end_time
+
+    def refresh_current_high(self):
+        """Recomputes the denormalized high bid fields from the bids table"""
+        top = self.bids.order_by('-amount', 'id').first()
+        self.current_high_bid = top
+        self.current_high_amount = top.amount if top else None
+        self.bid_count = self.bids.count()
+        Auction.objects.filter(pk=self.pk).update(
+            current_high_bid=self.current_high_bid,
+            current_high_amount=self.current_high_amount,
+            bid_count=self.bid_count,
+            version=models.F('version') + 1,
+        )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['end_time']),
+            models.Index(fields=['start_time', 'end_time']),
+            models.Index(fields=['status', 'end_time']),
+        ]
 
 class Bid(models.Model):
     """Represents a bid placed by a user on an auction"""
@@ -28,3 +83,96 @@ class Bid(models.Model):
 
     class Meta:
         ordering = ['-amount']
+        indexes = [
+            models.Index(fields=['auction', '-amount']),
+            models.Index(fields=['auction', 'timestamp']),
+        ]
+
+class ProxyBid(models.Model):
+    """Maximum amount a user is willing to pay, bid on their behalf in fixed increments"""
+    auction = models.ForeignKey(Auction, on_delete=models.CASCADE, related_name='proxy_bids')
+    bidder = models.ForeignKey(User, on_delete=models.CASCADE)
+    max_amount = models.DecimalField(max_digits=10, decimal_places=2)
+    placed_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['auction', 'bidder'], name='unique_proxy_bid_per_bidder'),
+        ]
+
+class ArchivedBid(models.Model):
+    """Bid of a long closed auction, moved out of the bids table by auction.archiving"""
+    # The id the bid had in the bids table
+    id = models.BigIntegerField(primary_key=True)
+    auction = models.ForeignKey(Auction, on_delete=models.CASCADE, related_name='archived_bids')
+    bidder = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    timestamp = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['auction', 'id']),
+        ]
+
+class AuctionArchive(models.Model):
+    """Compact summary of an auction whose bids were archived"""
+    auction = models.OneToOneField(Auction, on_delete=models.CASCADE, primary_key=True, related_name='archive')
+    winner = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    final_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    bid_count = models.PositiveIntegerField()
+    first_bid_at = models.DateTimeField(null=True, blank=True)
+    last_bid_at = models.DateTimeField(null=True, blank=True)
+    archived_at = models.DateTimeField()
+
+class IdempotencyKey(models.Model):
+    """First response to a request sent with an Idempotency-Key header, replayed to its retries"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    key = models.CharField(max_length=255)
+    # SHA-256 of the method, path and body the key was first used with
+    fingerprint = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField()
+    body = models.TextField()
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='unique_idempotency_key_per_user'),
+        ]
+        indexes = [
+            models.Index(fields=['expires_at']),
+        ]
+
+class DeletionJob(models.Model):
+    """Background deletion of auctions with many bids, run in chunks by auction.deletion"""
+
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'Pending'
+        RUNNING = 'running', 'Running'
+        DONE = 'done', 'Done'
+        FAILED = 'failed', 'Failed'
+
+    auction_ids = models.JSONField()
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING)
+    requested_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    # Bids (hot and archived) to delete by the auctions' counters, and deleted so far
+    total_bids = models.PositiveBigIntegerField(default=0)
+    deleted_bids = models.PositiveBigIntegerField(default=0)
+    deleted_auctions = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    # Touched with every chunk, so a job whose process stopped can be told apart and resumed
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'heartbeat_at']),
+        ]
+
+class ClaimsCutoff(models.Model):
+    """Time up to which a user's token claims are not trusted, written by triggers on the users table"""
+    # Not a foreign key, so the cutoff outlives a deleted user
+    user_id = models.IntegerField(primary_key=True)
+    # Unix seconds, compared with the tokens' iat claim
+    changed_at = models.BigIntegerField()
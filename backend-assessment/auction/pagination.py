@@ -0,0 +1,49 @@
+"""Module implementing keyset (cursor) pagination over auctions ordered by (end_time, id)"""
+
+import base64
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+class InvalidCursor(ValueError):
+    """Raised when a cursor query parameter cannot be decoded"""
+
+
+def encode_cursor(auction):
+    """Returns an opaque cursor pointing just after the given auction"""
+    raw = '%s|%d' % (auction.end_time.isoformat(), auction.id)
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Returns the (end_time, id) position encoded in a cursor"""
+    try:
+        end_time, auction_id = base64.urlsafe_b64decode(cursor.encode()).decode().rsplit('|', 1)
+        end_time = parse_datetime(end_time)
+        auction_id = int(auction_id)
+    except (ValueError, UnicodeError):
+        raise InvalidCursor(cursor)
+    if end_time is None:
+        raise InvalidCursor(cursor)
+    return end_time, auction_id
+
+
+def after_cursor(queryset, cursor):
+    """Orders the queryset by (end_time, id) and keeps only rows past the cursor"""
+    queryset = queryset.order_by('end_time', 'id')
+    if not cursor:
+        return queryset
+    end_time, auction_id = decode_cursor(cursor)
+    return queryset.filter(Q(end_time__gt=end_time) | Q(end_time=end_time, id__gt=auction_id))
+
+
+def paginate(queryset, cursor, limit):
+    """Returns one page of rows and the cursor of the next page (None on the last page)"""
+    rows = list(after_cursor(queryset, cursor)[:limit + 1])
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, encode_cursor(rows[-1])
+    return rows, None
@@ -0,0 +1,261 @@
+"""Module implementing proxy (maximum) bidding
+
+Users register the most they are willing to pay and the engine bids for them in
+fixed increments. Each auction's maxima live in a ProxyBook, a heap with lazy
+deletion, so resolving an incoming bid costs O(log n) in the number of proxies
+rather than a scan of Bid rows. The books are built from ProxyBid rows when a
+worker starts. Registering or raising a maximum bumps the auction's
+proxy_version, which every bid reads under the auction's write lock, so auctions
+without proxies stay free of extra work and a book built by an engine before
+another process changed it is reloaded, under that lock, before it answers.
+"""
+
+import heapq
+import threading
+from decimal import Decimal
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DatabaseError
+from django.db.models import F
+from django.utils import timezone
+from rest_framework import status
+from .bidding import BidRejected, check_bid
+from .models import Auction, Bid, ProxyBid
+from .routing import use_primary
+from .sqlite import write_transaction
+
+
+def get_increment():
+    """Returns the amount a proxy raises the price by when outbidding"""
+    return Decimal(getattr(settings, 'PROXY_BID_INCREMENT', '1.00'))
+
+
+class ProxyBook:
+    """Proxy maxima of one auction, ordered by amount then registration time"""
+    __slots__ = ('_heap', '_current', 'version')
+
+    def __init__(self, version=0):
+        self._heap = []
+        self._current = {}
+        # The auction's proxy_version the book holds the maximums of
+        self.version = version
+
+    def __len__(self):
+        """Returns the number of bidders with a maximum"""
+        return len(self._current)
+
+    def set(self, bidder_id, max_amount, placed_at):
+        """Adds or replaces a bidder's maximum"""
+        entry = (-max_amount, placed_at, bidder_id)
+        self._current[bidder_id] = entry
+        heapq.heappush(self._heap, entry)
+        if len(self._heap) > 2 * len(self._current) + 16:
+            # Too many superseded entries, rebuild from the live ones
+            self._heap = list(self._current.values())
+            heapq.heapify(self._heap)
+
+    def _clean(self):
+        """Drops superseded entries from the top of the heap"""
+        heap = self._heap
+        while heap and self._current.get(heap[0][2]) != heap[0]:
+            heapq.heappop(heap)
+
+    def top_two(self):
+        """Returns up to two (max_amount, bidder_id) pairs, highest first"""
+        self._clean()
+        if not self._heap:
+            return []
+        first = heapq.heappop(self._heap)
+        self._clean()
+        second = self._heap[0] if self._heap else None
+        heapq.heappush(self._heap, first)
+        return [(-entry[0], entry[2]) for entry in (first, second) if entry]
+
+
+def resolve(book, high, leader, starting_price, increment):
+    """Returns the visible bids [(bidder_id, amount)] that let the top proxy lead.
+
+    high and leader describe the current visible high bid (None when there are
+    no bids). The runner-up proxy shows its full maximum when it beats the
+    current price, then the top proxy bids one increment above the strongest
+    competitor, capped at its own maximum. Equal maxima go to the earlier proxy.
+    """
+    top = book.top_two()
+    if not top:
+        return []
+    first_max, first_bidder = top[0]
+    if first_max < starting_price or (high is not None and leader != first_bidder and first_max <= high):
+        return []
+
+    bids = []
+    competing = high if leader != first_bidder else None
+    if len(top) > 1:
+        runner_max, runner_bidder = top[1]
+        if runner_max == first_max:
+            if high is None or first_max > high:
+                return [(first_bidder, first_max)]
+            return []
+        if runner_max >= starting_price and (high is None or runner_max > high):
+            bids.append((runner_bidder, runner_max))
+            competing = runner_max
+
+    if competing is None:
+        if leader == first_bidder:
+            return bids
+        return [(first_bidder, starting_price)]
+    bids.append((first_bidder, min(first_max, competing + increment)))
+    return bids
+
+
+class ProxyEngine:
+    """Holds the proxy books of open auctions and writes the bids they produce"""
+
+    def __init__(self):
+        self.books = {}
+        self.lock = threading.Lock()
+        self.rebuild()
+
+    def rebuild(self):
+        """Loads every open auction's proxies from the database in one query"""
+        books = {}
+        rows = ProxyBid.objects.filter(auction__status=Auction.Status.OPEN).values_list(
+            'auction_id', 'auction__proxy_version', 'bidder_id', 'max_amount', 'placed_at'
+        )
+        with use_primary():
+            for auction_id, version, bidder_id, max_amount, placed_at in rows:
+                books.setdefault(auction_id, ProxyBook(version)).set(bidder_id, max_amount, placed_at)
+        self.books = books
+
+    def _load(self, auction_id, version):
+        """Loads one auction's book, stored at the given proxy_version, from the database"""
+        book = ProxyBook(version)
+        if version:
+            with use_primary():
+                for bidder_id, max_amount, placed_at in ProxyBid.objects.filter(auction_id=auction_id).values_list(
+                    'bidder_id', 'max_amount', 'placed_at'
+                ):
+                    book.set(bidder_id, max_amount, placed_at)
+        self.books[auction_id] = book
+        return book
+
+    def _book(self, auction):
+        """Returns the book of a locked auction, reloading it if another process changed its maximums"""
+        book = self.books.get(auction.id)
+        if book is None or book.version != auction.proxy_version:
+            book = self._load(auction.id, auction.proxy_version)
+        return book
+
+    def _settle(self, auction, book, now):
+        """Writes the visible bids resolve() asks for against a locked auction row"""
+        if auction.status != Auction.Status.OPEN or not auction.start_time <= now <= auction.end_time:
+            # Proxies stop bidding once the auction is over
+            self.books.pop(auction.id, None)
+            return []
+        leader = auction.current_high_bid.bidder_id if auction.current_high_bid_id else None
+        planned = resolve(book, auction.current_high_amount, leader, auction.starting_price, get_increment())
+        if not planned:
+            return []
+        bids = Bid.objects.bulk_create([
+            Bid(auction_id=auction.id, bidder_id=bidder_id, amount=amount) for bidder_id, amount in planned
+        ])
+        Auction.objects.filter(id=auction.id).update(
+            current_high_amount=bids[-1].amount,
+            current_high_bid=bids[-1],
+            bid_count=F('bid_count') + len(bids),
+            version=F('version') + 1,
+        )
+        for bid in bids:
+            bid.auction_version = auction.version + 1
+        return bids
+
+    def _locked_auction(self, auction_id):
+        """Returns the auction row locked for the current transaction"""
+        return Auction.objects.select_for_update(of=('self',)).select_related('current_high_bid').filter(
+            id=auction_id
+        ).first()
+
+    def register(self, auction_id, bidder, max_amount, now=None):
+        """Registers or raises a bidder's maximum and returns the visible bids it caused"""
+        now = now or timezone.now()
+        with self.lock:
+            try:
+                with write_transaction():
+                    auction = self._locked_auction(auction_id)
+                    if auction is None:
+                        raise BidRejected('Auction not found', status.HTTP_404_NOT_FOUND)
+                    rejection = check_bid(auction, max_amount, now)
+                    if rejection:
+                        raise rejection
+                    book = self._book(auction)
+                    ProxyBid.objects.update_or_create(
+                        auction=auction, bidder_id=bidder.id,
+                        defaults={'max_amount': max_amount, 'placed_at': now}
+                    )
+                    Auction.objects.filter(id=auction.id).update(proxy_version=F('proxy_version') + 1)
+                    book.set(bidder.id, max_amount, now)
+                    book.version = auction.proxy_version + 1
+                    return self._settle(auction, book, now)
+            except BidRejected:
+                raise
+            except Exception:
+                # A failed write leaves the book ahead of the database
+                self.books.pop(auction_id, None)
+                raise
+
+    def respond_to_bid(self, bid, now=None):
+        """Lets proxies answer an accepted bid and returns the visible bids they placed"""
+        if getattr(bid, 'proxy_version', None) == 0:
+            # Nobody had registered a maximum when the bid was written, the usual
+            # case, so this stays free of queries
+            return []
+        now = now or timezone.now()
+        with self.lock:
+            try:
+                with write_transaction():
+                    auction = self._locked_auction(bid.auction_id)
+                    if auction is None:
+                        self.books.pop(bid.auction_id, None)
+                        return []
+                    return self._settle(auction, self._book(auction), now)
+            except Exception:
+                self.books.pop(bid.auction_id, None)
+                raise
+
+    def forget(self, auction_id):
+        """Drops the book of a deleted auction"""
+        with self.lock:
+            self.books.pop(auction_id, None)
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    """Returns the process-wide engine, building it from the database if the worker has not yet"""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = ProxyEngine()
+        return _engine
+
+
+def build_engine():
+    """Builds the process-wide engine as a worker starts, so its first bid does not wait on it"""
+    try:
+        get_engine()
+    except DatabaseError:
+        # Not migrated yet, the engine is built on first use instead
+        pass
+
+
+async def aget_engine():
+    """Async counterpart of get_engine; only the first call leaves the event loop"""
+    return _engine or await sync_to_async(get_engine)()
+
+
+def reset_engine():
+    """Discards the process-wide engine so the next use rebuilds it from the database"""
+    global _engine
+    with _engine_lock:
+        _engine = None
@@ -0,0 +1,134 @@
+"""Module implementing precompiled read-only serializers for hot listing and bid paths
+
+A ModelSerializer builds a model instance per row and walks its field objects
+to format it. RowSerializer reads a serializer's fields once and builds a
+function, closing over one (name, index, formatter) tuple per field, that turns
+a .values_list() row (or an instance's attributes) straight into the same dict,
+so the JSON rendered from it is byte-for-byte what the serializer produces.
+Decimals already at the field's scale and UTC datetimes take fast paths; any
+other value goes through the DRF field, so the output never differs.
+"""
+
+import datetime
+from operator import attrgetter
+from django.core.exceptions import ImproperlyConfigured
+from django.utils import timezone
+from rest_framework import ISO_8601, fields, relations
+from rest_framework.settings import api_settings
+from .serializers import AuctionSerializer, BidSerializer, LiveAuctionSerializer
+
+# Field types whose to_representation returns database values unchanged
+IDENTITY_FIELDS = (
+    fields.IntegerField, fields.CharField, fields.ChoiceField, fields.BooleanField, relations.PrimaryKeyRelatedField,
+)
+
+
+def decimal_formatter(field):
+    """Returns a formatter matching DecimalField.to_representation"""
+    coerce_to_string = getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING)
+    if not coerce_to_string or field.localize or field.normalize_output or field.decimal_places is None:
+        return field.to_representation
+    exponent = -field.decimal_places
+
+    def format_decimal(value):
+        # Database values are already quantized to the field's scale
+        if value.as_tuple().exponent == exponent:
+            return '{:f}'.format(value)
+        return field.to_representation(value)
+    return format_decimal
+
+
+def datetime_formatter(field):
+    """Returns a formatter matching DateTimeField.to_representation while UTC is the current time zone"""
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    if output_format is not None and output_format.lower() != ISO_8601 or hasattr(field, 'timezone'):
+        return field.to_representation
+    utc = datetime.timezone.utc
+
+    def format_datetime(value):
+        # DRF converts to the current time zone and writes UTC as 'Z'
+        if value.tzinfo is utc:
+            return value.isoformat()[:-6] + 'Z'
+        return field.to_representation(value)
+    return format_datetime
+
+
+def formatter_for(field, utc):
+    """Returns the formatter of a serializer field, or None when values pass through"""
+    if isinstance(field, IDENTITY_FIELDS):
+        return None
+    if isinstance(field, fields.DecimalField):
+        return decimal_formatter(field)
+    if isinstance(field, fields.DateTimeField) and utc:
+        return datetime_formatter(field)
+    return field.to_representation
+
+
+class RowSerializer:
+    """Read-only counterpart of a ModelSerializer working on value rows"""
+
+    def __init__(self, serializer_class):
+        serializer = serializer_class()
+        model = serializer_class.Meta.model
+        self.names, self.columns, readable = [], [], []
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            if field.source == '*' or '.' in field.source:
+                raise ImproperlyConfigured('%s.%s is not a model column' % (serializer_class.__name__, name))
+            self.names.append(name)
+            self.columns.append(model._meta.get_field(field.source).attname)
+            readable.append(field)
+        # Datetimes are only formatted inline while UTC is the current time zone
+        self._utc_encode = self._compile([formatter_for(field, True) for field in readable])
+        self._local_encode = self._compile([formatter_for(field, False) for field in readable])
+        self._attributes = attrgetter(*self.columns)
+
+    def _compile(self, formatters):
+        """Builds the function from a row tuple to the serialized dict"""
+        columns = tuple((name, index, formatter) for index, (name, formatter) in enumerate(zip(self.names, formatters)))
+
+        def encode(row):
+            data = {}
+            for name, index, formatter in columns:
+                value = row[index]
+                data[name] = value if formatter is None or value is None else formatter(value)
+            return data
+        return encode
+
+    def encoder(self):
+        """Returns the row encoding function for the current time zone"""
+        if timezone.get_current_timezone_name() == 'UTC':
+            return self._utc_encode
+        return self._local_encode
+
+    def encode(self, row):
+        """Serializes one row of the columns"""
+        return self.encoder()(row)
+
+    def values(self, queryset):
+        """Returns the queryset as named rows of the serialized columns"""
+        return queryset.values_list(*self.columns, named=True)
+
+    def encode_rows(self, rows):
+        """Serializes rows of the columns"""
+        encode = self.encoder()
+        return [encode(row) for row in rows]
+
+    def serialize(self, queryset):
+        """Returns the serialized dicts of every row of a queryset"""
+        return self.encode_rows(self.values(queryset))
+
+    def encode_instance(self, instance):
+        """Serializes a model instance already in memory"""
+        return self.encode(self._attributes(instance))
+
+    def encode_instances(self, instances):
+        """Serializes model instances already in memory"""
+        encode = self.encoder()
+        return [encode(self._attributes(instance)) for instance in instances]
+
+
+auction_reader = RowSerializer(AuctionSerializer)
+bid_reader = RowSerializer(BidSerializer)
+live_auction_reader = RowSerializer(LiveAuctionSerializer)
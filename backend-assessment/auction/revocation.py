@@ -0,0 +1,186 @@
+"""Module implementing an in-memory index of revoked refresh tokens
+
+simplejwt checks every refresh token against the BlacklistedToken table. The
+index answers that check in memory: a Bloom filter over the JTIs of revoked,
+unexpired tokens rules out almost every valid token, and an exact set holds the
+revocations this process has confirmed. Only Bloom filter hits that are not in
+the set (false positives, or tokens revoked before the index was loaded) still
+ask the database. Revocations made by other processes reach the filter by
+polling for new BlacklistedToken rows every REFRESH_SECONDS. Until then a
+per-JTI marker, set in the default cache by the process that revoked the token,
+is checked on every filter miss: when workers share that cache (Redis,
+Memcached) a logged out token stops refreshing everywhere at once, while with a
+per-process locmem cache other processes only stop it at their next poll. Tune
+it with TOKEN_REVOCATION_INDEX in settings.
+
+Every issued refresh token adds an OutstandingToken row, so prune_expired_tokens()
+(the prune_token_blacklist command) deletes expired ones in bounded batches.
+"""
+
+import hashlib
+import math
+import threading
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Max
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from .sqlite import write_transaction
+
+DEFAULTS = {
+    'ENABLED': True,
+    'FALSE_POSITIVE_RATE': 0.01,
+    'MIN_CAPACITY': 100000,
+    'REFRESH_SECONDS': 5,
+}
+
+REVOKED_KEY = 'auth:revoked:%s'
+
+LOAD_CHUNK_SIZE = 10000
+DEFAULT_PRUNE_BATCH_SIZE = 5000
+
+
+def get_setting(name):
+    """Returns a TOKEN_REVOCATION_INDEX setting, falling back to the defaults"""
+    return getattr(settings, 'TOKEN_REVOCATION_INDEX', {}).get(name, DEFAULTS[name])
+
+
+class BloomFilter:
+    """Bit array answering 'maybe present' or 'definitely absent' for strings"""
+    __slots__ = ('capacity', 'size', 'hashes', 'bits')
+
+    def __init__(self, capacity, error_rate):
+        self.capacity = capacity
+        self.size = max(int(-capacity * math.log(error_rate) / math.log(2) ** 2), 64)
+        self.hashes = max(round(self.size / capacity * math.log(2)), 1)
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key):
+        """Returns the bit positions of a key"""
+        # Double hashing: k positions from the two halves of one digest
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    def add(self, key):
+        """Sets the bits of a key"""
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key):
+        """Returns true if every bit of the key is set, so it was probably added"""
+        bits = self.bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+class RevokedTokenIndex:
+    """Bloom filter and exact set of revoked JTIs, kept in step with BlacklistedToken"""
+
+    def __init__(self, error_rate=None, refresh_seconds=None):
+        self.error_rate = error_rate or get_setting('FALSE_POSITIVE_RATE')
+        self.refresh_seconds = refresh_seconds if refresh_seconds is not None else get_setting('REFRESH_SECONDS')
+        self.lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        """Rebuilds the filter from the blacklisted tokens that have not expired"""
+        now = timezone.now()
+        last_id = BlacklistedToken.objects.aggregate(last=Max('id'))['last'] or 0
+        live = BlacklistedToken.objects.filter(id__lte=last_id, token__expires_at__gt=now)
+        count = live.count()
+        bloom = BloomFilter(max(2 * count, get_setting('MIN_CAPACITY')), self.error_rate)
+        for jti in live.values_list('token__jti', flat=True).iterator(chunk_size=LOAD_CHUNK_SIZE):
+            bloom.add(jti)
+        with self.lock:
+            self.bloom = bloom
+            self.confirmed = set()
+            self.count = count
+            self.last_id = last_id
+            self.checked_at = time.monotonic()
+
+    def _catch_up(self):
+        """Adds tokens blacklisted since the last poll, possibly by other processes"""
+        if time.monotonic() - self.checked_at < self.refresh_seconds:
+            return
+        with self.lock:
+            self.checked_at = time.monotonic()
+            rows = list(BlacklistedToken.objects.filter(id__gt=self.last_id).values_list('id', 'token__jti'))
+            for row_id, jti in rows:
+                self.bloom.add(jti)
+                self.confirmed.add(jti)
+                self.last_id = max(self.last_id, row_id)
+            self.count += len(rows)
+        if self.count > self.bloom.capacity:
+            # Past capacity the false positive rate climbs, so size a new filter
+            self.load()
+
+    def add(self, jti):
+        """Records a revocation made by this process"""
+        with self.lock:
+            self.bloom.add(jti)
+            self.confirmed.add(jti)
+            self.count += 1
+
+    def is_revoked(self, jti):
+        """Returns False or True when the index knows, None when the database must decide"""
+        self._catch_up()
+        if jti not in self.bloom:
+            # Revoked by another process since the last poll
+            return cache.get(REVOKED_KEY % jti) is not None
+        if jti in self.confirmed:
+            return True
+        return None
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    """Returns the process-wide index, loading it on first use"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = RevokedTokenIndex()
+        return _index
+
+
+def reset_index():
+    """Discards the process-wide index so the next use reloads it from the database"""
+    global _index
+    with _index_lock:
+        _index = None
+
+
+def revoke(jti, expires_at):
+    """Records a committed revocation in this process's index and in the default cache"""
+    cache.set(REVOKED_KEY % jti, True, timeout=max(expires_at - time.time(), 1))
+    get_index().add(jti)
+
+
+def prune_expired_tokens(now=None, batch_size=DEFAULT_PRUNE_BATCH_SIZE, pause=0):
+    """Deletes expired outstanding tokens and their blacklist entries in bounded batches.
+
+    The table is walked in primary key windows of batch_size rows, each deleted
+    in its own short transaction, so no index on expires_at is needed and writers
+    are never locked out for long. Returns the number of tokens deleted.
+    """
+    now = now or timezone.now()
+    deleted = 0
+    last_id = 0
+    while True:
+        bounds = list(
+            OutstandingToken.objects.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[batch_size - 1:batch_size]
+        )
+        window = OutstandingToken.objects.filter(id__gt=last_id, expires_at__lte=now)
+        if bounds:
+            window = window.filter(id__lte=bounds[0])
+        with write_transaction():
+            deleted += window.delete()[1].get(OutstandingToken._meta.label, 0)
+        if not bounds:
+            return deleted
+        last_id = bounds[0]
+        if pause:
+            time.sleep(pause)
@@ -0,0 +1,170 @@
+"""Module implementing read/write routing between the primary database and its replicas
+
+PrimaryReplicaRouter sends every write to the default (primary) database, and
+reads of the replicated apps' models made while serving a request to one of the
+DATABASE_ROUTING['REPLICAS'] aliases, picked once per request. Reads stay on the
+primary outside requests (workers, management commands and process-wide state
+loaded under use_primary()), inside transactions on the primary, for the whole
+of unsafe (POST, PUT, PATCH, DELETE) requests, once the request has written and,
+so users read their own writes while replicas catch up, for STICKY_SECONDS after
+a user's write. The sticky marks live in the default cache, so with several
+workers it must be one they share (Redis, Memcached): a per-process locmem cache
+only pins the worker that served the write, and the user's next request may
+land on another one and read a replica that has not caught up.
+
+ReadYourWritesMiddleware tracks the request and authentication reports its user
+with authenticated(). Locally a second SQLite file can play the replica:
+sync_sqlite_replica() (manage.py sync_replicas) copies the primary over it.
+"""
+
+import contextlib
+import contextvars
+import random
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from rest_framework.permissions import SAFE_METHODS
+from .caching import acache
+
+DEFAULTS = {
+    'REPLICAS': (),
+    'APPS': ('auction',),
+    'STICKY_SECONDS': 5,
+}
+
+STICKY_KEY = 'db-routing:sticky:%s'
+
+_request = contextvars.ContextVar('database_routing', default=None)
+_use_primary = contextvars.ContextVar('database_routing_primary', default=False)
+
+
+def get_setting(name):
+    """Returns a DATABASE_ROUTING setting, falling back to the defaults"""
+    return getattr(settings, 'DATABASE_ROUTING', {}).get(name, DEFAULTS[name])
+
+
+class RequestRouting:
+    """Routing state of the request being handled"""
+    __slots__ = ('pinned', 'wrote', 'user_id', 'checked', 'replica')
+
+    def __init__(self, pinned):
+        self.pinned = pinned
+        self.wrote = False
+        self.user_id = None
+        self.checked = False
+        self.replica = None
+
+
+def authenticated(user_id):
+    """Tells the current request's routing whose reads it serves"""
+    state = _request.get()
+    if state is not None:
+        state.user_id = user_id
+
+
+@contextlib.contextmanager
+def use_primary():
+    """Sends the block's reads to the primary, e.g. to load state shared by the whole process"""
+    token = _use_primary.set(True)
+    try:
+        yield
+    finally:
+        _use_primary.reset(token)
+
+
+def _reads_primary(state):
+    """Returns true if the current read must go to the primary, checking the user's sticky mark once"""
+    if state is None or state.pinned or _use_primary.get():
+        return True
+    if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+        return True
+    if state.user_id is not None and not state.checked:
+        # Looked up on the first routed read only, so requests reading nothing pay nothing
+        state.checked = True
+        state.pinned = bool(cache.get(STICKY_KEY % state.user_id))
+    return state.pinned
+
+
+class PrimaryReplicaRouter:
+    """Database router sending writes to the primary and request reads to a replica"""
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label not in get_setting('APPS'):
+            return DEFAULT_DB_ALIAS
+        replicas = get_setting('REPLICAS')
+        state = _request.get()
+        if not replicas or _reads_primary(state):
+            return DEFAULT_DB_ALIAS
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        if state.replica is None:
+            state.replica = random.choice(replicas)
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        state = _request.get()
+        if state is not None:
+            state.wrote = state.pinned = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Every alias holds the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema from the primary
+        if db in get_setting('REPLICAS'):
+            return False
+        return None
+
+
+class ReadYourWritesMiddleware:
+    """Tracks each request's reads and writes for the router, for sync and async views alike"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not get_setting('REPLICAS'):
+            return self.get_response(request)
+        state = RequestRouting(pinned=request.method not in SAFE_METHODS)
+        token = _request.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _request.reset(token)
+        if state.wrote and state.user_id is not None:
+            cache.set(STICKY_KEY % state.user_id, True, get_setting('STICKY_SECONDS'))
+        return response
+
+    async def __acall__(self, request):
+        if not get_setting('REPLICAS'):
+            return await self.get_response(request)
+        state = RequestRouting(pinned=request.method not in SAFE_METHODS)
+        token = _request.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request.reset(token)
+        if state.wrote and state.user_id is not None:
+            await acache('set', STICKY_KEY % state.user_id, True, get_setting('STICKY_SECONDS'))
+        return response
+
+
+def sync_sqlite_replica(alias):
+    """Copies the primary SQLite database over the replica with SQLite's online backup"""
+    source, target = connections[DEFAULT_DB_ALIAS], connections[alias]
+    if source.vendor != 'sqlite' or target.vendor != 'sqlite':
+        raise ValueError('Only SQLite replicas can be copied from the primary')
+    source.ensure_connection()
+    target.ensure_connection()
+    source.connection.backup(target.connection)
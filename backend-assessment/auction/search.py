@@ -0,0 +1,185 @@
+"""Module implementing full-text auction search on an SQLite FTS5 index
+
+auction_search is an external-content FTS5 table over Auction.title and
+description: it stores only the index and reads the text from the auctions
+table. Triggers keep it in step with every insert, delete and title or
+description update, however they are made (bulk creates and cascading deletes
+included). ensure_index() creates whatever is missing after each migrate, since
+SQLite migrations that rebuild the auctions table drop its triggers, and
+rebuild_index() (manage.py rebuild_search_index) reindexes every auction.
+
+search() turns the user's words into an FTS5 query in which every word must
+match, words ending in * as prefixes (not implied, as prefixes of common words
+cost several times more to match than the words). Matches are ranked by bm25
+with title hits weighing more and paged by (rank, id) cursors.
+The index drives the query, so its cost follows the number of matches rather
+than the size of the auctions table, and scoring, which dominates it, is capped:
+only the newest AUCTION_SEARCH['MAX_CANDIDATES'] matches passing the filters are
+ranked. Finding them walks the index newest first without scoring, and the
+cursor keeps the window so later pages rank the same candidates.
+"""
+
+import base64
+import re
+from django.conf import settings
+from django.db import connections, router
+from django.db.models import Q
+from django.db.models.signals import post_migrate
+from django.dispatch import receiver
+from django.utils import timezone
+from .models import Auction
+from .pagination import InvalidCursor
+from .read_serializers import auction_reader
+
+DEFAULTS = {
+    'MAX_CANDIDATES': 2000,
+}
+
+INDEX_TABLE = 'auction_search'
+TITLE_WEIGHT = 10.0
+DESCRIPTION_WEIGHT = 1.0
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+MAX_TERMS = 16
+# FTS5 cannot parse a quoted string holding a NUL, and other controls match nothing
+CONTROL_CHARACTERS = re.compile(r'[\x00-\x1f\x7f-\x9f]')
+
+CREATE_INDEX = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS auction_search USING fts5("
+    "title, description, content='auction_auction', content_rowid='id', "
+    "tokenize='porter unicode61 remove_diacritics 2', prefix='2 3')"
+)
+CREATE_TRIGGERS = (
+    "CREATE TRIGGER IF NOT EXISTS auction_search_insert AFTER INSERT ON auction_auction BEGIN "
+    "INSERT INTO auction_search(rowid, title, description) VALUES (new.id, new.title, new.description); END",
+    "CREATE TRIGGER IF NOT EXISTS auction_search_delete AFTER DELETE ON auction_auction BEGIN "
+    "INSERT INTO auction_search(auction_search, rowid, title, description) "
+    "VALUES ('delete', old.id, old.title, old.description); END",
+    "CREATE TRIGGER IF NOT EXISTS auction_search_update AFTER UPDATE OF title, description ON auction_auction BEGIN "
+    "INSERT INTO auction_search(auction_search, rowid, title, description) "
+    "VALUES ('delete', old.id, old.title, old.description); "
+    "INSERT INTO auction_search(rowid, title, description) VALUES (new.id, new.title, new.description); END",
+)
+# Stored in the index, so ORDER BY rank uses these column weights
+CONFIGURE_RANK = "INSERT INTO auction_search(auction_search, rank) VALUES ('rank', 'bm25(%r, %r)')" % (
+    TITLE_WEIGHT, DESCRIPTION_WEIGHT
+)
+
+
+def get_setting(name):
+    """Returns an AUCTION_SEARCH setting, falling back to the defaults"""
+    return getattr(settings, 'AUCTION_SEARCH', {}).get(name, DEFAULTS[name])
+
+
+def ensure_index(using='default'):
+    """Creates the index and its triggers where missing, filling a new index from the auctions table"""
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [INDEX_TABLE])
+        exists = cursor.fetchone() is not None
+        cursor.execute(CREATE_INDEX)
+        for statement in CREATE_TRIGGERS:
+            cursor.execute(statement)
+    if not exists:
+        rebuild_index(using)
+
+
+def rebuild_index(using='default'):
+    """Reindexes every auction and merges the index into one segment"""
+    with connections[using].cursor() as cursor:
+        cursor.execute(CONFIGURE_RANK)
+        cursor.execute("INSERT INTO auction_search(auction_search) VALUES ('rebuild')")
+        cursor.execute("INSERT INTO auction_search(auction_search) VALUES ('optimize')")
+
+
+@receiver(post_migrate)
+def index_after_migrate(sender, using, **kwargs):
+    """Ensures the index and its triggers after the auction app is migrated on an SQLite database"""
+    if sender.name != 'auction' or connections[using].vendor != 'sqlite':
+        return
+    if router.allow_migrate_model(using, Auction):
+        ensure_index(using)
+
+
+def match_expression(query):
+    """Returns the FTS5 query matching every word of the user's query, words ending in * as prefixes"""
+    terms = []
+    for word in query.split()[:MAX_TERMS]:
+        word = CONTROL_CHARACTERS.sub('', word)
+        prefix = len(word) > 2 and word.endswith('*')
+        word = word.rstrip('*')
+        if word:
+            terms.append('"%s"%s' % (word.replace('"', '""'), '*' if prefix else ''))
+    if not terms:
+        raise ValueError('q is required')
+    return ' '.join(terms)
+
+
+def encode_cursor(rank, auction_id, lowest_id):
+    """Returns an opaque cursor pointing just after the given match, within the candidates from lowest_id on"""
+    return base64.urlsafe_b64encode(('%r|%d|%d' % (rank, auction_id, lowest_id)).encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Returns the (rank, id, lowest candidate id) position encoded in a cursor"""
+    try:
+        rank, auction_id, lowest_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return float(rank), int(auction_id), int(lowest_id)
+    except (ValueError, UnicodeError):
+        raise InvalidCursor(cursor)
+
+
+def filter_auctions(queryset, active=False, min_price=None, max_price=None, now=None):
+    """Applies the active and current price (high bid, else starting price) filters"""
+    if active:
+        now = now or timezone.now()
+        queryset = queryset.filter(status=Auction.Status.OPEN, start_time__lte=now, end_time__gte=now)
+    if min_price is not None:
+        queryset = queryset.filter(
+            Q(current_high_amount__gte=min_price) | Q(current_high_amount__isnull=True, starting_price__gte=min_price)
+        )
+    if max_price is not None:
+        queryset = queryset.filter(
+            Q(current_high_amount__lte=max_price) | Q(current_high_amount__isnull=True, starting_price__lte=max_price)
+        )
+    return queryset
+
+
+def search(query, cursor=None, limit=DEFAULT_PAGE_SIZE, **filters):
+    """Returns one page of serialized auctions matching the query, best first, and the next page's cursor"""
+    match = match_expression(query)
+    using = router.db_for_read(Auction)
+    candidates = filter_auctions(Auction.objects.using(using), **filters).values('id')
+    candidates_sql, candidates_params = candidates.query.get_compiler(using).as_sql()
+    # CROSS JOIN keeps the index as the outer loop
+    matches_sql = (
+        'FROM auction_search s CROSS JOIN (%s) a ON a.id = s.rowid '
+        'WHERE auction_search MATCH %%s' % candidates_sql
+    )
+    params = [*candidates_params, match]
+    with connections[using].cursor() as db_cursor:
+        if cursor:
+            rank, auction_id, lowest_id = decode_cursor(cursor)
+        else:
+            db_cursor.execute(
+                'SELECT s.rowid %s ORDER BY s.rowid DESC LIMIT 1 OFFSET %%s' % matches_sql,
+                [*params, get_setting('MAX_CANDIDATES') - 1],
+            )
+            row = db_cursor.fetchone()
+            lowest_id = row[0] if row else 0
+        sql = 'SELECT a.id, s.rank %s AND s.rowid >= %%s' % matches_sql
+        params.append(lowest_id)
+        if cursor:
+            sql += ' AND (s.rank > %s OR (s.rank = %s AND a.id > %s))'
+            params += [rank, rank, auction_id]
+        db_cursor.execute(sql + ' ORDER BY s.rank, a.id LIMIT %s', [*params, limit + 1])
+        ranked = db_cursor.fetchall()
+
+    next_cursor = None
+    if len(ranked) > limit:
+        ranked = ranked[:limit]
+        next_cursor = encode_cursor(ranked[-1][1], ranked[-1][0], lowest_id)
+    # Rows are read through the ORM so values get its conversions
+    rows = {row.id: row for row in auction_reader.values(Auction.objects.using(using).filter(id__in=[pk for pk, rank in ranked]))}
+    encode = auction_reader.encoder()
+    return [encode(rows[pk]) for pk, rank in ranked if pk in rows], next_cursor
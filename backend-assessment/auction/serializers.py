@@ -2,7 +2,7 @@
 
 from rest_framework import serializers
 from django.contrib.auth.models import User
-from .models import Auction, Bid
+from .models import Auction, AuctionArchive, Bid, DeletionJob
 
 class UserSerializer(serializers.ModelSerializer):
     """Serializer for the user model"""
@@ -14,7 +14,21 @@ class AuctionSerializer(serializers.ModelSerializer):
     """Serializer for the Auction model"""
     class Meta:
         model = Auction
-        fields = '__all__'
+        exclude = ['proxy_version']
+        read_only_fields = [
+            'creator', 'current_high_amount', 'current_high_bid', 'bid_count',
+            'status', 'winning_bid', 'closed_at', 'version'
+        ]
+
+
+class LiveAuctionSerializer(serializers.ModelSerializer):
+    """Serializer for auctions in the public live listing"""
+    class Meta:
+        model = Auction
+        fields = [
+            'id', 'title', 'description', 'starting_price', 'start_time', 'end_time',
+            'creator', 'current_high_amount', 'current_high_bid'
+        ]
 
 
 class BidSerializer(serializers.ModelSerializer):
@@ -22,3 +36,17 @@ class BidSerializer(serializers.ModelSerializer):
     class Meta:
         model = Bid
         fields = '__all__'
+
+
+class AuctionArchiveSerializer(serializers.ModelSerializer):
+    """Serializer for the summary of an auction whose bids were archived"""
+    class Meta:
+        model = AuctionArchive
+        exclude = ['auction']
+
+
+class DeletionJobSerializer(serializers.ModelSerializer):
+    """Serializer for a background auction deletion and its progress"""
+    class Meta:
+        model = DeletionJob
+        fields = '__all__'
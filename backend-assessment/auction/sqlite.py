@@ -0,0 +1,81 @@
+"""Module implementing the production SQLite profile
+
+Every new SQLite connection gets the pragmas of SQLITE_PROFILE in settings: a
+busy timeout, WAL journaling (readers never block the writer, and commits
+append to the log instead of syncing the whole file), synchronous=NORMAL (WAL
+is only synced at checkpoints), a memory-mapped file and a larger page cache.
+
+SQLite takes one writer at a time, and waiters on its lock poll with growing
+sleeps, so a crowd of writers starves some of them past any busy timeout.
+write_transaction() is transaction.atomic() for writes, entered by one thread
+of the process at a time, so writers queue on a lock that wakes them in turn
+and only writers of other processes still wait on SQLite's lock.
+"""
+
+import contextlib
+import threading
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+DEFAULTS = {
+    'ENABLED': True,
+    'BUSY_TIMEOUT_MS': 30000,
+    'JOURNAL_MODE': 'WAL',
+    'SYNCHRONOUS': 'NORMAL',
+    'MMAP_SIZE': 256 * 1024 * 1024,
+    'CACHE_SIZE_KIB': 64000,
+    'SERIALIZE_WRITES': True,
+}
+
+_write_lock = threading.RLock()
+
+
+def get_setting(name):
+    """Returns a SQLITE_PROFILE setting, falling back to the defaults"""
+    return getattr(settings, 'SQLITE_PROFILE', {}).get(name, DEFAULTS[name])
+
+
+def pragmas():
+    """Returns the statements run on every new connection, busy timeout first so the others can wait"""
+    return [
+        'PRAGMA busy_timeout = %d' % get_setting('BUSY_TIMEOUT_MS'),
+        'PRAGMA journal_mode = %s' % get_setting('JOURNAL_MODE'),
+        'PRAGMA synchronous = %s' % get_setting('SYNCHRONOUS'),
+        'PRAGMA mmap_size = %d' % get_setting('MMAP_SIZE'),
+        # Negative sizes are in KiB rather than pages
+        'PRAGMA cache_size = -%d' % get_setting('CACHE_SIZE_KIB'),
+    ]
+
+
+@receiver(connection_created)
+def configure_connection(sender, connection, **kwargs):
+    """Applies the profile to a new SQLite connection"""
+    if connection.vendor != 'sqlite' or not get_setting('ENABLED'):
+        return
+    for statement in pragmas():
+        connection.connection.execute(statement)
+
+
+def serializes_writes(using=None):
+    """Returns true if writes to the database go through the process-wide write lock"""
+    return (
+        connections[using or 'default'].vendor == 'sqlite'
+        and get_setting('ENABLED') and get_setting('SERIALIZE_WRITES')
+    )
+
+
+@contextlib.contextmanager
+def write_transaction(using=None):
+    """Runs the block in a transaction, holding the write lock first on SQLite.
+
+    The lock is reentrant, so nested write transactions of one thread are fine;
+    never wait on another thread's write (e.g. the group commit writer) inside one.
+    """
+    if not serializes_writes(using):
+        with transaction.atomic(using=using):
+            yield
+        return
+    with _write_lock, transaction.atomic(using=using):
+        yield
@@ -1,11 +1,50 @@
-from django.test import TestCase
+import asyncio
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import random
+from io import StringIO
+import unittest
+from asgiref.sync import async_to_sync, sync_to_async
+from concurrent.futures import ThreadPoolExecutor
+from django.test import AsyncClient, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.conf import settings
+from django.db import IntegrityError, OperationalError, connection
 from django.contrib.auth.models import User
-from rest_framework.test import APIClient
-from .models import Auction, Bid
+from django.core.cache import cache
+from django.core.management import call_command
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
+from .models import ArchivedBid, Auction, AuctionArchive, Bid, ClaimsCutoff, DeletionJob, IdempotencyKey, ProxyBid
+from .serializers import AuctionSerializer, BidSerializer, LiveAuctionSerializer
+from .read_serializers import auction_reader, bid_reader, live_auction_reader
 from django.utils import timezone
 from datetime import timedelta
 from decimal import Decimal
 from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from .archiving import archive_bids
+from .bidding import place_bid, BidRejected
+from .authentication import ClaimsRefreshToken, UserCache, cutoff_cache, user_cache
+from .closing import AuctionCloser, close_auctions
+from .hashers import HashingBusy, HashingPool, get_pool, reset_pool
+from .revocation import REVOKED_KEY, BloomFilter, get_index, reset_index
+from .events import broker
+from .views import EnterBidView, NewAuctionView
+from .metrics import registry
+from .group_commit import BidBatcher, reset_batcher
+from .proxy import ProxyBook, ProxyEngine, get_engine, reset_engine, resolve
+from .throttling import RateLimiter, reset_limiter
+from .idempotency import LOCK_KEY
+from .deletion import delete_auctions, delete_bids, reset_executor
+from .leaderboard import Leaderboards, reset_leaderboards
+from . import live_cache
+from . import api_docs
 
 class AuctionTests(TestCase):
     """Tests for auction and bidding functionalities."""
@@ -78,3 +117,2157 @@ class AuctionTests(TestCase):
         # Verify the bid has been deleted
         with self.assertRaises(Bid.DoesNotExist):
             Bid.objects.get(id=bid.id)
+
+
+class BidPlacementTests(TestCase):
+    """Tests for the denormalized high bid kept on the auction row."""
+
+    def setUp(self):
+        """Creates a user and an active auction."""
+        self.user = User.objects.create_user(username='bidder', password='pass')
+        now = timezone.now()
+        self.auction = Auction.objects.create(
+            title='Lamp',
+            description='Desk lamp',
+            starting_price=Decimal('10.00'),
+            start_time=now - timedelta(hours=1),
+            end_time=now + timedelta(hours=1),
+            creator=self.user
+        )
+
+    def test_accepted_bid_updates_current_high(self):
+        """Tests that an accepted bid becomes the auction's current high."""
+        bid = place_bid(self.auction.id, self.user, Decimal('15.00'))
+        self.auction.refresh_from_db()
+        self.assertEqual(self.auction.current_high_amount, Decimal('15.00'))
+        self.assertEqual(self.auction.current_high_bid, bid)
+        self.assertEqual(self.auction.bid_count, 1)
+
+    def test_rejections_leave_auction_untouched(self):
+        """Tests the rejection reasons and that rejected bids write nothing."""
+        with self.assertRaisesMessage(BidRejected, 'Bid must be at least the starting price'):
+            place_bid(self.auction.id, self.user, Decimal('5.00'))
+        place_bid(self.auction.id, self.user, Decimal('20.00'))
+        with self.assertRaisesMessage(BidRejected, 'Bid must be higher than current highest bid'):
+            place_bid(self.auction.id, self.user, Decimal('20.00'))
+        with self.assertRaises(BidRejected) as ctx:
+            place_bid(self.auction.id + 1000, self.user, Decimal('50.00'))
+        self.assertEqual(ctx.exception.status_code, 404)
+        with self.assertRaisesMessage(BidRejected, 'Auction not active'):
+            place_bid(self.auction.id, self.user, Decimal('50.00'), now=self.auction.end_time + timedelta(seconds=1))
+        self.auction.refresh_from_db()
+        self.assertEqual(self.auction.current_high_amount, Decimal('20.00'))
+        self.assertEqual(self.auction.bid_count, 1)
+        self.assertEqual(Bid.objects.count(), 1)
+
+    @override_settings(RATE_LIMITS={'ENABLED': False})
+    def test_amounts_the_columns_cannot_hold_are_rejected(self):
+        """Tests that non-finite, non-positive and oversized amounts get a 400 before any write."""
+        client = APIClient()
+        client.force_authenticate(self.user)
+        for amount in ('NaN', 'sNaN', 'Infinity', '-1', '0', '1e12', '12.345'):
+            for path, field in (('/api/bid/', 'amount'), ('/api/bid/proxy/', 'max_amount')):
+                response = client.post(path, {'auction_id': self.auction.id, field: amount}, format='json')
+                self.assertEqual(response.status_code, 400, (path, amount))
+        response = client.post('/api/bid/', {'auction_id': self.auction.id, 'amount': '12.500'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Bid.objects.count(), 1)
+
+    def test_deleting_high_bid_restores_previous_high(self):
+        """Tests that admin bid deletion recomputes the current high."""
+        first = place_bid(self.auction.id, self.user, Decimal('15.00'))
+        second = place_bid(self.auction.id, self.user, Decimal('25.00'))
+        admin = User.objects.create_superuser(username='admin', password='adminpass')
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION='Bearer ' + str(RefreshToken.for_user(admin).access_token))
+        response = client.delete('/api/admin/auction/', data={'bid_id': second.id}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.auction.refresh_from_db()
+        self.assertEqual(self.auction.current_high_bid, first)
+        self.assertEqual(self.auction.current_high_amount, Decimal('15.00'))
+        self.assertEqual(self.auction.bid_count, 1)
+
+
+class ConcurrentBidTests(TransactionTestCase):
+    """Tests that concurrent bidders cannot lose or reorder the high bid."""
+
+    def test_parallel_bids_keep_strictly_increasing_highs(self):
+        """Fires hundreds of parallel bids and checks the accepted sequence."""
+        user = User.objects.create_user(username='bidder', password='pass')
+        now = timezone.now()
+        auction = Auction.objects.create(
+            title='Hot item',
+            description='Everybody wants it',
+            starting_price=Decimal('1.00'),
+            start_time=now - timedelta(hours=1),
+            end_time=now + timedelta(hours=1),
+            creator=user
+        )
+        amounts = [Decimal(i) for i in range(1, 301)]
+        random.shuffle(amounts)
+        errors = []
+
+        def bid(amount):
+            try:
+                place_bid(auction.id, user, amount)
+            except BidRejected:
+                pass
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=32) as executor:
+            list(executor.map(bid, amounts))
+
+        self.assertEqual(errors, [])
+        accepted = list(Bid.objects.filter(auction=auction).order_by('id').values_list('amount', flat=True))
+        self.assertEqual(accepted, sorted(set(accepted)))
+        auction.refresh_from_db()
+        self.assertEqual(auction.current_high_amount, Decimal('300'))
+        self.assertEqual(auction.current_high_bid.amount, Decimal('300'))
+        self.assertEqual(auction.bid_count, len(accepted))
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN is SQLite specific')
+class QueryPlanTests(TestCase):
+    """Tests that hot-path queries are answered from an index."""
+
+    def setUp(self):
+        """Creates an active auction with a few bids."""
+        self.user = User.objects.create_user(username='bidder', password='pass')
+        now = timezone.now()
+        self.auction = Auction.objects.create(
+            title='Bike',
+            description='Road bike',
+            starting_price=Decimal('100.00'),
+            start_time=now - timedelta(hours=1),
+            end_time=now + timedelta(hours=1),
+            creator=self.user
+        )
+        for amount in ('110.00', '120.00', '130.00'):
+            place_bid(self.auction.id, self.user, Decimal(amount))
+
+    def assertUsesIndex(self, sql, params=()):
+        """Fails if the plan scans a table or sorts with a temporary b-tree."""
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            plan = [row[-1] for row in cursor.fetchall()]
+        for detail in plan:
+            if 'TEMP B-TREE' in detail or (detail.startswith('SCAN') and 'INDEX' not in detail):
+                self.fail('Query does not use an index:\n%s\n%s' % (sql, '\n'.join(plan)))
+
+    def assertQuerySetUsesIndex(self, queryset):
+        """Runs assertUsesIndex on the SQL of a queryset."""
+        self.assertUsesIndex(*queryset.query.sql_with_params())
+
+    def test_bid_placement_queries_use_indexes(self):
+        """Tests every statement issued while accepting and rejecting bids."""
+        with CaptureQueriesContext(connection) as ctx:
+            place_bid(self.auction.id, self.user, Decimal('140.00'))
+            with self.assertRaises(BidRejected):
+                place_bid(self.auction.id, self.user, Decimal('140.00'))
+        statements = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith(('SELECT', 'UPDATE'))]
+        self.assertTrue(statements)
+        for sql in statements:
+            self.assertUsesIndex(sql)
+
+    def test_bid_lookups_use_indexes(self):
+        """Tests the highest bid, bid history and high bid recompute queries."""
+        self.assertQuerySetUsesIndex(self.auction.bids.order_by('-amount')[:1])
+        self.assertQuerySetUsesIndex(self.auction.bids.order_by('-amount', 'id')[:1])
+        self.assertQuerySetUsesIndex(self.auction.bids.all())
+        self.assertQuerySetUsesIndex(self.auction.bids.order_by('timestamp'))
+        with CaptureQueriesContext(connection) as ctx:
+            self.auction.refresh_current_high()
+        for query in ctx.captured_queries:
+            if query['sql'].startswith('SELECT'):
+                self.assertUsesIndex(query['sql'])
+
+    def test_auction_time_window_lookups_use_indexes(self):
+        """Tests the active and ended auction filters."""
+        now = timezone.now()
+        self.assertQuerySetUsesIndex(Auction.objects.filter(start_time__lte=now, end_time__gte=now))
+        self.assertQuerySetUsesIndex(Auction.objects.filter(end_time__lte=now))
+
+
+class AdminAuctionListTests(TestCase):
+    """Tests for the keyset paginated admin auction listing."""
+
+    def setUp(self):
+        """Creates auctions in the past, present and future and logs in as admin."""
+        self.user = User.objects.create_user(username='seller', password='pass')
+        self.other = User.objects.create_user(username='other', password='pass')
+        self.admin = User.objects.create_superuser(username='admin', password='adminpass')
+        now = timezone.now()
+        self.auctions = []
+        for i in range(7):
+            # Pairs of auctions share an end time to exercise the id tie-break
+            offset = timedelta(days=i // 2 - 1)
+            self.auctions.append(Auction.objects.create(
+                title='Item %d' % i,
+                description='Item',
+                starting_price=Decimal('10.00'),
+                start_time=now + offset - timedelta(hours=1),
+                end_time=now + offset + timedelta(hours=1),
+                creator=self.other if i == 6 else self.user
+            ))
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + str(RefreshToken.for_user(self.admin).access_token))
+
+    def test_cursor_walks_every_auction_once_in_order(self):
+        """Tests that following next_cursor visits (end_time, id) order without gaps."""
+        seen, cursor = [], None
+        while True:
+            params = {'limit': 3}
+            if cursor:
+                params['cursor'] = cursor
+            response = self.client.get('/api/admin/auction/', params)
+            self.assertEqual(response.status_code, 200)
+            seen.extend(row['id'] for row in response.data['results'])
+            cursor = response.data['next_cursor']
+            if cursor is None:
+                break
+        expected = [a.id for a in sorted(self.auctions, key=lambda a: (a.end_time, a.id))]
+        self.assertEqual(seen, expected)
+
+    def test_filters(self):
+        """Tests the status, creator and end time filters."""
+        def ids(params):
+            response = self.client.get('/api/admin/auction/', params)
+            self.assertEqual(response.status_code, 200)
+            return {row['id'] for row in response.data['results']}
+
+        self.assertEqual(ids({'status': 'ended'}), {a.id for a in self.auctions[:2]})
+        self.assertEqual(ids({'status': 'active'}), {a.id for a in self.auctions[2:4]})
+        self.assertEqual(ids({'status': 'upcoming'}), {a.id for a in self.auctions[4:]})
+        self.assertEqual(ids({'creator': self.other.id}), {self.auctions[6].id})
+        self.assertEqual(
+            ids({'ends_after': self.auctions[2].end_time.isoformat(), 'ends_before': self.auctions[4].end_time.isoformat()}),
+            {a.id for a in self.auctions[2:4]}
+        )
+
+    def test_invalid_parameters(self):
+        """Tests that malformed parameters are rejected with 400."""
+        for params in ({'cursor': 'garbage'}, {'limit': 0}, {'limit': 'ten'}, {'status': 'closed'}, {'ends_after': 'yesterday'}):
+            response = self.client.get('/api/admin/auction/', params)
+            self.assertEqual(response.status_code, 400, params)
+
+    def test_ndjson_stream(self):
+        """Tests that the streaming mode yields every auction as one JSON line."""
+        response = self.client.get('/api/admin/auction/', {'stream': 'true', 'creator': self.user.id})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([row['id'] for row in rows], [a.id for a in self.auctions[:6]])
+        self.assertEqual(rows[0]['starting_price'], '10.00')
+
+
+class LiveAuctionsTests(TestCase):
+    """Tests for the cached public live auction listing."""
+
+    def setUp(self):
+        """Clears the cache and creates an active and an ended auction."""
+        cache.clear()
+        self.user = User.objects.create_user(username='seller', password='pass')
+        self.admin = User.objects.create_superuser(username='admin', password='adminpass')
+        now = timezone.now()
+        self.live = Auction.objects.create(
+            title='Live',
+            description='Running now',
+            starting_price=Decimal('10.00'),
+            start_time=now - timedelta(hours=1),
+            end_time=now + timedelta(hours=1),
+            creator=self.user
+        )
+        Auction.objects.create(
+            title='Ended',
+            description='Finished yesterday',
+            starting_price=Decimal('10.00'),
+            start_time=now - timedelta(days=2),
+            end_time=now - timedelta(days=1),
+            creator=self.user
+        )
+        self.client = APIClient()
+
+    def authenticate(self, user):
+        """Sends subsequent requests with a JWT for the given user."""
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + str(RefreshToken.for_user(user).access_token))
+
+    def test_warm_reads_do_not_query_the_database(self):
+        """Tests that only the first read hits the database."""
+        response = self.client.get('/api/auctions/live/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['id'] for row in response.data], [self.live.id])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/api/auctions/live/').data, response.data)
+
+    def test_bids_reload_only_their_auction_entry(self):
+        """Tests that an accepted bid is visible after reloading only its auction's row."""
+        self.client.get('/api/auctions/live/')
+        self.authenticate(self.user)
+        response = self.client.post('/api/bid/', {'auction_id': self.live.id, 'amount': '12'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.client.credentials()
+        with self.assertNumQueries(1):
+            row = self.client.get('/api/auctions/live/').data[0]
+        self.assertEqual(row['current_high_amount'], '12.00')
+        self.assertEqual(row['current_high_bid'], response.data['bid']['id'])
+        with self.assertNumQueries(0):
+            self.client.get('/api/auctions/live/')
+
+    def test_bids_reported_out_of_order_keep_the_highest(self):
+        """Tests that a lower bid reported after a higher one does not bring back the lower high."""
+        lower = place_bid(self.live.id, self.user, Decimal('12.00'))
+        higher = place_bid(self.live.id, self.user, Decimal('20.00'))
+        self.client.get('/api/auctions/live/')
+        live_cache.record_bid(higher)
+        self.client.get('/api/auctions/live/')
+        live_cache.record_bid(lower)
+        row = self.client.get('/api/auctions/live/').data[0]
+        self.assertEqual(row['current_high_amount'], '20.00')
+        self.assertEqual(row['current_high_bid'], higher.id)
+
+    def test_entries_loaded_while_a_bid_is_reported_are_not_cached(self):
+        """Tests that a read racing a bid serves the row it loaded without caching it."""
+        place_bid(self.live.id, self.user, Decimal('12.00'))
+        entries = live_cache._entries_queryset
+        try:
+            def racing(ids):
+                """Reports a bid after the rows are read, as a concurrent request would"""
+                rows = list(entries(ids))
+                live_cache.auction_changed(self.live.id)
+                return rows
+            live_cache._entries_queryset = racing
+            self.assertEqual(live_cache.get_live_auctions()[0]['current_high_amount'], '12.00')
+        finally:
+            live_cache._entries_queryset = entries
+        self.assertIsNone(cache.get(live_cache.ENTRY_KEY % self.live.id))
+
+    def test_new_and_deleted_auctions_invalidate_the_index(self):
+        """Tests that creating and deleting auctions changes the listing."""
+        self.client.get('/api/auctions/live/')
+        self.authenticate(self.user)
+        now = timezone.now()
+        response = self.client.post('/api/auction/', {
+            'title': 'Fresh',
+            'description': 'Just listed',
+            'starting_price': '5.00',
+            'start_time': now.isoformat(),
+            'end_time': (now + timedelta(hours=2)).isoformat(),
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.client.credentials()
+        ids = [row['id'] for row in self.client.get('/api/auctions/live/').data]
+        self.assertEqual(ids, [self.live.id, response.data['id']])
+
+        self.authenticate(self.admin)
+        self.client.delete('/api/admin/auction/', data={'auction_id': self.live.id}, format='json')
+        self.client.credentials()
+        ids = [row['id'] for row in self.client.get('/api/auctions/live/').data]
+        self.assertEqual(ids, [response.data['id']])
+
+    def test_bid_deletion_reloads_only_that_entry(self):
+        """Tests that deleting a bid refreshes the affected auction's high."""
+        bid = place_bid(self.live.id, self.user, Decimal('15.00'))
+        self.client.get('/api/auctions/live/')
+        self.authenticate(self.admin)
+        self.client.delete('/api/admin/auction/', data={'bid_id': bid.id}, format='json')
+        self.client.credentials()
+        with self.assertNumQueries(1):
+            row = self.client.get('/api/auctions/live/').data[0]
+        self.assertIsNone(row['current_high_amount'])
+
+
+class AuctionCloserTests(TestCase):
+    """Tests for the scheduler that closes auctions and records winners."""
+
+    def setUp(self):
+        """Creates a seller and a bidder."""
+        self.user = User.objects.create_user(username='seller', password='pass')
+        self.bidder = User.objects.create_user(username='bidder', password='pass')
+        self.now = timezone.now()
+
+    def create_auction(self, ends_in, **kwargs):
+        """Creates an auction that started an hour ago and ends after the given delta."""
+        return Auction.objects.create(
+            title='Item',
+            description='Item',
+            starting_price=Decimal('10.00'),
+            start_time=self.now - timedelta(hours=1),
+            end_time=self.now + ends_in,
+            creator=self.user,
+            **kwargs
+        )
+
+    def test_closes_due_auctions_and_records_winner(self):
+        """Tests that only auctions past their end time are closed, with their high bid as winner."""
+        with_bids = self.create_auction(timedelta(minutes=5))
+        place_bid(with_bids.id, self.bidder, Decimal('11.00'))
+        winner = place_bid(with_bids.id, self.bidder, Decimal('12.00'))
+        without_bids = self.create_auction(timedelta(minutes=5))
+        later = self.create_auction(timedelta(hours=5))
+
+        closer = AuctionCloser(poll_seconds=600)
+        self.assertEqual(closer.run_once(self.now), 0)
+        self.assertEqual(closer.seconds_until_next(self.now), 300)
+
+        deadline = self.now + timedelta(minutes=5)
+        self.assertEqual(closer.run_once(deadline), 2)
+        with_bids.refresh_from_db()
+        without_bids.refresh_from_db()
+        later.refresh_from_db()
+        self.assertEqual(with_bids.status, Auction.Status.CLOSED)
+        self.assertEqual(with_bids.winning_bid, winner)
+        self.assertEqual(with_bids.closed_at, deadline)
+        self.assertEqual(without_bids.status, Auction.Status.CLOSED)
+        self.assertIsNone(without_bids.winning_bid)
+        self.assertEqual(later.status, Auction.Status.OPEN)
+
+    def test_new_auctions_are_picked_up_at_the_next_poll(self):
+        """Tests that an auction created after the load, ending first, is closed without a full reload."""
+        self.create_auction(timedelta(hours=1))
+        closer = AuctionCloser(poll_seconds=1)
+        closer.run_once(self.now)
+        soon = self.create_auction(timedelta(seconds=30))
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(closer.run_once(self.now + timedelta(seconds=1)), 0)
+        self.assertIn('"id" > %d' % (soon.id - 1), ctx.captured_queries[0]['sql'])
+        self.assertEqual(closer.seconds_until_next(self.now + timedelta(seconds=1)), 1)
+        self.assertEqual(closer.run_once(self.now + timedelta(seconds=30)), 1)
+        soon.refresh_from_db()
+        self.assertEqual(soon.status, Auction.Status.CLOSED)
+
+    def test_extended_auctions_stay_scheduled(self):
+        """Tests that an auction whose end time moved later is closed at its new end time."""
+        auction = self.create_auction(timedelta(minutes=5))
+        closer = AuctionCloser(poll_seconds=3600)
+        closer.run_once(self.now)
+        Auction.objects.filter(id=auction.id).update(end_time=self.now + timedelta(minutes=10))
+        self.assertEqual(closer.run_once(self.now + timedelta(minutes=5)), 0)
+        self.assertEqual(closer.run_once(self.now + timedelta(minutes=10)), 1)
+
+    def test_closed_auction_rejects_bids(self):
+        """Tests that bids are refused once an auction has been closed."""
+        auction = self.create_auction(timedelta(minutes=5), status=Auction.Status.CLOSED)
+        with self.assertRaisesMessage(BidRejected, 'Auction not active'):
+            place_bid(auction.id, self.bidder, Decimal('20.00'))
+        self.assertFalse(auction.is_active())
+
+    def test_shared_end_time_closes_in_batches(self):
+        """Tests that ten thousand auctions ending together take one UPDATE per batch."""
+        end_time = self.now - timedelta(seconds=1)
+        Auction.objects.bulk_create([
+            Auction(
+                title='Item %d' % i,
+                description='Item',
+                starting_price=Decimal('1.00'),
+                start_time=self.now - timedelta(hours=1),
+                end_time=end_time,
+                creator=self.user
+            )
+            for i in range(10000)
+        ])
+        with CaptureQueriesContext(connection) as ctx:
+            closed = AuctionCloser(batch_size=500).run_once(self.now)
+        self.assertEqual(closed, 10000)
+        updates = [q for q in ctx.captured_queries if q['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 20)
+        self.assertFalse(Auction.objects.filter(status=Auction.Status.OPEN).exists())
+
+    def test_management_command_once(self):
+        """Tests that run_auction_closer --once closes what is already due."""
+        auction = self.create_auction(-timedelta(minutes=1))
+        call_command('run_auction_closer', '--once', stdout=StringIO())
+        auction.refresh_from_db()
+        self.assertEqual(auction.status, Auction.Status.CLOSED)
+
+
+class GroupCommitTests(TransactionTestCase):
+    """Tests for the opt-in group commit bid writer."""
+
+    def setUp(self):
+        """Creates an active auction and starts a batcher."""
+        self.user = User.objects.create_user(username='bidder', password='pass')
+        now = timezone.now()
+        self.auction = Auction.objects.create(
+            title='Hot item',
+            description='Everybody wants it',
+            starting_price=Decimal('1.00'),
+            start_time=now - timedelta(hours=1),
+            end_time=now + timedelta(hours=1),
+            creator=self.user
+        )
+        self.batcher = BidBatcher(max_batch_size=50, max_wait_ms=5)
+
+    def tearDown(self):
+        """Stops the batcher's writer thread."""
+        self.batcher.stop()
+
+    def test_concurrent_callers_each_get_their_own_answer(self):
+        """Tests that batched decisions match the rows written and keep highs increasing."""
+        amounts = [Decimal(i) for i in range(1, 301)]
+        random.shuffle(amounts)
+        results = {}
+
+        def bid(amount):
+            try:
+                results[amount] = self.batcher.submit(self.auction.id, self.user, amount)
+            except BidRejected as exc:
+                results[amount] = exc
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=64) as executor:
+            list(executor.map(bid, amounts))
+
+        accepted = {amount: bid for amount, bid in results.items() if isinstance(bid, Bid)}
+        self.assertEqual(len(results), 300)
+        rows = list(Bid.objects.filter(auction=self.auction).order_by('id'))
+        self.assertEqual({row.id: row.amount for row in rows}, {bid.id: amount for amount, bid in accepted.items()})
+        self.assertEqual([row.amount for row in rows], sorted(row.amount for row in rows))
+        self.auction.refresh_from_db()
+        self.assertEqual(self.auction.current_high_amount, Decimal('300'))
+        self.assertEqual(self.auction.current_high_bid_id, rows[-1].id)
+        self.assertEqual(self.auction.bid_count, len(rows))
+
+    def test_rejections(self):
+        """Tests that rejected bids get the same errors as the direct path."""
+        self.batcher.submit(self.auction.id, self.user, Decimal('5.00'))
+        with self.assertRaisesMessage(BidRejected, 'Bid must be higher than current highest bid'):
+            self.batcher.submit(self.auction.id, self.user, Decimal('5.00'))
+        with self.assertRaises(BidRejected) as ctx:
+            self.batcher.submit(self.auction.id + 1000, self.user, Decimal('5.00'))
+        self.assertEqual(ctx.exception.status_code, 404)
+        with self.assertRaisesMessage(BidRejected, 'Ensure that there are no more than 10 digits in total.'):
+            self.batcher.submit(self.auction.id, self.user, Decimal('1e12'))
+
+    def test_a_failing_bid_does_not_fail_its_batch(self):
+        """Tests that a bid the database refuses fails alone and the rest of its batch is written."""
+        batcher = BidBatcher(max_batch_size=50, max_wait_ms=500)
+        self.addCleanup(batcher.stop)
+        # No such user: the bid breaks a foreign key when its batch commits
+        ghost = User(id=self.user.id + 1000)
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            futures = [executor.submit(batcher.submit, self.auction.id, bidder, Decimal(amount))
+                       for bidder, amount in ((self.user, '2'), (ghost, '3'), (self.user, '4'))]
+        self.assertEqual(futures[0].result().amount, Decimal('2'))
+        self.assertRaises(IntegrityError, futures[1].result)
+        self.assertEqual(futures[2].result().amount, Decimal('4'))
+        self.assertEqual(sorted(Bid.objects.values_list('amount', flat=True)), [Decimal('2'), Decimal('4')])
+
+    @override_settings(BID_GROUP_COMMIT={'ENABLED': True})
+    def test_enter_bid_view_uses_group_commit(self):
+        """Tests the bid endpoint end to end with group commit enabled."""
+        self.addCleanup(reset_batcher)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION='Bearer ' + str(RefreshToken.for_user(self.user).access_token))
+        response = client.post('/api/bid/', {'auction_id': self.auction.id, 'amount': '2.00'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        response = client.post('/api/bid/', {'auction_id': self.auction.id, 'amount': '2.00'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Bid.objects.count(), 1)
+
+
+class ProxyBiddingTests(TestCase):
+    """Tests for maximum (proxy) bids placed automatically in increments."""
+
+    def setUp(self):
+        """Creates three bidders and an active auction starting at 10.00."""
+        reset_engine()
+        self.seller = User.objects.create_user(username='seller', password='pass')
+        self.alice = User.objects.create_user(username='alice', password='pass')
+        self.bob = User.objects.create_user(username='bob', password='pass')
+        self.carol = User.objects.create_user(username='carol', password='pass')
+        now = timezone.now()
+        self.auction = Auction.objects.create(
+            title='Watch',
+            description='Vintage watch',
+            starting_price=Decimal('10.00'),
+            start_time=now - timedelta(hours=1),
+            end_time=now + timedelta(hours=1),
+            creator=self.seller
+        )
+        self.client = APIClient()
+
+    def tearDown(self):
+        """Drops proxy state that belongs to this test's database rows."""
+        reset_engine()
+
+    def post_as(self, user, url, data):
+        """Posts JSON as the given user."""
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + str(RefreshToken.for_user(user).access_token))
+        return self.client.post(url, data, format='json')
+
+    def assertHigh(self, bidder, amount):
+        """Checks the auction's visible high bid."""
+        self.auction.refresh_from_db()
+        self.assertEqual(self.auction.current_high_bid.bidder, bidder)
+        self.assertEqual(self.auction.current_high_amount, Decimal(amount))
+
+    def test_book_orders_by_amount_then_time(self):
+        """Tests the top two entries after raises, ties and superseded entries."""
+        book = ProxyBook()
+        now = timezone.now()
+        book.set(1, Decimal('30'), now)
+        book.set(2, Decimal('50'), now + timedelta(seconds=1))
+        book.set(3, Decimal('50'), now + timedelta(seconds=2))
+        self.assertEqual(book.top_two(), [(Decimal('50'), 2), (Decimal('50'), 3)])
+        book.set(1, Decimal('70'), now + timedelta(seconds=3))
+        self.assertEqual(book.top_two(), [(Decimal('70'), 1), (Decimal('50'), 2)])
+        self.assertEqual(len(book), 3)
+
+    def test_resolve(self):
+        """Tests the visible bids produced for the main competitive situations."""
+        book = ProxyBook()
+        now = timezone.now()
+        increment = Decimal('1')
+        book.set(1, Decimal('50'), now)
+        # Lone proxy opens at the starting price, then answers a manual bid
+        self.assertEqual(resolve(book, None, None, Decimal('10'), increment), [(1, Decimal('10'))])
+        self.assertEqual(resolve(book, Decimal('10'), 1, Decimal('10'), increment), [])
+        self.assertEqual(resolve(book, Decimal('20'), 2, Decimal('10'), increment), [(1, Decimal('21'))])
+        self.assertEqual(resolve(book, Decimal('49.50'), 2, Decimal('10'), increment), [(1, Decimal('50'))])
+        self.assertEqual(resolve(book, Decimal('50'), 2, Decimal('10'), increment), [])
+        # A weaker proxy shows its maximum before being outbid
+        book.set(2, Decimal('30'), now)
+        self.assertEqual(resolve(book, Decimal('21'), 1, Decimal('10'), increment), [(2, Decimal('30')), (1, Decimal('31'))])
+
+    def test_proxies_outbid_manual_and_proxy_bids(self):
+        """Tests a sequence of maximum and manual bids through the API."""
+        response = self.post_as(self.alice, '/api/bid/proxy/', {'auction_id': self.auction.id, 'max_amount': '50.00'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['leading'])
+        self.assertHigh(self.alice, '10.00')
+
+        response = self.post_as(self.bob, '/api/bid/', {'auction_id': self.auction.id, 'amount': '20.00'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['outbid'])
+        self.assertHigh(self.alice, '21.00')
+
+        response = self.post_as(self.bob, '/api/bid/proxy/', {'auction_id': self.auction.id, 'max_amount': '30.00'})
+        self.assertFalse(response.data['leading'])
+        self.assertEqual([b['amount'] for b in response.data['bids']], ['30.00', '31.00'])
+        self.assertHigh(self.alice, '31.00')
+
+        response = self.post_as(self.carol, '/api/bid/proxy/', {'auction_id': self.auction.id, 'max_amount': '60.00'})
+        self.assertTrue(response.data['leading'])
+        self.assertHigh(self.carol, '51.00')
+        self.assertEqual(self.auction.bid_count, Bid.objects.filter(auction=self.auction).count())
+
+    def test_maximum_must_beat_current_high(self):
+        """Tests that a maximum at or below the current high is rejected."""
+        place_bid(self.auction.id, self.bob, Decimal('20.00'))
+        response = self.post_as(self.alice, '/api/bid/proxy/', {'auction_id': self.auction.id, 'max_amount': '20.00'})
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(ProxyBid.objects.exists())
+
+    def test_state_is_rebuilt_from_the_database(self):
+        """Tests that a fresh engine resumes from stored maxima."""
+        self.post_as(self.alice, '/api/bid/proxy/', {'auction_id': self.auction.id, 'max_amount': '50.00'})
+        engine = ProxyEngine()
+        self.assertEqual(engine.books[self.auction.id].top_two(), [(Decimal('50.00'), self.alice.id)])
+        bid = place_bid(self.auction.id, self.bob, Decimal('40.00'))
+        self.assertEqual([b.amount for b in engine.respond_to_bid(bid)], [Decimal('41.00')])
+        self.assertHigh(self.alice, '41.00')
+
+    def test_engines_see_maximums_registered_by_other_processes(self):
+        """Tests that an engine built before another process registered or raised a maximum still answers bids."""
+        worker_a, worker_b = ProxyEngine(), ProxyEngine()
+        worker_a.register(self.auction.id, self.alice, Decimal('50.00'))
+        bid = place_bid(self.auction.id, self.bob, Decimal('20.00'))
+        self.assertEqual([b.amount for b in worker_b.respond_to_bid(bid)], [Decimal('21.00')])
+        self.assertHigh(self.alice, '21.00')
+
+        worker_a.register(self.auction.id, self.alice, Decimal('80.00'))
+        bid = place_bid(self.auction.id, self.bob, Decimal('60.00'))
+        self.assertEqual([b.amount for b in worker_b.respond_to_bid(bid)], [Decimal('61.00')])
+        self.assertHigh(self.alice, '61.00')
+
+    def test_bids_without_maximums_skip_the_engine(self):
+        """Tests that bids on auctions nobody registered a maximum on cost no proxy queries."""
+        engine = get_engine()
+        bid = place_bid(self.auction.id, self.bob, Decimal('20.00'))
+        self.assertEqual(bid.proxy_version, 0)
+        with self.assertNumQueries(0):
+            self.assertEqual(engine.respond_to_bid(bid), [])
+
+
+class AsyncEndpointTests(TransactionTestCase):
+    """Tests for the native async endpoints served under ASGI."""
+
+    def setUp(self):
+        """Creates a bidder with a token and an active auction."""
+        cache.clear()
+        reset_engine()
+        self.user = User.objects.create_user(username='bidder', password='pass')
+        now = timezone.now()
+        self.auction = Auction.objects.create(
+            title='Camera',
+            description='Film camera',
+            starting_price=Decimal('10.00'),
+            start_time=now - timedelta(hours=1),
+            end_time=now + timedelta(hours=1),
+            creator=self.user
+        )
+        self.client = AsyncClient()
+        self.auth = {'Authorization': 'Bearer ' + str(RefreshToken.for_user(self.user).access_token)}
+
+    async def test_place_bid(self):
+        """Tests that bids are accepted and rejected like the sync endpoint."""
+        url = '/api/async/bid/'
+        response = await self.client.post(url, {'auction_id': self.auction.id, 'amount': '12'}, content_type='application/json', headers=self.auth)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['bid']['amount'], '12.00')
+        response = await self.client.post(url, {'auction_id': self.auction.id, 'amount': '12'}, content_type='application/json', headers=self.auth)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'error': 'Bid must be higher than current highest bid'})
+        response = await self.client.post(url, {'auction_id': self.auction.id + 1000, 'amount': '50'}, content_type='application/json', headers=self.auth)
+        self.assertEqual(response.status_code, 404)
+        response = await self.client.post(url, {'auction_id': self.auction.id, 'amount': '50'}, content_type='application/json')
+        self.assertEqual(response.status_code, 401)
+        for amount in ('NaN', '1e12'):
+            response = await self.client.post(url, {'auction_id': self.auction.id, 'amount': amount}, content_type='application/json', headers=self.auth)
+            self.assertEqual(response.status_code, 400)
+        self.assertEqual(await Bid.objects.acount(), 1)
+
+    async def test_reads_match_sync_payloads(self):
+        """Tests that the async auction reads return the same JSON as the sync views."""
+        response = await self.client.get('/api/async/auction/%d/' % self.auction.id)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), json.loads(json.dumps(AuctionSerializer(self.auction).data)))
+        self.assertEqual((await self.client.get('/api/async/auction/%d/' % (self.auction.id + 1000))).status_code, 404)
+
+        sync_live = await sync_to_async(lambda: APIClient().get('/api/auctions/live/').json())()
+        response = await self.client.get('/api/async/auctions/live/')
+        self.assertEqual(response.json(), sync_live)
+
+    async def test_metrics_count_queries_of_async_views(self):
+        """Tests that queries run on sync_to_async threads are counted for the request."""
+        registry.reset()
+        await self.client.get('/api/async/auction/%d/' % self.auction.id)
+        stats = registry.views[('async_auction_detail', 'GET')]
+        self.assertEqual(stats.statuses, {200: 1})
+        self.assertGreater(stats.queries, 0)
+        self.assertGreater(stats.db_seconds, 0)
+
+
+def parse_events(chunk):
+    """Returns the (event, data) pairs in a chunk of a server-sent events stream."""
+    parsed = []
+    for block in chunk.decode().split('\n\n'):
+        fields = dict(line.split(': ', 1) for line in block.splitlines() if not line.startswith(':'))
+        if fields:
+            parsed.append((fields['event'], json.loads(fields['data'])))
+    return parsed
+
+
+class BidStreamTests(TransactionTestCase):
+    """Tests for the server-sent events stream of an auction's bids."""
+
+    def setUp(self):
+        """Creates two bidders and an active auction."""
+        reset_engine()
+        self.user = User.objects.create_user(username='bidder', password='pass')
+        self.rival = User.objects.create_user(username='rival', password='pass')
+        now = timezone.now()
+        self.auction = Auction.objects.create(
+            title='Lamp',
+            description='Desk lamp',
+            starting_price=Decimal('10.00'),
+            start_time=now - timedelta(hours=1),
+            end_time=now + timedelta(hours=1),
+            creator=self.user
+        )
+        self.url = '/api/auction/%d/stream/' % self.auction.id
+        self.client = AsyncClient()
+
+    def tearDown(self):
+        """Drops proxy state that belongs to this test's database rows."""
+        reset_engine()
+
+    def post(self, user, path, data):
+        """Posts to a sync endpoint as the given user."""
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION='Bearer ' + str(RefreshToken.for_user(user).access_token))
+        return client.post(path, data, format='json')
+
+    async def test_stream_pushes_accepted_bids(self):
+        """Tests that subscribers get a snapshot, then direct and proxy bids as they are accepted."""
+        response = await self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = aiter(response.streaming_content)
+        event, data = parse_events(await anext(stream))[0]
+        self.assertEqual(event, 'snapshot')
+        self.assertEqual((data['current_high_amount'], data['bid_count']), (None, 0))
+
+        await sync_to_async(self.post)(self.rival, '/api/bid/proxy/', {'auction_id': self.auction.id, 'max_amount': '20'})
+        received = await self.read_bids(stream, 1)
+        self.assertEqual((received[0]['bidder'], received[0]['amount']), (self.rival.id, '10.00'))
+
+        # The bid and the proxy's answer arrive in order
+        await sync_to_async(self.post)(self.user, '/api/bid/', {'auction_id': self.auction.id, 'amount': '12'})
+        received = await self.read_bids(stream, 2)
+        self.assertEqual([(bid['bidder'], bid['amount']) for bid in received], [(self.user.id, '12.00'), (self.rival.id, '13.00')])
+        self.assertEqual(received[1]['id'], (await Auction.objects.aget(id=self.auction.id)).current_high_bid_id)
+
+        # Django's ASGI handler cancels the response task when the client disconnects
+        reader = asyncio.ensure_future(anext(stream))
+        await asyncio.sleep(0.01)
+        reader.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await reader
+        self.assertEqual(broker.subscriber_count(self.auction.id), 0)
+
+    async def read_bids(self, stream, count):
+        """Reads stream chunks until count bid events arrived and returns their data."""
+        bids = []
+        while len(bids) < count:
+            bids.extend(data for event, data in parse_events(await asyncio.wait_for(anext(stream), 5)) if event == 'bid')
+        return bids
+
+    async def test_slow_subscriber_is_coalesced(self):
+        """Tests that a subscriber that stops reading keeps only its latest events."""
+        with override_settings(BID_STREAM={'QUEUE_SIZE': 4}):
+            subscriber = broker.subscribe(self.auction.id)
+        try:
+            # Publishing from a bidder's thread never waits for the subscriber
+            await asyncio.to_thread(lambda: [broker.publish(self.auction.id, b'%d' % i) for i in range(10)])
+            await asyncio.sleep(0)
+            self.assertEqual(await subscriber.get(timeout=1), [b'6', b'7', b'8', b'9'])
+            self.assertEqual(subscriber.dropped, 6)
+            self.assertEqual(await subscriber.get(timeout=0.01), [])
+        finally:
+            broker.unsubscribe(subscriber)
+        self.assertFalse(broker.has_subscribers(self.auction.id))
+
+    @override_settings(BID_STREAM={'HEARTBEAT_SECONDS': 0.05})
+    async def test_stream_ends_with_auction(self):
+        """Tests keep-alives while idle and the end event once the auction is over."""
+        await Auction.objects.filter(id=self.auction.id).aupdate(end_time=timezone.now() + timedelta(seconds=0.3))
+        response = await self.client.get(self.url)
+        chunks = [chunk async for chunk in response.streaming_content]
+        self.assertEqual(parse_events(chunks[0])[0][0], 'snapshot')
+        self.assertIn(b': keep-alive\n\n', chunks[1:-1])
+        self.assertEqual(parse_events(chunks[-1]), [('end', {'auction_id': self.auction.id})])
+        self.assertFalse(broker.has_subscribers(self.auction.id))
+
+    async def test_stream_ends_when_auction_is_deleted(self):
+        """Tests that deleting an auction ends its stream before the end time."""
+        response = await self.client.get(self.url)
+        stream = aiter(response.streaming_content)
+        self.assertEqual(parse_events(await anext(stream))[0][0], 'snapshot')
+        await sync_to_async(delete_auctions)([self.auction.id])
+        chunks = [chunk async for chunk in stream]
+        self.assertEqual(parse_events(b''.join(chunks)), [('end', {'auction_id': self.auction.id})])
+        self.assertFalse(broker.has_subscribers(self.auction.id))
+
+    async def test_stream_errors(self):
+        """Tests missing auctions and requests served by the WSGI handler."""
+        response = await self.client.get('/api/auction/%d/stream/' % (self.auction.id + 1000))
+        self.assertEqual(response.status_code, 404)
+        response = await sync_to_async(APIClient().get)(self.url)
+        self.assertEqual(response.status_code, 501)
+
+
+class ClaimsAuthenticationTests(TestCase):
+    """Tests for JWT authentication from token claims with the cached User fallback."""
+
+    def setUp(self):
+        """Creates a bidder, an admin and an active auction."""
+        cache.clear()
+        user_cache.clear()
+        cutoff_cache.clear()
+        self.user = User.objects.create_user(username='bidder', password='pass')
+        self.admin = User.objects.create_superuser(username='admin', password='adminpass')
+        now = timezone.now()
+        self.auction = Auction.objects.create(
+            title='Clock',
+            description='Wall clock',
+            starting_price=Decimal('10.00'),
+            start_time=now - timedelta(hours=1),
+            end_time=now + timedelta(hours=1),
+            creator=self.user
+        )
+
+    def client_for(self, token):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION='Bearer ' + str(token.access_token))
+        return client
+
+    def user_queries(self, request):
+        """Runs a request and returns its response and the queries it made on the user table."""
+        with CaptureQueriesContext(connection) as queries:
+            response = request()
+        return response, [query['sql'] for query in queries if '"auth_user"' in query['sql']]
+
+    def test_claims_token_needs_no_user_query(self):
+        """Tests that bids authenticated by claims never read the user table."""
+        client = self.client_for(ClaimsRefreshToken.for_user(self.user))
+        response, queries = self.user_queries(
+            lambda: client.post('/api/bid/', {'auction_id': self.auction.id, 'amount': '12'}, format='json')
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['bid']['bidder'], self.user.id)
+        self.assertEqual(queries, [])
+        self.assertEqual(Bid.objects.get().bidder, self.user)
+
+    def test_tokens_without_claims_use_the_user_cache(self):
+        """Tests that older tokens load the user once and then hit the cache."""
+        client = self.client_for(RefreshToken.for_user(self.user))
+        bid = lambda amount: client.post('/api/bid/', {'auction_id': self.auction.id, 'amount': amount}, format='json')
+        response, queries = self.user_queries(lambda: bid('12'))
+        self.assertEqual((response.status_code, len(queries)), (200, 1))
+        response, queries = self.user_queries(lambda: bid('13'))
+        self.assertEqual((response.status_code, len(queries)), (200, 0))
+
+    def test_issued_tokens_carry_claims(self):
+        """Tests that both token endpoints issue tokens the claims path trusts."""
+        for path in ('/api/token/', '/api/login/'):
+            access = APIClient().post(path, {'username': 'admin', 'password': 'adminpass'}, format='json').data['access']
+            client = APIClient()
+            client.credentials(HTTP_AUTHORIZATION='Bearer ' + access)
+            response, queries = self.user_queries(lambda: client.get('/api/admin/auction/'))
+            self.assertEqual((response.status_code, queries), (200, []))
+
+    def test_flag_changes_invalidate_claims_and_cache(self):
+        """Tests that demoted and deactivated users lose access with tokens issued before."""
+        admin_client = self.client_for(ClaimsRefreshToken.for_user(self.admin))
+        self.assertEqual(admin_client.get('/api/admin/auction/').status_code, 200)
+        self.admin.is_staff = False
+        self.admin.save()
+        self.assertEqual(admin_client.get('/api/admin/auction/').status_code, 403)
+
+        # Warm the cache with the full user, then deactivate it
+        client = self.client_for(RefreshToken.for_user(self.user))
+        self.assertEqual(client.post('/api/bid/', {'auction_id': self.auction.id, 'amount': '12'}, format='json').status_code, 200)
+        self.user.is_active = False
+        self.user.save(update_fields=['is_active'])
+        self.assertEqual(client.post('/api/bid/', {'auction_id': self.auction.id, 'amount': '13'}, format='json').status_code, 401)
+        self.assertEqual(Bid.objects.count(), 1)
+
+    def test_changes_made_without_signals_distrust_claims(self):
+        """Tests that QuerySet.update() and delete() distrust claims issued before them in every process."""
+        admin_client = self.client_for(ClaimsRefreshToken.for_user(self.admin))
+        self.assertEqual(admin_client.get('/api/admin/auction/').status_code, 200)
+        User.objects.filter(id=self.admin.id).update(is_staff=False)
+        self.assertTrue(ClaimsCutoff.objects.filter(user_id=self.admin.id).exists())
+        # As in another process, or in this one once the cached cutoff expires
+        cutoff_cache.clear()
+        self.assertEqual(admin_client.get('/api/admin/auction/').status_code, 403)
+
+        client = self.client_for(ClaimsRefreshToken.for_user(self.user))
+        User.objects.filter(id=self.user.id).update(last_login=timezone.now())
+        self.assertFalse(ClaimsCutoff.objects.filter(user_id=self.user.id).exists())
+        User.objects.filter(id=self.user.id).delete()
+        self.assertTrue(ClaimsCutoff.objects.filter(user_id=self.user.id).exists())
+        cutoff_cache.clear()
+        response = client.post('/api/bid/', {'auction_id': self.auction.id, 'amount': '12'}, format='json')
+        self.assertEqual(response.status_code, 401)
+
+    def test_database_mode(self):
+        """Tests that disabling claims authentication loads the user on every request."""
+        client = self.client_for(ClaimsRefreshToken.for_user(self.user))
+        with override_settings(JWT_CLAIMS_AUTH={'ENABLED': False}):
+            for amount in ('12', '13'):
+                response, queries = self.user_queries(
+                    lambda: client.post('/api/bid/', {'auction_id': self.auction.id, 'amount': amount}, format='json')
+                )
+                self.assertEqual((response.status_code, len(queries)), (200, 1))
+
+    def test_user_cache_is_bounded_with_ttl(self):
+        """Tests LRU eviction and expiry of cached users."""
+        users = [self.user, self.admin, User.objects.create_user(username='third', password='pass')]
+        lru = UserCache(max_size=2, ttl=60)
+        lru.get(users[0].id)
+        lru.get(users[1].id)
+        lru.get(users[0].id)
+        lru.get(users[2].id)
+        self.assertEqual(len(lru), 2)
+        with self.assertNumQueries(0):
+            self.assertEqual(lru.get(users[0].id), users[0])
+        with self.assertNumQueries(1):
+            lru.get(users[1].id)
+
+        expiring = UserCache(max_size=2, ttl=0)
+        expiring.get(users[0].id)
+        with self.assertNumQueries(1):
+            expiring.get(users[0].id)
+
+
+class TokenRevocationTests(TestCase):
+    """Tests for the in-memory revoked token index and blacklist pruning."""
+
+    def setUp(self):
+        """Creates a user and starts from a freshly loaded index."""
+        cache.clear()
+        reset_index()
+        self.user = User.objects.create_user(username='bidder', password='pass')
+
+    def tearDown(self):
+        """Drops the index loaded from this test's database rows."""
+        reset_index()
+
+    def refresh(self, token):
+        """Refreshes a token and returns the response and the blacklist queries it made."""
+        with CaptureQueriesContext(connection) as queries:
+            response = APIClient().post('/api/token/refresh/', {'refresh': str(token)}, format='json')
+        return response, [query['sql'] for query in queries if 'blacklistedtoken' in query['sql']]
+
+    def test_bloom_filter(self):
+        """Tests that members are always found and non-members rarely are."""
+        bloom = BloomFilter(10000, 0.01)
+        members = ['jti-%d' % i for i in range(10000)]
+        for member in members:
+            bloom.add(member)
+        self.assertTrue(all(member in bloom for member in members))
+        false_positives = sum('other-%d' % i in bloom for i in range(10000))
+        self.assertLess(false_positives, 300)
+
+    def test_valid_refresh_skips_blacklist_table(self):
+        """Tests that refreshing an unrevoked token never queries the blacklist."""
+        token = ClaimsRefreshToken.for_user(self.user)
+        get_index()
+        response, queries = self.refresh(token)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(queries, [])
+
+    def test_logout_revokes_in_memory(self):
+        """Tests that a token blacklisted by logout is rejected from the index alone."""
+        token = ClaimsRefreshToken.for_user(self.user)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION='Bearer ' + str(token.access_token))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(client.post('/api/logout/', {'refresh': str(token)}, format='json').status_code, 200)
+        response, queries = self.refresh(token)
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(queries, [])
+
+    def test_revocations_recorded_elsewhere(self):
+        """Tests tokens revoked before the index loaded and by other processes."""
+        revoked_before = ClaimsRefreshToken.for_user(self.user)
+        revoked_before.blacklist()
+        with override_settings(TOKEN_REVOCATION_INDEX={'REFRESH_SECONDS': 0}):
+            get_index()
+        self.assertEqual(self.refresh(revoked_before)[0].status_code, 401)
+
+        revoked_after = ClaimsRefreshToken.for_user(self.user)
+        self.assertEqual(self.refresh(revoked_after)[0].status_code, 200)
+        BlacklistedToken.objects.create(token=OutstandingToken.objects.get(jti=revoked_after['jti']))
+        self.assertEqual(self.refresh(revoked_after)[0].status_code, 401)
+
+    def test_logout_on_another_process_revokes_at_once(self):
+        """Tests that a token revoked elsewhere is rejected before the next poll, without the blacklist table."""
+        token = ClaimsRefreshToken.for_user(self.user)
+        get_index()
+        # As recorded by the process handling the logout
+        BlacklistedToken.objects.create(token=OutstandingToken.objects.get(jti=token['jti']))
+        cache.set(REVOKED_KEY % token['jti'], True)
+        response, queries = self.refresh(token)
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(queries, [])
+
+    def test_prune_deletes_expired_tokens_in_batches(self):
+        """Tests that only expired tokens and their blacklist entries are pruned."""
+        tokens = [ClaimsRefreshToken.for_user(self.user) for _ in range(7)]
+        expired = [token['jti'] for token in tokens[::2]]
+        OutstandingToken.objects.filter(jti__in=expired).update(expires_at=timezone.now() - timedelta(minutes=1))
+        tokens[0].blacklist()
+        tokens[1].blacklist()
+
+        out = StringIO()
+        call_command('prune_token_blacklist', batch_size=2, stdout=out)
+        self.assertIn('Deleted 4 expired tokens', out.getvalue())
+        self.assertEqual(
+            set(OutstandingToken.objects.values_list('jti', flat=True)),
+            {token['jti'] for token in tokens[1::2]}
+        )
+        self.assertEqual(list(BlacklistedToken.objects.values_list('token__jti', flat=True)), [tokens[1]['jti']])
+
+
+@override_settings(PASSWORD_HASHING={'WORKERS': 1, 'MAX_QUEUE': 0, 'ITERATIONS': 1000})
+class PasswordHashingTests(TestCase):
+    """Tests for password hashing on the bounded pool."""
+
+    def setUp(self):
+        """Starts a one-worker pool without queue and creates a user."""
+        reset_pool()
+        self.user = User.objects.create_user(username='bidder', password='pass')
+        self.gate = threading.Event()
+
+    def tearDown(self):
+        """Releases blocked hashing workers and stops the pool."""
+        self.gate.set()
+        reset_pool()
+
+    def test_pool_refuses_work_beyond_its_queue(self):
+        """Tests that a full pool raises at once and frees its slots as work completes."""
+        pool = HashingPool(workers=1, max_queue=1)
+        running = [pool.submit(self.gate.wait), pool.submit(self.gate.wait)]
+        with self.assertRaises(HashingBusy):
+            pool.submit(self.gate.wait)
+        self.gate.set()
+        self.assertEqual([future.result() for future in running], [True, True])
+        self.assertEqual(pool.run(sum, [1, 2]), 3)
+        pool.shutdown()
+
+    def test_full_pool_returns_503_with_retry_after(self):
+        """Tests that logins, signups and token requests are shed while the pool is busy."""
+        get_pool().submit(self.gate.wait)
+        credentials = {'username': 'bidder', 'password': 'pass'}
+        for path, data in (('/api/login/', credentials), ('/api/signup/', {'username': 'new', 'password': 'pass'})):
+            response = APIClient().post(path, data, format='json')
+            self.assertEqual(response.status_code, 503)
+            self.assertEqual(response['Retry-After'], '1')
+            self.assertIn('error', response.data)
+        response = APIClient().post('/api/token/', credentials, format='json')
+        self.assertEqual((response.status_code, response['Retry-After']), (503, '1'))
+        self.assertFalse(User.objects.filter(username='new').exists())
+
+        self.gate.set()
+        self.assertEqual(APIClient().post('/api/login/', credentials, format='json').status_code, 200)
+
+    def test_cost_change_rehashes_on_login(self):
+        """Tests that raising the cost upgrades a password on its next login."""
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$1000$'))
+        with override_settings(PASSWORD_HASHING={'ITERATIONS': 2000}):
+            response = APIClient().post('/api/login/', {'username': 'bidder', 'password': 'pass'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$2000$'))
+        self.assertTrue(self.user.check_password('pass'))
+
+
+class ReadSerializerTests(TestCase):
+    """Tests for the precompiled read-only serializers."""
+
+    def setUp(self):
+        """Creates an open, a closed and a bidless auction with a few bids."""
+        self.user = User.objects.create_user(username='seller', password='pass')
+        self.bidder = User.objects.create_user(username='bidder', password='pass')
+        self.admin = User.objects.create_superuser(username='admin', password='adminpass')
+        now = timezone.now().replace(microsecond=0)
+        self.auctions = [Auction.objects.create(
+            title=title, description='Item \u2713 "quoted"', starting_price=Decimal(price),
+            start_time=now - timedelta(hours=2), end_time=now + timedelta(hours=hours, microseconds=micro), creator=self.user
+        ) for title, price, hours, micro in (('Lamp', '10', 1, 0), ('Caf\u00e9 table', '0.50', -1, 123456), ('Rug', '99999999.99', 2, 500))]
+        for amount in ('12', '15.5'):
+            place_bid(self.auctions[0].id, self.bidder, Decimal(amount))
+        place_bid(self.auctions[1].id, self.bidder, Decimal('1.00'), now=now - timedelta(hours=1))
+        close_auctions([self.auctions[1].id], now=now)
+
+    def assertSameJSON(self, reader, serializer_class, queryset):
+        expected = JSONRenderer().render(serializer_class(queryset, many=True).data)
+        self.assertEqual(JSONRenderer().render(reader.serialize(queryset)), expected)
+        self.assertEqual(JSONRenderer().render(reader.encode_instances(queryset)), expected)
+
+    def test_rows_render_byte_for_byte_like_the_serializers(self):
+        """Tests that auctions, bids and live entries render exactly as the model serializers render them."""
+        self.assertEqual(Auction.objects.filter(status=Auction.Status.CLOSED).count(), 1)
+        self.assertSameJSON(auction_reader, AuctionSerializer, Auction.objects.order_by('id'))
+        self.assertSameJSON(bid_reader, BidSerializer, Bid.objects.order_by('id'))
+        self.assertSameJSON(live_auction_reader, LiveAuctionSerializer, Auction.objects.order_by('id'))
+
+    def test_unquantized_values_and_local_time_fall_back_to_the_fields(self):
+        """Tests that values off the fast paths are formatted by the serializer fields."""
+        auction = self.auctions[0]
+        auction.current_high_amount = Decimal('7.5')
+        auction.starting_price = Decimal('3.14159')
+        self.assertEqual(auction_reader.encode_instance(auction), AuctionSerializer(auction).data)
+        with timezone.override('Europe/Paris'):
+            self.assertEqual(auction_reader.encode_instance(auction), AuctionSerializer(auction).data)
+            self.assertSameJSON(auction_reader, AuctionSerializer, Auction.objects.order_by('id'))
+
+    def test_admin_listing_and_stream_match_serializer_output(self):
+        """Tests that paginated and NDJSON admin listings keep their previous bodies."""
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        ordered = Auction.objects.order_by('end_time', 'id')
+        response = client.get('/api/admin/auction/', {'limit': 2})
+        self.assertEqual(response.content, JSONRenderer().render({
+            'results': AuctionSerializer(ordered[:2], many=True).data, 'next_cursor': response.data['next_cursor'],
+        }))
+        response = client.get('/api/admin/auction/', {'stream': 'true'})
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines, [json.dumps(AuctionSerializer(auction).data) for auction in ordered])
+
+
+class RequestMetricsTests(TestCase):
+    """Tests for the request metrics middleware and the /metrics endpoint."""
+
+    def setUp(self):
+        """Clears the aggregates and creates an active auction and a bidder."""
+        registry.reset()
+        self.user = User.objects.create_user(username='seller', password='pass')
+        self.bidder = User.objects.create_user(username='bidder', password='pass')
+        now = timezone.now()
+        self.auction = Auction.objects.create(
+            title='Lamp', description='Item', starting_price=Decimal('10.00'),
+            start_time=now - timedelta(hours=1), end_time=now + timedelta(hours=1), creator=self.user
+        )
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + str(ClaimsRefreshToken.for_user(self.bidder).access_token))
+
+    def scrape(self, **headers):
+        response = self.client.generic('GET', '/metrics', headers=headers)
+        samples = {}
+        for line in response.content.decode().splitlines() if response.status_code == 200 else []:
+            if not line.startswith('#'):
+                name, value = line.rsplit(' ', 1)
+                samples[name] = float(value)
+        return response, samples
+
+    def test_requests_are_aggregated_per_view(self):
+        """Tests that counts, the latency histogram and query figures are kept per view and status."""
+        queries = []
+
+        def record(execute, sql, *args):
+            queries.append(sql)
+            return execute(sql, *args)
+
+        with connection.execute_wrapper(record):
+            for amount in ('12', '11'):
+                self.client.post('/api/bid/', {'auction_id': self.auction.id, 'amount': amount}, format='json')
+        response, samples = self.scrape()
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        labels = 'view="enter_bid",method="POST"'
+        self.assertEqual(samples['http_requests_total{%s,status="200"}' % labels], 1)
+        self.assertEqual(samples['http_requests_total{%s,status="400"}' % labels], 1)
+        self.assertEqual(samples['http_request_duration_seconds_count{%s}' % labels], 2)
+        self.assertEqual(samples['http_request_duration_seconds_bucket{%s,le="+Inf"}' % labels], 2)
+        self.assertLessEqual(samples['http_request_duration_seconds_bucket{%s,le="0.005"}' % labels], 2)
+        self.assertEqual(samples['http_request_db_queries_total{%s}' % labels], len(queries))
+        for timer in ('db', 'authentication', 'serialization'):
+            self.assertGreater(samples['http_request_%s_seconds_total{%s}' % (timer, labels)], 0)
+
+    def test_slow_requests_are_logged_with_their_queries(self):
+        """Tests that requests over the threshold are logged with the SQL they ran."""
+        with override_settings(REQUEST_METRICS={'SLOW_REQUEST_SECONDS': 0}):
+            with self.assertLogs('auction.metrics', 'WARNING') as logs:
+                self.client.post('/api/bid/', {'auction_id': self.auction.id, 'amount': '12'}, format='json')
+        self.assertIn('Slow request POST /api/bid/ 200', logs.output[0])
+        self.assertIn('UPDATE "auction_auction"', logs.output[0])
+
+    def test_token_guards_metrics(self):
+        """Tests that a configured token is required to scrape."""
+        self.client = APIClient()
+        with override_settings(REQUEST_METRICS={'TOKEN': 'scrape-secret'}):
+            self.assertEqual(self.scrape()[0].status_code, 401)
+            self.assertEqual(self.scrape(Authorization='Bearer wrong')[0].status_code, 401)
+            self.assertEqual(self.scrape(Authorization='Bearer scrape-secret')[0].status_code, 200)
+
+
+class SQLiteProfileTests(TransactionTestCase):
+    """Tests for the production SQLite profile and the serialized writer."""
+
+    def test_new_connections_apply_the_pragmas(self):
+        """Tests that a fresh connection runs in WAL mode with the configured tuning."""
+        connection.close()
+        with connection.cursor() as cursor:
+            values = {}
+            for pragma in ('journal_mode', 'synchronous', 'busy_timeout', 'mmap_size', 'cache_size'):
+                cursor.execute('PRAGMA %s' % pragma)
+                values[pragma] = cursor.fetchone()[0]
+        self.assertEqual(values, {
+            'journal_mode': 'wal', 'synchronous': 1, 'busy_timeout': 30000,
+            'mmap_size': 256 * 1024 * 1024, 'cache_size': -64000,
+        })
+
+    def test_200_concurrent_writers_get_no_lock_errors(self):
+        """Tests that bids and new auctions from 200 threads at once never fail on the database lock."""
+        writers, rounds = 200, 3
+        seller = User.objects.create_user(username='seller', password='pass')
+        users = User.objects.bulk_create([User(username='writer-%d' % i) for i in range(writers)])
+        now = timezone.now()
+        auction = Auction.objects.create(
+            title='Hot item', description='Item', starting_price=Decimal('1.00'),
+            start_time=now - timedelta(hours=1), end_time=now + timedelta(hours=1), creator=seller
+        )
+        factory = APIRequestFactory()
+        bid_view, new_auction_view = EnterBidView.as_view(), NewAuctionView.as_view()
+        barrier = threading.Barrier(writers)
+        statuses, errors = [], []
+
+        def write(i):
+            barrier.wait()
+            try:
+                for round_number in range(rounds):
+                    if i % 4:
+                        # One client address per writer, as the per-address rate limit would turn one flood away
+                        request = factory.post(
+                            '/api/bid/', {'auction_id': auction.id, 'amount': str(i * rounds + round_number + 1)},
+                            format='json', REMOTE_ADDR='10.0.0.%d' % i,
+                        )
+                        view = bid_view
+                    else:
+                        request = factory.post('/api/auction/', {
+                            'title': 'New %d' % i, 'description': 'Item', 'starting_price': '1.00',
+                            'start_time': now.isoformat(), 'end_time': (now + timedelta(hours=1)).isoformat(),
+                        }, format='json')
+                        view = new_auction_view
+                    force_authenticate(request, user=users[i])
+                    try:
+                        statuses.append(view(request).status_code)
+                    except OperationalError as exc:
+                        errors.append(exc)
+            finally:
+                connection.close()
+
+        # A short busy timeout: only the serialized writer keeps threads off SQLite's lock
+        with override_settings(SQLITE_PROFILE={'BUSY_TIMEOUT_MS': 100}):
+            threads = [threading.Thread(target=write, args=(i,)) for i in range(writers)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(len(statuses), writers * rounds)
+        self.assertEqual(statuses.count(201), writers // 4 * rounds)
+        self.assertEqual(Auction.objects.count(), 1 + writers // 4 * rounds)
+        auction.refresh_from_db()
+        self.assertEqual(auction.bid_count, statuses.count(200))
+        self.assertEqual(auction.current_high_amount, Decimal(writers * rounds))
+
+
+@override_settings(DATABASE_ROUTING={'REPLICAS': ['replica'], 'STICKY_SECONDS': 5})
+class ReplicaRoutingTests(TransactionTestCase):
+    """Tests for read/write routing with a second SQLite file as the replica."""
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        """Creates an admin, a bidder and an auction on the primary only."""
+        cache.clear()
+        reset_engine()
+        self.admin = User.objects.create_user(username='admin', password='pass', is_staff=True)
+        self.bidder = User.objects.create_user(username='bidder', password='pass')
+        now = timezone.now()
+        self.auction = Auction.objects.create(
+            title='Clock', description='Item', starting_price=Decimal('10.00'),
+            start_time=now - timedelta(hours=1), end_time=now + timedelta(hours=1), creator=self.admin
+        )
+
+    def client_for(self, user):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION='Bearer ' + str(ClaimsRefreshToken.for_user(user).access_token))
+        return client
+
+    def listed_titles(self, client):
+        response = client.get('/api/admin/auction/')
+        self.assertEqual(response.status_code, 200)
+        return [auction['title'] for auction in response.json()['results']]
+
+    def test_reads_go_to_the_replica(self):
+        """Tests that listings read the replica, which sees the primary's rows once synced."""
+        client = self.client_for(self.admin)
+        self.assertEqual(self.listed_titles(client), [])
+        call_command('sync_replicas', stdout=StringIO())
+        self.assertEqual(self.listed_titles(client), ['Clock'])
+        self.assertEqual(Auction.objects.using('replica').count(), 1)
+
+    def test_writes_and_bid_validation_stay_on_the_primary(self):
+        """Tests that a bid on an auction the replica has not seen yet is validated and written on the primary."""
+        response = self.client_for(self.bidder).post('/api/bid/', {'auction_id': self.auction.id, 'amount': '12'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Bid.objects.using('default').count(), 1)
+        self.assertEqual(Bid.objects.using('replica').count(), 0)
+
+    def test_writers_read_their_writes_for_the_sticky_window(self):
+        """Tests that a user's reads stick to the primary after they write, and other users' do not."""
+        call_command('sync_replicas', stdout=StringIO())
+        client = self.client_for(self.admin)
+        now = timezone.now()
+        response = client.post('/api/auction/', {
+            'title': 'Vase', 'description': 'Item', 'starting_price': '5.00',
+            'start_time': now.isoformat(), 'end_time': (now + timedelta(hours=2)).isoformat(),
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.listed_titles(client), ['Clock', 'Vase'])
+
+        other_admin = User.objects.create_user(username='other', password='pass', is_staff=True)
+        self.assertEqual(self.listed_titles(self.client_for(other_admin)), ['Clock'])
+
+        cache.clear()
+        self.assertEqual(self.listed_titles(client), ['Clock'])
+
+
+class BidArchiveTests(TestCase):
+    """Tests for archiving the bids of long closed auctions."""
+
+    def setUp(self):
+        """Creates an auction closed 40 days ago with five bids and one closed 5 days ago."""
+        self.seller = User.objects.create_user(username='seller', password='pass')
+        self.bidders = [User.objects.create_user(username='bidder-%d' % i, password='pass') for i in range(2)]
+        self.admin = User.objects.create_superuser(username='admin', password='adminpass')
+        now = timezone.now()
+        self.old, self.recent = [Auction.objects.create(
+            title=title, description='Item', starting_price=Decimal('10.00'),
+            start_time=now - timedelta(days=days, hours=1), end_time=now - timedelta(days=days), creator=self.seller
+        ) for title, days in (('Old', 40), ('Recent', 5))]
+        for auction, days in ((self.old, 40), (self.recent, 5)):
+            for i, amount in enumerate(('11', '12', '13', '14', '15')):
+                place_bid(auction.id, self.bidders[i % 2], Decimal(amount), now=now - timedelta(days=days, minutes=30))
+        close_auctions([self.old.id, self.recent.id], now=now)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.admin)
+
+    def history(self, auction, limit=2):
+        """Returns every bid of the auction's history endpoint, read page by page, and the archive summary."""
+        bids, params = [], {'limit': limit}
+        while True:
+            response = self.client.get('/api/admin/auction/%d/bids/' % auction.id, params)
+            self.assertEqual(response.status_code, 200)
+            bids += response.json()['results']
+            if response.json()['next_cursor'] is None:
+                return bids, response.json()['archive']
+            params['cursor'] = response.json()['next_cursor']
+
+    def test_bids_are_moved_in_chunks_and_summarized(self):
+        """Tests that old bids leave the hot table but the winning bid, with a summary left behind."""
+        before = AuctionSerializer(Auction.objects.get(id=self.old.id)).data
+        call_command('archive_bids', '--days', '30', '--chunk-size', '2', stdout=StringIO())
+
+        self.old.refresh_from_db()
+        self.assertEqual(list(Bid.objects.filter(auction=self.old).values_list('id', flat=True)), [self.old.winning_bid_id])
+        self.assertEqual(ArchivedBid.objects.filter(auction=self.old).count(), 5)
+        self.assertEqual(Bid.objects.filter(auction=self.recent).count(), 5)
+        self.assertEqual(AuctionSerializer(self.old).data, before)
+        summary = AuctionArchive.objects.get(auction=self.old)
+        self.assertEqual((summary.winner, summary.final_price, summary.bid_count), (self.bidders[0], Decimal('15.00'), 5))
+        self.assertLess(summary.first_bid_at, summary.last_bid_at)
+        self.assertEqual(archive_bids(after_days=30), (0, 0))
+
+    def test_interrupted_runs_resume(self):
+        """Tests that bids moved by an interrupted run are neither lost nor counted twice."""
+        moved = list(Bid.objects.filter(auction=self.old).order_by('id')[:2])
+        ArchivedBid.objects.bulk_create([ArchivedBid(
+            id=bid.id, auction_id=bid.auction_id, bidder_id=bid.bidder_id, amount=bid.amount, timestamp=bid.timestamp
+        ) for bid in moved])
+        Bid.objects.filter(id__in=[bid.id for bid in moved]).delete()
+        self.assertEqual(archive_bids(after_days=30), (1, 3))
+        self.assertEqual(AuctionArchive.objects.get(auction=self.old).bid_count, 5)
+
+    def test_admin_history_reads_archived_bids(self):
+        """Tests that the admin bid history is the same before and after archiving."""
+        before, archive = self.history(self.old)
+        self.assertIsNone(archive)
+        self.assertEqual([bid['amount'] for bid in before], ['11.00', '12.00', '13.00', '14.00', '15.00'])
+        self.assertEqual(before, BidSerializer(Bid.objects.filter(auction=self.old).order_by('id'), many=True).data)
+        archive_bids(after_days=30)
+        after, archive = self.history(self.old)
+        self.assertEqual(after, before)
+        self.assertEqual((archive['winner'], archive['final_price'], archive['bid_count']), (self.bidders[0].id, '15.00', 5))
+        self.assertEqual(self.client.get('/api/admin/auction/%d/bids/' % (self.old.id + 100)).status_code, 404)
+        self.assertEqual(self.client.get('/api/admin/auction/%d/bids/' % self.old.id, {'cursor': 'x'}).status_code, 400)
+
+
+class AuctionSearchTests(TestCase):
+    """Tests for the full-text auction search."""
+
+    def setUp(self):
+        """Creates active auctions with overlapping words and one that has ended."""
+        self.seller = User.objects.create_user(username='seller', password='pass')
+        now = timezone.now()
+        self.auctions = {title: Auction.objects.create(
+            title=title, description=description, starting_price=Decimal(price),
+            start_time=now - timedelta(hours=1), end_time=now + timedelta(hours=hours), creator=self.seller
+        ) for title, description, price, hours in (
+            ('Camera tripod', 'Steel legs', '30.00', 1),
+            ('Brass lamp', 'Fits on a tripod or a desk', '15.00', 1),
+            ('Vintage film camera', 'Working 35mm body', '80.00', 1),
+            ('Vintage cameras lot', 'Five bodies', '120.00', -0.5),
+        )}
+        self.client = APIClient()
+
+    def titles(self, **params):
+        response = self.client.get('/api/auctions/search/', params)
+        self.assertEqual(response.status_code, 200)
+        return [auction['title'] for auction in response.json()['results']]
+
+    def test_matches_are_ranked_with_title_hits_first(self):
+        """Tests bm25 ordering, prefix matching and stemming."""
+        self.assertEqual(self.titles(q='tripod'), ['Camera tripod', 'Brass lamp'])
+        self.assertEqual(self.titles(q='vint'), [])
+        self.assertEqual(set(self.titles(q='vint*')), {'Vintage film camera', 'Vintage cameras lot'})
+        self.assertEqual(set(self.titles(q='vintage camera')), {'Vintage film camera', 'Vintage cameras lot'})
+        self.assertEqual(self.titles(q='"unbalanced'), [])
+        response = self.client.get('/api/auctions/search/', {'q': 'lamp'})
+        self.assertEqual(response.json()['results'], [AuctionSerializer(self.auctions['Brass lamp']).data])
+
+    def test_filters_and_pagination(self):
+        """Tests the active and price filters and paging through every match once."""
+        place_bid(self.auctions['Camera tripod'].id, self.seller, Decimal('95.00'))
+        self.assertEqual(set(self.titles(q='camera', active='true')), {'Camera tripod', 'Vintage film camera'})
+        self.assertEqual(set(self.titles(q='camera', min_price='90')), {'Camera tripod', 'Vintage cameras lot'})
+        self.assertEqual(self.titles(q='camera', max_price='90'), ['Vintage film camera'])
+
+        seen, params = [], {'q': 'camera', 'limit': 1}
+        while True:
+            response = self.client.get('/api/auctions/search/', params)
+            seen += [auction['title'] for auction in response.json()['results']]
+            if response.json()['next_cursor'] is None:
+                break
+            params['cursor'] = response.json()['next_cursor']
+        self.assertEqual(seen, self.titles(q='camera'))
+        self.assertEqual(len(seen), 3)
+        for params in ({}, {'q': ' * '}, {'q': 'camera', 'cursor': 'bad'}, {'q': 'camera', 'limit': 0}, {'q': 'camera', 'min_price': 'x'}):
+            self.assertEqual(self.client.get('/api/auctions/search/', params).status_code, 400)
+
+    def test_control_characters_are_dropped(self):
+        """Tests that NUL and other control characters in q never reach FTS5."""
+        self.assertEqual(self.titles(q='tri\x00pod\x07'), ['Camera tripod', 'Brass lamp'])
+        for q in ('\x00', '\x00*', '\x1b\x7f'):
+            self.assertEqual(self.client.get('/api/auctions/search/', {'q': q}).status_code, 400)
+
+    def test_ranking_is_capped_to_the_newest_candidates(self):
+        """Tests that only the newest matches are ranked, and that later pages keep that window."""
+        with override_settings(AUCTION_SEARCH={'MAX_CANDIDATES': 2}):
+            self.assertEqual(set(self.titles(q='camera')), {'Vintage film camera', 'Vintage cameras lot'})
+            # The window counts matches passing the filters
+            self.assertEqual(set(self.titles(q='camera', active='1')), {'Camera tripod', 'Vintage film camera'})
+            response = self.client.get('/api/auctions/search/', {'q': 'camera', 'limit': 1}).json()
+            seen = [auction['title'] for auction in response['results']]
+            # A newer match must not push the rest of the first window out
+            Auction.objects.create(
+                title='Camera strap', description='Leather', starting_price=Decimal('5.00'), creator=self.seller,
+                start_time=timezone.now(), end_time=timezone.now() + timedelta(hours=1)
+            )
+            while response['next_cursor']:
+                response = self.client.get('/api/auctions/search/', {'q': 'camera', 'limit': 1, 'cursor': response['next_cursor']}).json()
+                seen += [auction['title'] for auction in response['results']]
+        self.assertTrue({'Vintage film camera', 'Vintage cameras lot'} <= set(seen))
+        self.assertNotIn('Camera tripod', seen)
+
+    def test_index_follows_creates_updates_and_deletes(self):
+        """Tests that the index is kept in sync without any application code."""
+        Auction.objects.bulk_create([Auction(
+            title='Telescope', description='Refractor', starting_price=Decimal('50.00'), creator=self.seller,
+            start_time=timezone.now(), end_time=timezone.now() + timedelta(hours=1)
+        )])
+        self.assertEqual(self.titles(q='telescope'), ['Telescope'])
+        lamp = self.auctions['Brass lamp']
+        lamp.title = 'Copper lantern'
+        lamp.save()
+        self.assertEqual(self.titles(q='brass'), [])
+        self.assertEqual(self.titles(q='lantern'), ['Copper lantern'])
+        self.seller.delete()
+        self.assertEqual(self.titles(q='lantern'), [])
+
+    def test_rebuild_restores_the_index_and_its_triggers(self):
+        """Tests that the rebuild command reindexes and recreates triggers lost to a table rebuild."""
+        with connection.cursor() as cursor:
+            cursor.execute("INSERT INTO auction_search(auction_search) VALUES ('delete-all')")
+            cursor.execute('DROP TRIGGER auction_search_insert')
+        self.assertEqual(self.titles(q='tripod'), [])
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(self.titles(q='tripod'), ['Camera tripod', 'Brass lamp'])
+        Auction.objects.create(
+            title='Tripod head', description='Ball head', starting_price=Decimal('20.00'), creator=self.seller,
+            start_time=timezone.now(), end_time=timezone.now() + timedelta(hours=1)
+        )
+        self.assertIn('Tripod head', self.titles(q='tripod'))
+
+
+@override_settings(RATE_LIMITS={'SCOPES': {'bid': {'user': '2/m', 'auction': '3/m'}, 'signup': {'ip': '1/m'}}})
+class RateLimitTests(TransactionTestCase):
+    """Tests for the token bucket rate limits."""
+
+    def setUp(self):
+        """Starts from empty buckets and creates two bidders and an active auction."""
+        cache.clear()
+        reset_limiter()
+        self.addCleanup(reset_limiter)
+        self.bidders = [User.objects.create_user(username='bidder-%d' % i, password='pass') for i in range(2)]
+        now = timezone.now()
+        self.auction = Auction.objects.create(
+            title='Camera', description='Film camera', starting_price=Decimal('10.00'),
+            start_time=now - timedelta(hours=1), end_time=now + timedelta(hours=1), creator=self.bidders[0]
+        )
+
+    def bid(self, user, amount):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client.post('/api/bid/', {'auction_id': self.auction.id, 'amount': amount}, format='json')
+
+    def test_buckets_refill_at_their_rate(self):
+        """Tests a bucket's burst, its refill and the wait it reports."""
+        limiter = RateLimiter({'bid': {'user': '2/s'}})
+        key = ('bid', 'user', 1)
+        self.assertEqual(limiter.take(key, 2, 2.0, 10.0)[0], 0)
+        self.assertEqual(limiter.take(key, 2, 2.0, 10.0)[0], 0)
+        self.assertAlmostEqual(limiter.take(key, 2, 2.0, 10.0)[0], 0.5)
+        self.assertAlmostEqual(limiter.take(key, 2, 2.0, 10.25)[0], 0.25)
+        self.assertEqual(limiter.take(key, 2, 2.0, 10.5)[0], 0)
+        self.assertEqual(limiter.check('bid', user_id=2), None)
+        self.assertEqual(limiter.check('other', user_id=2), None)
+
+    def test_bids_are_limited_per_user_and_auction_before_any_query(self):
+        """Tests that an exhausted bucket answers 429 with Retry-After without touching the database."""
+        self.assertEqual(self.bid(self.bidders[1], '11').status_code, 200)
+        self.assertEqual(self.bid(self.bidders[1], '12').status_code, 200)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.bid(self.bidders[1], '13')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(response['Retry-After'], '30')
+        self.assertEqual(self.bid(self.bidders[0], '14').status_code, 200)
+        # The auction's bucket is empty now, for every bidder
+        self.assertEqual(self.bid(self.bidders[0], '15').status_code, 429)
+        self.assertEqual(Bid.objects.count(), 3)
+
+    def test_signups_are_limited_per_address(self):
+        """Tests that each client address has its own bucket."""
+        client = APIClient()
+        self.assertEqual(client.post('/api/signup/', {'username': 'a', 'password': 'pass'}, REMOTE_ADDR='10.0.0.1').status_code, 201)
+        self.assertEqual(client.post('/api/signup/', {'username': 'b', 'password': 'pass'}, REMOTE_ADDR='10.0.0.1').status_code, 429)
+        self.assertEqual(client.post('/api/signup/', {'username': 'b', 'password': 'pass'}, REMOTE_ADDR='10.0.0.2').status_code, 201)
+        with override_settings(RATE_LIMITS={'ENABLED': False}):
+            self.assertEqual(client.post('/api/signup/', {'username': 'c', 'password': 'pass'}, REMOTE_ADDR='10.0.0.1').status_code, 201)
+
+    def test_token_endpoint_shares_the_login_limit(self):
+        """Tests that /api/token/ is limited like /api/login/, so it cannot be used to bypass it."""
+        client = APIClient()
+        credentials = {'username': 'bidder-0', 'password': 'wrong'}
+        with override_settings(RATE_LIMITS={'SCOPES': {'login': {'ip': '3/m'}}}):
+            statuses = [client.post('/api/token/', credentials, REMOTE_ADDR='10.0.0.1').status_code for _ in range(5)]
+            self.assertEqual(statuses, [401, 401, 401, 429, 429])
+            self.assertEqual(client.post('/api/login/', credentials, REMOTE_ADDR='10.0.0.1').status_code, 429)
+            response = client.post('/api/token/', {'username': 'bidder-0', 'password': 'pass'}, REMOTE_ADDR='10.0.0.2')
+            self.assertEqual(response.status_code, 200)
+
+    def test_shared_limits_hold_across_workers(self):
+        """Tests that limiters of different processes draw on the same shared count."""
+        workers = [RateLimiter({'bid': {'user': '3/m'}}) for _ in range(2)]
+        with override_settings(RATE_LIMITS={'SHARED': True}):
+            allowed = [workers[i % 2].check('bid', user_id=1) is None for i in range(6)]
+            self.assertEqual(allowed.count(True), 3)
+            self.assertEqual(workers[0].check('bid', user_id=2), None)
+
+    async def test_async_bids_are_limited(self):
+        """Tests that the async bid endpoint shares the bid buckets."""
+        client = AsyncClient()
+        token = await sync_to_async(RefreshToken.for_user)(self.bidders[1])
+        auth = {'Authorization': 'Bearer ' + str(token.access_token)}
+        statuses = [(await client.post(
+            '/api/async/bid/', {'auction_id': self.auction.id, 'amount': amount}, content_type='application/json', headers=auth
+        )).status_code for amount in ('11', '12', '13')]
+        self.assertEqual(statuses, [200, 200, 429])
+        response = await client.post('/api/async/bid/', {'auction_id': self.auction.id, 'amount': '14'}, content_type='application/json', headers=auth)
+        self.assertEqual(response['Retry-After'], '30')
+        self.assertEqual(response.json(), {'error': 'Request was throttled. Expected available in 30 seconds.'})
+
+
+class IdempotencyTests(TransactionTestCase):
+    """Tests for Idempotency-Key handling on bid and auction creation."""
+
+    def setUp(self):
+        """Creates a bidder and an active auction."""
+        cache.clear()
+        self.user = User.objects.create_user(username='bidder', password='pass')
+        now = timezone.now()
+        self.auction = Auction.objects.create(
+            title='Camera', description='Film camera', starting_price=Decimal('10.00'),
+            start_time=now - timedelta(hours=1), end_time=now + timedelta(hours=1), creator=self.user
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def bid(self, amount, key, client=None):
+        return (client or self.client).post(
+            '/api/bid/', {'auction_id': self.auction.id, 'amount': amount}, format='json', HTTP_IDEMPOTENCY_KEY=key
+        )
+
+    def new_auction(self, key, title='Lamp'):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        start = self.auction.start_time
+        return client.post('/api/auction/', {
+            'title': title, 'description': 'Brass', 'starting_price': '5.00',
+            'start_time': start.isoformat(), 'end_time': (start + timedelta(hours=2)).isoformat(),
+        }, format='json', HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_retries_replay_the_first_response_without_touching_auctions(self):
+        """Tests that retries are answered from the cache, then from the keys table alone."""
+        first = self.bid('12', 'bid-1')
+        self.assertEqual(first.status_code, 200)
+        with CaptureQueriesContext(connection) as queries:
+            retry = self.bid('12', 'bid-1')
+        self.assertEqual(len(queries), 0)
+        self.assertEqual((retry.status_code, retry.json()), (200, first.json()))
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            retry = self.bid('12', 'bid-1')
+        self.assertEqual([query['sql'].split('FROM ')[1].split()[0] for query in queries], ['"auction_idempotencykey"'])
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(Bid.objects.count(), 1)
+        # Client errors are kept too, server errors are not
+        self.assertEqual(self.bid('5', 'bid-2').status_code, 400)
+        self.assertEqual(self.bid('5', 'bid-2')['Idempotent-Replayed'], 'true')
+
+    def test_keys_belong_to_their_user_and_request(self):
+        """Tests key reuse across requests and users, and invalid keys."""
+        self.assertEqual(self.bid('12', 'shared-key').status_code, 200)
+        response = self.bid('13', 'shared-key')
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(response.json(), {'error': 'Idempotency-Key was already used for a different request'})
+        other = APIClient()
+        other.force_authenticate(User.objects.create_user(username='other', password='pass'))
+        self.assertEqual(self.bid('13', 'shared-key', client=other).status_code, 200)
+        self.assertEqual(self.bid('14', 'k' * 256).status_code, 400)
+        self.assertEqual(self.bid('14', '').status_code, 400)
+        self.assertEqual(Bid.objects.count(), 2)
+
+    def test_concurrent_duplicates_run_once(self):
+        """Tests that simultaneous retries create one auction and all get its response."""
+        barrier = threading.Barrier(8)
+        responses = []
+
+        def post():
+            barrier.wait()
+            try:
+                responses.append(self.new_auction('create-lamp'))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=post) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual([response.status_code for response in responses], [201] * 8)
+        self.assertEqual(len({response.json()['id'] for response in responses}), 1)
+        self.assertEqual(Auction.objects.filter(title='Lamp').count(), 1)
+
+    def test_duplicates_of_a_request_running_elsewhere_get_409(self):
+        """Tests that a key claimed by another worker is waited for, then reported in progress."""
+        digest = hashlib.sha256(b'elsewhere').hexdigest()
+        cache.add(LOCK_KEY % (self.user.id, digest), 'fingerprint', 30)
+        with override_settings(IDEMPOTENCY={'WAIT_SECONDS': 0.1}):
+            response = self.bid('12', 'elsewhere')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(Bid.objects.count(), 0)
+
+    def test_expired_keys_run_again_and_are_pruned(self):
+        """Tests that a key past its TTL no longer replays and is deleted by the prune command."""
+        with override_settings(IDEMPOTENCY={'TTL_SECONDS': 0}):
+            self.assertEqual(self.new_auction('lamp').status_code, 201)
+            self.assertEqual(self.new_auction('lamp').status_code, 201)
+        self.assertEqual(Auction.objects.filter(title='Lamp').count(), 2)
+        self.assertEqual(IdempotencyKey.objects.count(), 1)
+        out = StringIO()
+        call_command('prune_idempotency_keys', stdout=out)
+        self.assertIn('Deleted 1 expired idempotency keys', out.getvalue())
+        self.assertEqual(IdempotencyKey.objects.count(), 0)
+
+
+@override_settings(DELETION_JOBS={'CHUNK_SIZE': 7, 'INLINE_MAX_BIDS': 30, 'RUN_IN_PROCESS': False})
+class AuctionDeletionTests(TransactionTestCase):
+    """Tests for chunked auction deletion, its background jobs and the batch endpoint."""
+
+    def setUp(self):
+        """Creates an auction with 40 bids, some archived and a maximum bid, and a small auction."""
+        cache.clear()
+        reset_engine()
+        self.admin = User.objects.create_superuser(username='admin', password='pass')
+        self.bidder = User.objects.create_user(username='bidder', password='pass')
+        now = timezone.now()
+        self.big, self.small = [Auction.objects.create(
+            title=title, description='Item', starting_price=Decimal('1.00'),
+            start_time=now - timedelta(hours=1), end_time=now + timedelta(hours=1), creator=self.admin
+        ) for title in ('Big', 'Small')]
+        Bid.objects.bulk_create([Bid(auction=self.big, bidder=self.bidder, amount=Decimal(i)) for i in range(2, 37)])
+        ArchivedBid.objects.bulk_create([
+            ArchivedBid(id=10000 + i, auction=self.big, bidder=self.bidder, amount=Decimal(1), timestamp=now) for i in range(5)
+        ])
+        Bid.objects.bulk_create([Bid(auction=self.small, bidder=self.bidder, amount=Decimal(i)) for i in (2, 3, 4)])
+        ProxyBid.objects.create(auction=self.big, bidder=self.bidder, max_amount=Decimal('100.00'), placed_at=now)
+        for auction in (self.big, self.small):
+            auction.refresh_current_high()
+        Auction.objects.filter(id=self.big.id).update(bid_count=40)
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def assertBigDeleted(self):
+        self.assertFalse(Auction.objects.filter(id=self.big.id).exists())
+        for model in (Bid, ArchivedBid, ProxyBid):
+            self.assertFalse(model.objects.filter(auction_id=self.big.id).exists())
+        self.assertEqual(Bid.objects.filter(auction=self.small).count(), 3)
+
+    def test_small_auctions_are_deleted_inline(self):
+        """Tests that auctions under the inline limit are deleted in chunks within the request."""
+        response = self.client.delete('/api/admin/auction/', data={'auction_id': self.small.id}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Auction.objects.filter(id=self.small.id).exists())
+        self.assertEqual(Bid.objects.filter(auction=self.big).count(), 35)
+        response = self.client.delete('/api/admin/auction/', data={'auction_id': self.small.id}, format='json')
+        self.assertEqual(response.status_code, 404)
+
+    def test_large_auctions_are_deleted_by_a_resumable_job(self):
+        """Tests the 202 job, its progress and resuming it after its process stopped mid-way."""
+        response = self.client.delete('/api/admin/auction/', data={'auction_id': self.big.id}, format='json')
+        self.assertEqual(response.status_code, 202)
+        job_id = response.json()['job']['id']
+        job = self.client.get('/api/admin/deletions/%d/' % job_id).json()
+        self.assertEqual((job['status'], job['total_bids'], job['deleted_bids']), ('pending', 40, 0))
+        # A process claimed the job, deleted one chunk and stopped
+        deleted = Bid.objects.filter(id__in=Bid.objects.filter(auction=self.big, amount__lt=9).values('id')).delete()[0]
+        DeletionJob.objects.filter(id=job_id).update(
+            status=DeletionJob.Status.RUNNING, deleted_bids=deleted, heartbeat_at=timezone.now() - timedelta(minutes=5)
+        )
+        out = StringIO()
+        call_command('run_deletion_jobs', '--once', stdout=out)
+        self.assertIn('Completed 1 deletion jobs', out.getvalue())
+        job = self.client.get('/api/admin/deletions/%d/' % job_id).json()
+        self.assertEqual((job['status'], job['deleted_bids'], job['deleted_auctions']), ('done', 40, 1))
+        self.assertIsNotNone(job['finished_at'])
+        self.assertBigDeleted()
+        self.assertEqual(self.client.get('/api/admin/deletions/%d/' % (job_id + 1)).status_code, 404)
+
+    def test_auctions_being_deleted_take_no_bids(self):
+        """Tests that bids are rejected, and bid deletions are survived, while the bids are deleted."""
+        rejections = []
+
+        def progress(rows):
+            """Bids on, and deletes the high bid of, the auction between chunks"""
+            if not rejections:
+                delete_bids([Auction.objects.get(id=self.big.id).current_high_bid_id])
+            with self.assertRaises(BidRejected) as rejected:
+                place_bid(self.big.id, self.bidder, Decimal('500.00'))
+            rejections.append(rejected.exception.message)
+
+        self.assertEqual(delete_auctions([self.big.id], chunk_size=7, progress=progress), 1)
+        self.assertEqual(rejections[:-1], ['Auction not active'] * (len(rejections) - 1))
+        # The last chunk deleted the auction itself
+        self.assertEqual(rejections[-1], 'Auction not found')
+        self.assertBigDeleted()
+
+    def test_jobs_run_in_process(self):
+        """Tests that jobs start on the process's own background thread."""
+        with override_settings(DELETION_JOBS={'CHUNK_SIZE': 7, 'INLINE_MAX_BIDS': 30}):
+            response = self.client.delete('/api/admin/auction/', data={'auction_id': self.big.id}, format='json')
+            reset_executor()
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(DeletionJob.objects.get().status, DeletionJob.Status.DONE)
+        self.assertBigDeleted()
+
+    def test_batch_delete(self):
+        """Tests deleting many bids and auctions in one request and its validation."""
+        url = '/api/admin/auction/batch-delete/'
+        for data in ({'auction_ids': 'all'}, {'bid_ids': [1, 'two']}, {'bid_ids': [True]}):
+            self.assertEqual(self.client.post(url, data, format='json').status_code, 400)
+        with override_settings(DELETION_JOBS={'MAX_BATCH_IDS': 2}):
+            self.assertEqual(self.client.post(url, {'auction_ids': [1, 2, 3]}, format='json').status_code, 400)
+
+        top_bids = list(Bid.objects.filter(auction=self.big).order_by('-amount').values_list('id', flat=True)[:2])
+        response = self.client.post(url, {'bid_ids': top_bids, 'auction_ids': [self.small.id, 999999]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'deleted_bids': 2, 'deleted_auctions': 1, 'job': None})
+        self.big.refresh_from_db()
+        self.assertEqual((self.big.current_high_amount, self.big.bid_count), (Decimal('34.00'), 33))
+        self.assertFalse(Auction.objects.filter(id=self.small.id).exists())
+
+        Auction.objects.filter(id=self.big.id).update(bid_count=40)
+        response = self.client.post(url, {'auction_ids': [self.big.id]}, format='json')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()['job']['auction_ids'], [self.big.id])
+
+
+class APISchemaTests(TestCase):
+    """Tests for the stored OpenAPI schema and its documentation routes."""
+
+    def setUp(self):
+        """Starts without a schema document."""
+        api_docs.reset_document()
+        self.addCleanup(api_docs.reset_document)
+
+    def test_schema_is_generated_once_and_revalidated(self):
+        """Tests the schema is generated on first use, served with an ETag and answered with 304 when unchanged."""
+        response = self.client.get('/swagger.json/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertIn('no-cache', response['Cache-Control'])
+        document = api_docs.get_document()
+        self.assertEqual(response['ETag'], '"%s"' % document.etag)
+        schema = json.loads(response.content)
+        self.assertEqual(schema['info']['title'], 'Auction API')
+        bid = schema['paths']['/bid/']['post']
+        self.assertEqual(bid['description'], 'Place a bid on an active auction')
+        self.assertIn({'name': 'Idempotency-Key', 'in': 'header', 'type': 'string', 'description': 'Unique key of this request; retries with the same key get the first response back'},
+                      bid['parameters'])
+
+        response = self.client.get('/swagger.json/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        self.assertIs(api_docs.get_document(), document)
+
+        response = self.client.get('/swagger/', {'format': 'openapi'})
+        self.assertEqual(response['Content-Type'], 'application/openapi+json')
+        self.assertEqual(response.content, document.content)
+        yaml = self.client.get('/swagger.yaml/')
+        self.assertEqual(yaml['Content-Type'], 'application/yaml')
+        self.assertTrue(yaml.content.startswith(b'swagger:'))
+        self.assertNotEqual(yaml['ETag'], response['ETag'])
+        self.assertEqual(self.client.get('/swagger.xml/').status_code, 404)
+
+    def test_documentation_pages(self):
+        """Tests the Swagger UI and ReDoc pages render with the schema's title."""
+        for path in ('/swagger/', '/redoc/'):
+            response = self.client.get(path)
+            self.assertEqual(response.status_code, 200)
+            self.assertIn(b'<title>Auction API</title>', response.content)
+
+    def test_stand_ins_match_drf_yasg(self):
+        """Tests the lazy openapi constants equal drf_yasg's and deferred objects build drf_yasg's."""
+        from drf_yasg import openapi
+        for name in dir(api_docs.LazyOpenAPI):
+            if name.isupper() or name.startswith(('TYPE_', 'FORMAT_', 'IN_')):
+                self.assertEqual(getattr(api_docs.openapi, name), getattr(openapi, name), name)
+        schema = api_docs.resolve({'body': [api_docs.openapi.Schema(type=api_docs.openapi.TYPE_STRING)]})
+        self.assertIsInstance(schema['body'][0], openapi.Schema)
+        self.assertEqual(schema['body'][0].type, 'string')
+
+    def test_schema_generated_at_build_time_is_served(self):
+        """Tests generate_api_schema writes the schema and workers serve that file instead of generating one."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'openapi.json')
+            out = StringIO()
+            call_command('generate_api_schema', '--output', path, stdout=out)
+            with open(path, 'rb') as schema_file:
+                self.assertEqual(json.loads(schema_file.read())['info']['title'], 'Auction API')
+            self.assertIn('Wrote the API schema', out.getvalue())
+
+            with open(path, 'wb') as schema_file:
+                schema_file.write(b'{"swagger": "2.0", "paths": {}}')
+            with override_settings(API_SCHEMA={'PATH': path}):
+                response = self.client.get('/swagger.json/')
+        self.assertEqual(response.content, b'{"swagger": "2.0", "paths": {}}')
+
+    def test_startup_does_not_import_drf_yasg(self):
+        """Tests loading the apps and the URLconf leaves drf_yasg's modules unimported."""
+        script = (
+            'import sys, django; django.setup(); '
+            'from django.urls import get_resolver; get_resolver().url_patterns; '
+            'print(sorted(m for m in sys.modules if m.startswith("drf_yasg.")))'
+        )
+        result = subprocess.run(
+            [sys.executable, '-c', script], cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+            env=dict(os.environ, DJANGO_SETTINGS_MODULE='simple_auction.settings'),
+        )
+        self.assertEqual(result.stdout.strip(), '[]')
+
+
+class LeaderboardTests(TestCase):
+    """Tests for the in-memory leaderboards of the highest bids."""
+
+    def setUp(self):
+        """Starts from empty leaderboards and creates an active auction with five bids."""
+        cache.clear()
+        reset_limiter()
+        reset_leaderboards()
+        self.addCleanup(reset_leaderboards)
+        self.bidder = User.objects.create_user(username='bidder', password='pass')
+        self.admin = User.objects.create_superuser(username='admin', password='pass')
+        now = timezone.now()
+        self.auction = Auction.objects.create(
+            title='Lamp', description='Desk lamp', starting_price=Decimal('1.00'),
+            start_time=now - timedelta(hours=1), end_time=now + timedelta(hours=1), creator=self.admin
+        )
+        self.bids = [Bid.objects.create(auction=self.auction, bidder=self.bidder, amount=Decimal(amount)) for amount in (3, 5, 4, 7, 6)]
+        self.auction.refresh_current_high()
+
+    def top(self, n, auction=None):
+        response = self.client.get('/api/auction/%d/bids/' % (auction or self.auction).id, {'top': n})
+        self.assertEqual(response.status_code, 200)
+        return [bid['amount'] for bid in response.json()['results']]
+
+    def test_accepted_bids_update_the_board_in_place(self):
+        """Tests the board is built on first read and then kept current by accepted bids, checked with one read."""
+        self.assertEqual(self.top(3), ['7.00', '6.00', '5.00'])
+        client = APIClient()
+        client.force_authenticate(self.bidder)
+        response = client.post('/api/bid/', {'auction_id': self.auction.id, 'amount': '8.00'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.top(6), ['8.00', '7.00', '6.00', '5.00', '4.00', '3.00'])
+        self.assertEqual(self.client.get('/api/auction/%d/bids/' % self.auction.id).json()['results'][0]['id'],
+                         response.json()['bid']['id'])
+
+    def test_boards_see_bids_placed_by_other_processes(self):
+        """Tests a board whose auction took a bid in another process is rebuilt on the next read."""
+        other = Leaderboards(size=10, max_auctions=10)
+        self.assertEqual(other.top(self.auction.id, 1)[0]['amount'], '7.00')
+        client = APIClient()
+        client.force_authenticate(self.bidder)
+        response = client.post('/api/bid/', {'auction_id': self.auction.id, 'amount': '8.00'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        with self.assertNumQueries(3):
+            self.assertEqual(other.top(self.auction.id, 1)[0]['amount'], '8.00')
+        with self.assertNumQueries(1):
+            other.top(self.auction.id, 1)
+
+    @override_settings(BID_LEADERBOARD={'SIZE': 3, 'MAX_AUCTIONS': 1})
+    def test_evicted_boards_are_rebuilt(self):
+        """Tests only MAX_AUCTIONS boards stay resident and evicted ones are rebuilt from the database."""
+        reset_leaderboards()
+        other = Auction.objects.create(
+            title='Chair', description='Office chair', starting_price=Decimal('1.00'),
+            start_time=self.auction.start_time, end_time=self.auction.end_time, creator=self.admin
+        )
+        self.assertEqual(self.top(3), ['7.00', '6.00', '5.00'])
+        with self.assertNumQueries(1):
+            self.top(2)
+        self.assertEqual(self.top(3, other), [])
+        with self.assertNumQueries(1):
+            self.top(1, other)
+        with self.assertNumQueries(3):
+            self.assertEqual(self.top(1), ['7.00'])
+
+    @override_settings(BID_LEADERBOARD={'SIZE': 3, 'MAX_AUCTIONS': 10})
+    def test_deleted_bids_leave_the_board(self):
+        """Tests deleting bids drops the board and the next read rebuilds it without them."""
+        reset_leaderboards()
+        self.assertEqual(self.top(3), ['7.00', '6.00', '5.00'])
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        response = client.delete('/api/admin/auction/', {'bid_id': self.bids[3].id}, format='json')
+        self.assertEqual(response.status_code, 200)
+        with self.assertNumQueries(3):
+            self.assertEqual(self.top(3), ['6.00', '5.00', '4.00'])
+        response = client.post('/api/admin/auction/batch-delete/', {'bid_ids': [self.bids[4].id]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.top(3), ['5.00', '4.00', '3.00'])
+
+    def test_bids_that_skip_a_version_drop_the_board(self):
+        """Tests a bid recorded after one the board never saw drops it rather than leaving it behind."""
+        leaderboards = Leaderboards(size=10, max_auctions=10)
+        leaderboards.top(self.auction.id, 1)
+        first = place_bid(self.auction.id, self.bidder, Decimal('8.00'))
+        second = place_bid(self.auction.id, self.bidder, Decimal('9.00'))
+        leaderboards.record_bids([second])
+        self.assertNotIn(self.auction.id, leaderboards.boards)
+        leaderboards.record_bids([first])
+        self.assertEqual([bid['amount'] for bid in leaderboards.top(self.auction.id, 3)], ['9.00', '8.00', '7.00'])
+
+    def test_rebuild_racing_a_bid_is_rebuilt_again(self):
+        """Tests a board read while a bid was placed is served and rebuilt on the next read."""
+        bidder = self.bidder
+
+        class RacingLeaderboards(Leaderboards):
+            def load(self, auction_id, version):
+                place_bid(auction_id, bidder, Decimal('9.00'))
+                return super().load(auction_id, version)
+
+        leaderboards = RacingLeaderboards(size=10, max_auctions=10)
+        self.assertEqual(leaderboards.top(self.auction.id, 1)[0]['amount'], '9.00')
+        # Stamped with the version read before the bid, so the next read will not serve it
+        version = Auction.objects.values_list('version', flat=True).get(id=self.auction.id)
+        self.assertLess(leaderboards.boards[self.auction.id].version, version)
+
+    def test_invalid_requests(self):
+        """Tests out of range values of top and unknown auctions are rejected."""
+        for top in ('0', 'abc', '51', '-1'):
+            response = self.client.get('/api/auction/%d/bids/' % self.auction.id, {'top': top})
+            self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.get('/api/auction/999999/bids/').status_code, 404)
+
+
+class ConditionalReadTests(TransactionTestCase):
+    """Tests for auction versions and the ETags of auction reads."""
+
+    def setUp(self):
+        """Creates an admin, a bidder and an active auction."""
+        cache.clear()
+        reset_limiter()
+        reset_engine()
+        self.admin = User.objects.create_superuser(username='admin', password='pass')
+        self.bidder = User.objects.create_user(username='bidder', password='pass')
+        now = timezone.now()
+        self.auction = Auction.objects.create(
+            title='Radio', description='Valve radio', starting_price=Decimal('10.00'),
+            start_time=now - timedelta(hours=1), end_time=now + timedelta(hours=1), creator=self.admin
+        )
+
+    def version(self):
+        return Auction.objects.values_list('version', flat=True).get(id=self.auction.id)
+
+    def test_writes_bump_the_version(self):
+        """Tests bids, bid deletions, edits and closing each bump the auction's version."""
+        self.assertEqual(self.auction.version, 1)
+        bid = place_bid(self.auction.id, self.bidder, Decimal('11.00'))
+        self.assertEqual(self.version(), 2)
+        bid.delete()
+        self.auction.refresh_current_high()
+        self.assertEqual(self.version(), 3)
+        self.auction.refresh_from_db()
+        self.auction.title = 'Valve radio'
+        self.auction.save(update_fields=['title'])
+        self.assertEqual(self.auction.version, 4)
+        self.assertEqual(self.version(), 4)
+        Auction.objects.filter(id=self.auction.id).update(end_time=timezone.now() - timedelta(seconds=1))
+        close_auctions([self.auction.id])
+        self.assertEqual(self.version(), 5)
+
+    def test_detail_answers_304_from_the_version(self):
+        """Tests the auction read carries a weak ETag and a matching If-None-Match reads only the version."""
+        get = async_to_sync(AsyncClient().get)
+        url = '/api/async/auction/%d/' % self.auction.id
+        response = get(url)
+        self.assertEqual(response['ETag'], 'W/"%d.1"' % self.auction.id)
+        self.assertEqual(response.json()['version'], 1)
+        with CaptureQueriesContext(connection) as queries:
+            response = get(url, headers={'If-None-Match': '"%d.1"' % self.auction.id})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], 'W/"%d.1"' % self.auction.id)
+        self.assertEqual(len(queries), 1)
+        self.assertIn('"version"', queries[0]['sql'])
+
+        place_bid(self.auction.id, self.bidder, Decimal('12.00'))
+        response = get(url, headers={'If-None-Match': 'W/"%d.1"' % self.auction.id})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['ETag'], 'W/"%d.2"' % self.auction.id)
+        self.assertEqual(response.json()['current_high_amount'], '12.00')
+
+    def test_live_listing_answers_304_from_the_cache(self):
+        """Tests the live listing's ETag changes with bids and edits and a current one is answered without queries."""
+        response = self.client.get('/api/auctions/live/')
+        etag = response['ETag']
+        self.assertTrue(etag.startswith('W/"'))
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/auctions/live/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        client = APIClient()
+        client.force_authenticate(self.bidder)
+        client.post('/api/bid/', {'auction_id': self.auction.id, 'amount': '15.00'}, format='json')
+        response = self.client.get('/api/auctions/live/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()[0]['current_high_amount'], '15.00')
+        self.assertNotEqual(response['ETag'], etag)
+        etag = response['ETag']
+        self.assertEqual(async_to_sync(AsyncClient().get)('/api/async/auctions/live/')['ETag'], etag)
+
+        self.auction.refresh_from_db()
+        self.auction.title = 'Transistor radio'
+        self.auction.save()
+        response = self.client.get('/api/auctions/live/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()[0]['title'], 'Transistor radio')
+
+    def test_admin_page_answers_304_from_the_versions(self):
+        """Tests a page of the admin listing is answered with 304 after reading only its versions."""
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        response = client.get('/api/admin/auction/')
+        etag = response['ETag']
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get('/api/admin/auction/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(len([query for query in queries if 'auction_auction' in query['sql']]), 1)
+        place_bid(self.auction.id, self.bidder, Decimal('20.00'))
+        response = client.get('/api/admin/auction/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'][0]['version'], 2)
+        self.assertNotEqual(response['ETag'], etag)
@@ -0,0 +1,194 @@
+"""Module implementing token bucket rate limits checked before views query the database
+
+Each endpoint scope in RATE_LIMITS['SCOPES'] maps the keys its requests are
+limited by (the user, the client address and, for bids, the auction) to a
+'tokens/period' rate: a bucket holds up to that many tokens, refilled evenly over
+the period, and every request takes one token from each of its buckets. Views
+opt in with a throttle_scope, and the buckets live in process memory (an LRU of
+at most MAX_KEYS), so a flood is turned away with a dictionary lookup before the
+view runs a single query.
+
+With SHARED, a request its local buckets let through is also counted in the
+cache with an atomic incr, so the limits hold across workers. Cache backends
+have no compare-and-set to move a shared bucket's level and timestamp together,
+so the shared count is a sliding window of the bucket size over its refill time,
+which allows the same burst and sustained rate. The previous window's final
+count is read once per window, so an allowed request costs one cache round trip
+and a request turned away locally costs none.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.throttling import BaseThrottle
+
+DEFAULTS = {
+    'ENABLED': True,
+    'SHARED': False,
+    'MAX_KEYS': 100000,
+    'SCOPES': {},
+}
+
+KEY_KINDS = ('user', 'ip', 'auction')
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+CACHE_KEY = 'rate-limit:%s:%s:%s:%d'
+
+
+def get_setting(name):
+    """Returns a RATE_LIMITS setting, falling back to the defaults"""
+    return getattr(settings, 'RATE_LIMITS', {}).get(name, DEFAULTS[name])
+
+
+def parse_rate(rate):
+    """Returns the (capacity, tokens per second) of a 'tokens/period' rate such as '10/s' or '5/m'"""
+    try:
+        tokens, period = rate.split('/')
+        capacity = int(tokens)
+        seconds = PERIODS[period[0]]
+    except (AttributeError, ValueError, KeyError, IndexError):
+        raise ImproperlyConfigured('Invalid rate limit %r, expected tokens/period' % (rate,))
+    if capacity <= 0:
+        raise ImproperlyConfigured('Invalid rate limit %r, tokens must be positive' % (rate,))
+    return capacity, capacity / seconds
+
+
+def auction_key(value):
+    """Returns the auction id a bid names, or None when it is not a valid id"""
+    try:
+        auction_id = int(value)
+    except (TypeError, ValueError):
+        return None
+    return auction_id if auction_id > 0 else None
+
+
+def client_ip(request):
+    """Returns the request's client address, honouring REST_FRAMEWORK['NUM_PROXIES'] like DRF's throttles"""
+    return BaseThrottle().get_ident(request)
+
+
+class RateLimiter:
+    """Token buckets of the (scope, key kind, key) triples seen lately, in process memory"""
+
+    def __init__(self, scopes=None, max_keys=None):
+        scopes = scopes if scopes is not None else get_setting('SCOPES')
+        self.limits = {}
+        for scope, limits in scopes.items():
+            for kind in limits:
+                if kind not in KEY_KINDS:
+                    raise ImproperlyConfigured('Unknown rate limit key %r in scope %r' % (kind, scope))
+            self.limits[scope] = [(kind, *parse_rate(rate)) for kind, rate in limits.items()]
+        self.max_keys = max_keys or get_setting('MAX_KEYS')
+        # key -> [tokens, refilled at, shared window, previous window's shared count]
+        self.buckets = OrderedDict()
+        self.lock = threading.Lock()
+
+    def take(self, key, capacity, rate, now):
+        """Takes a token from a bucket and returns (seconds until one is available or 0, bucket)"""
+        with self.lock:
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                bucket = self.buckets[key] = [capacity, now, None, 0]
+                if len(self.buckets) > self.max_keys:
+                    # An evicted bucket simply starts full again
+                    self.buckets.popitem(last=False)
+            else:
+                self.buckets.move_to_end(key)
+                bucket[0] = min(capacity, bucket[0] + (now - bucket[1]) * rate)
+                bucket[1] = now
+            if bucket[0] < 1:
+                return (1 - bucket[0]) / rate, bucket
+            bucket[0] -= 1
+            return 0, bucket
+
+    def take_shared(self, key, bucket, capacity, rate):
+        """Counts a request in the cache and returns the seconds to wait when the key is over its limit, else 0"""
+        window = capacity / rate
+        position = time.time() / window
+        index = int(position)
+        cache_key = CACHE_KEY % (*key, index)
+        try:
+            count = cache.incr(cache_key)
+        except ValueError:
+            # First request of the window, unless another worker just counted one
+            count = 1 if cache.add(cache_key, 1, int(2 * window) + 1) else cache.incr(cache_key)
+        if bucket[2] != index:
+            # No worker counts in a window once it has passed
+            bucket[2], bucket[3] = index, cache.get(CACHE_KEY % (*key, index - 1), 0)
+        if bucket[3] * (1 - (position - index)) + count <= capacity:
+            return 0
+        try:
+            cache.decr(cache_key)
+        except ValueError:
+            pass
+        return (index + 1 - position) * window
+
+    def check(self, scope, user_id=None, ip=None, auction_id=None):
+        """Takes a token from each of a request's buckets and returns None, or the seconds to wait when one is empty"""
+        limits = self.limits.get(scope)
+        if not limits:
+            return None
+        idents = {'user': user_id, 'ip': ip, 'auction': auction_id}
+        shared = get_setting('SHARED')
+        now = time.monotonic()
+        for kind, capacity, rate in limits:
+            ident = idents[kind]
+            if ident is None:
+                continue
+            key = (scope, kind, ident)
+            wait, bucket = self.take(key, capacity, rate, now)
+            if not wait and shared:
+                wait = self.take_shared(key, bucket, capacity, rate)
+            if wait:
+                return wait
+        return None
+
+    async def acheck(self, scope, **idents):
+        """Async variant of check() that leaves the event loop only for a shared, out of process cache"""
+        if not get_setting('SHARED') or isinstance(caches['default'], LocMemCache):
+            return self.check(scope, **idents)
+        return await sync_to_async(self.check)(scope, **idents)
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_limiter():
+    """Returns the process-wide rate limiter, creating it from current settings on first use"""
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = RateLimiter()
+        return _limiter
+
+
+def reset_limiter():
+    """Discards the process-wide limiter and its buckets so the next use starts from current settings"""
+    global _limiter
+    with _limiter_lock:
+        _limiter = None
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """DRF throttle applying the RATE_LIMITS scope named by the view's throttle_scope"""
+
+    def allow_request(self, request, view):
+        scope = getattr(view, 'throttle_scope', None)
+        if scope is None or not get_setting('ENABLED'):
+            return True
+        user = request.user
+        self.wait_seconds = get_limiter().check(
+            scope,
+            user_id=user.id if user.is_authenticated else None,
+            ip=self.get_ident(request),
+            auction_id=auction_key(request.data.get('auction_id')) if hasattr(request.data, 'get') else None,
+        )
+        return self.wait_seconds is None
+
+    def wait(self):
+        return self.wait_seconds
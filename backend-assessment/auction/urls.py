@@ -1,17 +1,31 @@
 from django.urls import path
-from .views import SignUpView, LoginView, LogoutView, NewAuctionView, EnterBidView, AdminAuctionView
-from rest_framework_simplejwt.views import (
-    TokenObtainPairView,
-    TokenRefreshView,
-)
+from .views import SignUpView, LoginView, LogoutView, TokenObtainView, NewAuctionView, EnterBidView, AdminAuctionView, AdminBatchDeleteView, AdminBidHistoryView, AdminDeletionJobView, AuctionTopBidsView, LiveAuctionsView, AuctionSearchView, ProxyBidView, MetricsView
+from .async_views import AsyncEnterBidView, AsyncAuctionDetailView, AsyncLiveAuctionsView, AsyncBidStreamView
+from rest_framework_simplejwt.views import TokenRefreshView
 
 urlpatterns = [
-    path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),  # Login
+    path('api/token/', TokenObtainView.as_view(), name='token_obtain_pair'),  # Login
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),  # Refresh token
     path('api/signup/', SignUpView.as_view(), name='signup'),
     path('api/login/', LoginView.as_view(), name='login'),
     path('api/logout/', LogoutView.as_view(), name='logout'),
     path('api/auction/', NewAuctionView.as_view(), name='new_auction'),
+    path('api/auctions/live/', LiveAuctionsView.as_view(), name='live_auctions'),
+    path('api/auctions/search/', AuctionSearchView.as_view(), name='auction_search'),
+    path('api/auction/<int:auction_id>/bids/', AuctionTopBidsView.as_view(), name='auction_top_bids'),
     path('api/bid/', EnterBidView.as_view(), name='enter_bid'),
+    path('api/bid/proxy/', ProxyBidView.as_view(), name='proxy_bid'),
     path('api/admin/auction/', AdminAuctionView.as_view(), name='admin_auction'),
+    path('api/admin/auction/<int:auction_id>/bids/', AdminBidHistoryView.as_view(), name='admin_bid_history'),
+    path('api/admin/auction/batch-delete/', AdminBatchDeleteView.as_view(), name='admin_batch_delete'),
+    path('api/admin/deletions/<int:job_id>/', AdminDeletionJobView.as_view(), name='admin_deletion_job'),
+
+    # Native async endpoints, for deployments served through simple_auction/asgi.py
+    path('api/auction/<int:auction_id>/stream/', AsyncBidStreamView.as_view(), name='auction_stream'),
+    path('api/async/bid/', AsyncEnterBidView.as_view(), name='async_enter_bid'),
+    path('api/async/auction/<int:auction_id>/', AsyncAuctionDetailView.as_view(), name='async_auction_detail'),
+    path('api/async/auctions/live/', AsyncLiveAuctionsView.as_view(), name='async_live_auctions'),
+
+    # Prometheus scrape endpoint
+    path('metrics', MetricsView.as_view(), name='metrics'),
 ]
@@ -1,21 +1,58 @@
 """Module defining the different api endpoints"""
 
+import json
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated, IsAdminUser
+from rest_framework.permissions import AllowAny, IsAuthenticated, IsAdminUser
 from rest_framework import status
-from rest_framework_simplejwt.tokens import RefreshToken, TokenError
+from rest_framework_simplejwt.tokens import TokenError
+from rest_framework_simplejwt.views import TokenObtainPairView
 from django.contrib.auth import authenticate
 from django.contrib.auth.models import User
-from .models import Auction, Bid
-from .serializers import UserSerializer, AuctionSerializer, BidSerializer
+from django.http import HttpResponse, StreamingHttpResponse
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.views import View
+from .models import Auction, AuctionArchive, Bid, DeletionJob
+from .serializers import UserSerializer, AuctionSerializer, AuctionArchiveSerializer, DeletionJobSerializer, LiveAuctionSerializer
+from .read_serializers import auction_reader, bid_reader
+from .sqlite import write_transaction
+from .archiving import bid_history
+from .bidding import place_bid, check_amount, BidRejected
+from .proxy import get_engine
+from .authentication import ClaimsRefreshToken
+from .hashers import HashingBusy
+from .idempotency import idempotent
+from .api_docs import openapi, swagger_auto_schema
+from . import conditional, deletion, events, group_commit, leaderboard, live_cache, metrics, search
+from .pagination import (
+    DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, InvalidCursor, after_cursor, paginate
+)
 from decimal import Decimal, InvalidOperation
-from drf_yasg.utils import swagger_auto_schema
-from drf_yasg import openapi
+
+def parse_amount(value):
+    """Returns a positive Decimal amount, raising ValueError with the error message otherwise"""
+    try:
+        amount = Decimal(value)
+    except (InvalidOperation, TypeError):
+        raise ValueError('Invalid amount')
+    rejection = check_amount(amount)
+    if rejection:
+        raise ValueError(rejection.message)
+    return amount
+
+IDEMPOTENCY_KEY_PARAMETER = openapi.Parameter(
+    'Idempotency-Key', openapi.IN_HEADER, type=openapi.TYPE_STRING,
+    description='Unique key of this request; retries with the same key get the first response back'
+)
+
+def busy_response(exc):
+    """Returns the fast 503 sent when the password hashing pool is full"""
+    return Response({'error': str(exc.detail)}, status=exc.status_code, headers={'Retry-After': str(exc.wait)})
 
 class SignUpView(APIView):
     """API endpoint for user registration."""
+    throttle_scope = 'signup'
     
     @swagger_auto_schema(
         operation_description="Creates a new user account",
@@ -29,7 +66,9 @@ class SignUpView(APIView):
         ),
         responses={
             201: "User created successfully",
-            400: "Bad Request"
+            400: "Bad Request",
+            429: "Too many signups from this address, retry after Retry-After seconds",
+            503: "Too many logins and signups in progress, retry after Retry-After seconds"
         }
     )
     def post(self, request):
@@ -40,7 +79,10 @@ class SignUpView(APIView):
             return Response({'error': 'Username and password are required'}, status=status.HTTP_400_BAD_REQUEST)
         if User.objects.filter(username=username).exists():
             return Response({'error': 'Username already taken'}, status=status.HTTP_400_BAD_REQUEST)
-        user = User.objects.create_user(username=username, password=password)
+        try:
+            user = User.objects.create_user(username=username, password=password)
+        except HashingBusy as exc:
+            return busy_response(exc)
         serializer = UserSerializer(user)
         return Response({
             'message': 'User created successfully',
@@ -49,6 +91,7 @@ class SignUpView(APIView):
 
 class LoginView(APIView):
     """API endpoint for user login."""
+    throttle_scope = 'login'
     
     @swagger_auto_schema(
         operation_description="Authenticates user and returns JWT tokens",
@@ -63,7 +106,9 @@ class LoginView(APIView):
         responses={
             200: "Login successful",
             400: "Bad Request",
-            401: "Invalid credentials"
+            401: "Invalid credentials",
+            429: "Too many logins from this address, retry after Retry-After seconds",
+            503: "Too many logins and signups in progress, retry after Retry-After seconds"
         }
     )
     def post(self, request):
@@ -72,10 +117,13 @@ class LoginView(APIView):
         password = request.data.get('password')
         if not username or not password:
             return Response({'error': 'Username and password are required'}, status=status.HTTP_400_BAD_REQUEST)
-        user = authenticate(username=username, password=password)
+        try:
+            user = authenticate(username=username, password=password)
+        except HashingBusy as exc:
+            return busy_response(exc)
         if user is None:
             return Response({'error': 'Invalid credentials'}, status=status.HTTP_401_UNAUTHORIZED)
-        refresh = RefreshToken.for_user(user)
+        refresh = ClaimsRefreshToken.for_user(user)
         serializer = UserSerializer(user)
         return Response({
             'message': 'Login successful',
@@ -84,6 +132,10 @@ class LoginView(APIView):
             'access': str(refresh.access_token)
         }, status=status.HTTP_200_OK)
 
+class TokenObtainView(TokenObtainPairView):
+    """simplejwt's token pair endpoint, sharing the login rate limit with LoginView."""
+    throttle_scope = 'login'
+
 class LogoutView(APIView):
     """API endpoint for user logout."""
     permission_classes = [IsAuthenticated]
@@ -109,7 +161,7 @@ class LogoutView(APIView):
         if not refresh_token:
             return Response({'error': 'Refresh token required'}, status=status.HTTP_400_BAD_REQUEST)
         try:
-            token = RefreshToken(refresh_token)
+            token = ClaimsRefreshToken(refresh_token)
             token.blacklist()
             return Response({'message': 'Logged out successfully'}, status=status.HTTP_200_OK)
         except TokenError:
@@ -121,6 +173,7 @@ class NewAuctionView(APIView):
     
     @swagger_auto_schema(
         operation_description="Create a new auction",
+        manual_parameters=[IDEMPOTENCY_KEY_PARAMETER],
         request_body=openapi.Schema(
             type=openapi.TYPE_OBJECT,
             required=['title', 'description', 'starting_price', 'start_time', 'end_time'],
@@ -135,9 +188,12 @@ class NewAuctionView(APIView):
         responses={
             201: "Auction created successfully",
             400: "Bad Request",
-            401: "Unauthorized"
+            401: "Unauthorized",
+            409: "A request with this Idempotency-Key is still in progress",
+            422: "Idempotency-Key was already used for a different request"
         }
     )
+    @idempotent
     def post(self, request):
         """Handles the creation of a new auction with the current user as creator."""
         # Create a mutable copy of the data
@@ -149,16 +205,20 @@ class NewAuctionView(APIView):
             
         serializer = AuctionSerializer(data=data)
         if serializer.is_valid():
-            serializer.save(creator=request.user)
+            with write_transaction():
+                auction = serializer.save(creator_id=request.user.id)
+            live_cache.auction_created(auction)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 class EnterBidView(APIView):
     """API endpoint for placing a Bid on an auction (authenticated users only)."""
     permission_classes = [IsAuthenticated]
+    throttle_scope = 'bid'
     
     @swagger_auto_schema(
         operation_description="Place a bid on an active auction",
+        manual_parameters=[IDEMPOTENCY_KEY_PARAMETER],
         request_body=openapi.Schema(
             type=openapi.TYPE_OBJECT,
             required=['auction_id', 'amount'],
@@ -171,9 +231,13 @@ class EnterBidView(APIView):
             200: "Bid placed successfully",
             400: "Bad Request - Auction not active or bid too low",
             401: "Unauthorized",
-            404: "Auction not found"
+            404: "Auction not found",
+            409: "A request with this Idempotency-Key is still in progress",
+            422: "Idempotency-Key was already used for a different request",
+            429: "Too many bids, retry after Retry-After seconds"
         }
     )
+    @idempotent
     def post(self, request):
         """Places a Bid if the auction is active and the Bid is higher than the current highest."""
         auction_id = request.data.get('auction_id')
@@ -185,55 +249,275 @@ class EnterBidView(APIView):
         
         # Validate amount
         try:
-            amount = Decimal(amount)
-            if amount <= 0:
-                return Response({'error': 'Amount must be positive'}, status=status.HTTP_400_BAD_REQUEST)
-        except (InvalidOperation, TypeError):
-            return Response({'error': 'Invalid amount'}, status=status.HTTP_400_BAD_REQUEST)
+            amount = parse_amount(amount)
+        except ValueError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
         
-        # Get auction
+        # Accept or reject the bid in a single guarded write
         try:
-            auction = Auction.objects.get(id=auction_id)
-        except Auction.DoesNotExist:
-            return Response({'error': 'Auction not found'}, status=status.HTTP_404_NOT_FOUND)
-        
-        # Check if auction is active
-        now = timezone.now()
-        if now < auction.start_time or now > auction.end_time:
-            return Response({'error': 'Auction not active'}, status=status.HTTP_400_BAD_REQUEST)
-        
-        # Check if bid is higher than current highest
-        highest_bid = auction.bids.order_by('-amount').first()
-        if highest_bid and amount <= highest_bid.amount:
-            return Response({'error': 'Bid must be higher than current highest bid'}, status=status.HTTP_400_BAD_REQUEST)
+            if group_commit.is_enabled():
+                bid = group_commit.place_bid(auction_id, request.user, amount)
+            else:
+                bid = place_bid(auction_id, request.user, amount)
+        except BidRejected as exc:
+            return Response({'error': exc.message}, status=exc.status_code)
         
-        # Check if bid is higher than starting price if no bids yet
-        if not highest_bid and amount < auction.starting_price:
-            return Response({'error': 'Bid must be at least the starting price'}, status=status.HTTP_400_BAD_REQUEST)
+        # Let registered maximum bids answer
+        proxy_bids = get_engine().respond_to_bid(bid)
+        live_cache.record_bid(proxy_bids[-1] if proxy_bids else bid)
+        leaderboard.get_leaderboards().record_bids([bid, *proxy_bids])
+        events.publish_bids([bid, *proxy_bids])
+        return Response({
+            'message': 'Bid placed successfully',
+            'bid': bid_reader.encode_instance(bid),
+            'outbid': bool(proxy_bids)
+        }, status=status.HTTP_200_OK)
+
+class ProxyBidView(APIView):
+    """API endpoint for registering a maximum bid placed automatically in increments (authenticated users only)."""
+    permission_classes = [IsAuthenticated]
+    throttle_scope = 'bid'
+    
+    @swagger_auto_schema(
+        operation_description="Register or raise a maximum bid; the system outbids others on your behalf up to it",
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            required=['auction_id', 'max_amount'],
+            properties={
+                'auction_id': openapi.Schema(type=openapi.TYPE_INTEGER, description='ID of the auction'),
+                'max_amount': openapi.Schema(type=openapi.TYPE_STRING, description='Maximum bid amount (decimal)'),
+            }
+        ),
+        responses={
+            200: "Maximum bid registered",
+            400: "Bad Request - Auction not active or maximum too low",
+            401: "Unauthorized",
+            404: "Auction not found",
+            429: "Too many bids, retry after Retry-After seconds"
+        }
+    )
+    def post(self, request):
+        """Registers the user's maximum and returns the visible bids it produced."""
+        auction_id = request.data.get('auction_id')
+        if not auction_id:
+            return Response({'error': 'Auction ID is required'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            max_amount = parse_amount(request.data.get('max_amount'))
+        except ValueError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
         
-        # Create bid
-        bid = Bid.objects.create(auction=auction, bidder=request.user, amount=amount)
-        serializer = BidSerializer(bid)
-        return Response({'message': 'Bid placed successfully', 'bid': serializer.data}, status=status.HTTP_200_OK)
+        try:
+            bids = get_engine().register(auction_id, request.user, max_amount)
+        except BidRejected as exc:
+            return Response({'error': exc.message}, status=exc.status_code)
+        if bids:
+            live_cache.record_bid(bids[-1])
+            leaderboard.get_leaderboards().record_bids(bids)
+            events.publish_bids(bids)
+        return Response({
+            'message': 'Maximum bid registered',
+            'bids': bid_reader.encode_instances(bids),
+            'leading': bool(bids) and bids[-1].bidder_id == request.user.id
+        }, status=status.HTTP_200_OK)
+
+class LiveAuctionsView(APIView):
+    """Public API endpoint listing active auctions with their current high bid."""
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    @swagger_auto_schema(
+        operation_description="List active auctions with their current high bid",
+        security=[],
+        responses={
+            200: LiveAuctionSerializer(many=True),
+            304: "Not Modified - the If-None-Match ETag is current"
+        }
+    )
+    def get(self, request):
+        """Serves active auctions from the live auction cache, or 304 when the client's ETag is current."""
+        now = timezone.now()
+        # Taken before the listing, so a write landing in between changes the next ETag
+        etag = live_cache.get_listing_etag(now)
+        response = conditional.not_modified(request, etag)
+        if response is not None:
+            return response
+        return Response(live_cache.get_live_auctions(now), status=status.HTTP_200_OK, headers={'ETag': etag})
+
+class AuctionTopBidsView(APIView):
+    """Public API endpoint listing an auction's highest bids."""
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    @swagger_auto_schema(
+        operation_description="List an auction's highest bids, highest first, from an in-memory leaderboard",
+        security=[],
+        manual_parameters=[
+            openapi.Parameter('top', openapi.IN_QUERY, type=openapi.TYPE_INTEGER, description='Number of bids (default %d, max %d)' % (leaderboard.DEFAULT_TOP, leaderboard.get_setting('SIZE'))),
+        ],
+        responses={
+            200: "The highest bids, highest first",
+            400: "Bad Request - Invalid top",
+            404: "Auction not found"
+        }
+    )
+    def get(self, request, auction_id):
+        """Serves an auction's top bids from its leaderboard, rebuilt from the database when not resident."""
+        top = request.query_params.get('top', str(leaderboard.DEFAULT_TOP))
+        size = leaderboard.get_setting('SIZE')
+        if not top.isdigit() or not 1 <= int(top) <= size:
+            return Response({'error': 'top must be between 1 and %d' % size}, status=status.HTTP_400_BAD_REQUEST)
+        bids = leaderboard.get_leaderboards().top(auction_id, int(top))
+        if bids is None:
+            return Response({'error': 'Auction not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response({'results': bids}, status=status.HTTP_200_OK)
+
+def parse_price(params, name):
+    """Returns a non-negative Decimal query parameter, or None when it is absent"""
+    if not params.get(name):
+        return None
+    try:
+        price = Decimal(params[name])
+    except InvalidOperation:
+        raise ValueError('%s must be a number' % name)
+    if not price.is_finite() or price < 0:
+        raise ValueError('%s must be a non-negative number' % name)
+    return price
+
+
+class AuctionSearchView(APIView):
+    """Public API endpoint searching auction titles and descriptions."""
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    @swagger_auto_schema(
+        operation_description="Search auctions by title and description, best matches first, one cursor page at a time",
+        security=[],
+        manual_parameters=[
+            openapi.Parameter('q', openapi.IN_QUERY, type=openapi.TYPE_STRING, required=True, description='Words that must all match; end a word with * to match it as a prefix'),
+            openapi.Parameter('cursor', openapi.IN_QUERY, type=openapi.TYPE_STRING, description='Cursor returned as next_cursor by the previous page'),
+            openapi.Parameter('limit', openapi.IN_QUERY, type=openapi.TYPE_INTEGER, description='Page size (default %d, max %d)' % (search.DEFAULT_PAGE_SIZE, search.MAX_PAGE_SIZE)),
+            openapi.Parameter('active', openapi.IN_QUERY, type=openapi.TYPE_BOOLEAN, description='Only auctions open for bids now'),
+            openapi.Parameter('min_price', openapi.IN_QUERY, type=openapi.TYPE_STRING, description='Lowest current price (high bid, else starting price)'),
+            openapi.Parameter('max_price', openapi.IN_QUERY, type=openapi.TYPE_STRING, description='Highest current price (high bid, else starting price)'),
+        ],
+        responses={
+            200: "Page of matching auctions and the next cursor",
+            400: "Bad Request - Missing query or invalid filter or cursor"
+        }
+    )
+    def get(self, request):
+        """Returns auctions matching every word of q, ranked by relevance."""
+        params = request.query_params
+        try:
+            limit = params.get('limit', str(search.DEFAULT_PAGE_SIZE))
+            if not limit.isdigit() or not 1 <= int(limit) <= search.MAX_PAGE_SIZE:
+                raise ValueError('limit must be between 1 and %d' % search.MAX_PAGE_SIZE)
+            results, next_cursor = search.search(
+                params.get('q', ''), params.get('cursor'), int(limit),
+                active=params.get('active') in ('1', 'true'),
+                min_price=parse_price(params, 'min_price'),
+                max_price=parse_price(params, 'max_price'),
+            )
+        except InvalidCursor:
+            return Response({'error': 'Invalid cursor'}, status=status.HTTP_400_BAD_REQUEST)
+        except ValueError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'results': results, 'next_cursor': next_cursor}, status=status.HTTP_200_OK)
+
+AUCTION_STATUSES = ('upcoming', 'active', 'ended')
+STREAM_CHUNK_SIZE = 2000
+
+
+def filter_auctions(queryset, params):
+    """Applies the status, creator and end time filters from the query string"""
+    now = timezone.now()
+    auction_status = params.get('status')
+    if auction_status == 'upcoming':
+        queryset = queryset.filter(start_time__gt=now)
+    elif auction_status == 'active':
+        queryset = queryset.filter(start_time__lte=now, end_time__gte=now)
+    elif auction_status == 'ended':
+        queryset = queryset.filter(end_time__lt=now)
+    elif auction_status:
+        raise ValueError('status must be one of: %s' % ', '.join(AUCTION_STATUSES))
+    if params.get('creator'):
+        try:
+            queryset = queryset.filter(creator_id=int(params['creator']))
+        except ValueError:
+            raise ValueError('creator must be a user id')
+    for param, lookup in (('ends_after', 'end_time__gte'), ('ends_before', 'end_time__lt')):
+        if params.get(param):
+            value = parse_datetime(params[param])
+            if value is None:
+                raise ValueError('%s must be an ISO 8601 datetime' % param)
+            queryset = queryset.filter(**{lookup: value})
+    return queryset
+
+
+def page_etag(rows):
+    """Returns the ETag of a page of auction rows from their ids and versions"""
+    return conditional.listing_etag((row.id, row.version) for row in rows)
+
+
+def stream_ndjson(queryset):
+    """Yields one serialized auction per line without loading the whole result set"""
+    encode = auction_reader.encoder()
+    for row in auction_reader.values(queryset).iterator(chunk_size=STREAM_CHUNK_SIZE):
+        yield json.dumps(encode(row)) + '\n'
+
 
 class AdminAuctionView(APIView):
     """API endpoint for admin operations on auctions."""
     permission_classes = [IsAdminUser]
     
     @swagger_auto_schema(
-        operation_description="Get all auctions (admin only)",
+        operation_description="List auctions ordered by end time, one cursor page at a time (admin only)",
+        manual_parameters=[
+            openapi.Parameter('cursor', openapi.IN_QUERY, type=openapi.TYPE_STRING, description='Cursor returned as next_cursor by the previous page'),
+            openapi.Parameter('limit', openapi.IN_QUERY, type=openapi.TYPE_INTEGER, description='Page size (default %d, max %d)' % (DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE)),
+            openapi.Parameter('status', openapi.IN_QUERY, type=openapi.TYPE_STRING, enum=list(AUCTION_STATUSES), description='Only auctions in this state'),
+            openapi.Parameter('creator', openapi.IN_QUERY, type=openapi.TYPE_INTEGER, description='Only auctions created by this user'),
+            openapi.Parameter('ends_after', openapi.IN_QUERY, type=openapi.TYPE_STRING, format=openapi.FORMAT_DATETIME, description='Only auctions ending at or after this time'),
+            openapi.Parameter('ends_before', openapi.IN_QUERY, type=openapi.TYPE_STRING, format=openapi.FORMAT_DATETIME, description='Only auctions ending before this time'),
+            openapi.Parameter('stream', openapi.IN_QUERY, type=openapi.TYPE_BOOLEAN, description='Stream every matching auction as NDJSON instead of paginating'),
+        ],
         responses={
-            200: "List of all auctions",
+            200: "Page of auctions and the next cursor, or an NDJSON stream",
+            304: "Not Modified - the If-None-Match ETag is current",
+            400: "Bad Request - Invalid filter or cursor",
             401: "Unauthorized",
             403: "Forbidden - Not an admin"
         }
     )
     def get(self, request):
-        """View all auctions (admin only)."""
-        auctions = Auction.objects.all()
-        serializer = AuctionSerializer(auctions, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
-    
+        """View auctions page by page, or as one NDJSON stream (admin only)."""
+        params = request.query_params
+        try:
+            auctions = filter_auctions(Auction.objects.all(), params)
+            if params.get('stream') in ('1', 'true'):
+                # Pick the read database now: the stream is read after the routing middleware returns
+                auctions = auctions.using(auctions.db)
+                return StreamingHttpResponse(
+                    stream_ndjson(after_cursor(auctions, params.get('cursor'))),
+                    content_type='application/x-ndjson'
+                )
+            limit = params.get('limit', str(DEFAULT_PAGE_SIZE))
+            if not limit.isdigit() or not 1 <= int(limit) <= MAX_PAGE_SIZE:
+                raise ValueError('limit must be between 1 and %d' % MAX_PAGE_SIZE)
+            if request.headers.get('If-None-Match'):
+                # The page's versions alone tell whether the client's copy is current
+                versions, next_cursor = paginate(auctions.values_list('id', 'end_time', 'version', named=True), params.get('cursor'), int(limit))
+                response = conditional.not_modified(request, page_etag(versions))
+                if response is not None:
+                    return response
+            page, next_cursor = paginate(auction_reader.values(auctions), params.get('cursor'), int(limit))
+        except InvalidCursor:
+            return Response({'error': 'Invalid cursor'}, status=status.HTTP_400_BAD_REQUEST)
+        except ValueError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'results': auction_reader.encode_rows(page), 'next_cursor': next_cursor},
+                        status=status.HTTP_200_OK, headers={'ETag': page_etag(page)})
+
     @swagger_auto_schema(
         operation_description="Delete an auction or bid (admin only)",
         request_body=openapi.Schema(
@@ -246,6 +530,7 @@ class AdminAuctionView(APIView):
         ),
         responses={
             200: "Successfully deleted",
+            202: "Auction with many bids is being deleted by the returned background job",
             400: "Bad Request - Missing required fields",
             401: "Unauthorized",
             403: "Forbidden - Not an admin",
@@ -261,20 +546,159 @@ class AdminAuctionView(APIView):
         # If bid_id is provided, delete the bid
         if bid_id:
             try:
-                bid = Bid.objects.get(id=bid_id)
-                bid.delete()
+                bid = Bid.objects.select_related('auction').get(id=bid_id)
+                with write_transaction():
+                    bid.delete()
+                    bid.auction.refresh_current_high()
+                live_cache.auction_changed(bid.auction_id)
+                leaderboard.get_leaderboards().forget(bid.auction_id)
                 return Response({'message': 'Bid deleted successfully'}, status=status.HTTP_200_OK)
             except Bid.DoesNotExist:
                 return Response({'error': 'Bid not found'}, status=status.HTTP_404_NOT_FOUND)
         
         # If auction_id is provided, delete the auction
         elif auction_id:
-            try:
-                auction = Auction.objects.get(id=auction_id)
-                auction.delete()
-                return Response({'message': 'Auction deleted successfully'}, status=status.HTTP_200_OK)
-            except Auction.DoesNotExist:
+            bid_count = Auction.objects.filter(id=auction_id).values_list('bid_count', flat=True).first()
+            if bid_count is None:
                 return Response({'error': 'Auction not found'}, status=status.HTTP_404_NOT_FOUND)
+            if bid_count > deletion.get_setting('INLINE_MAX_BIDS'):
+                job = deletion.create_job([int(auction_id)], request.user)
+                return Response({
+                    'message': 'Auction deletion started',
+                    'job': DeletionJobSerializer(job).data
+                }, status=status.HTTP_202_ACCEPTED)
+            deletion.delete_auctions([int(auction_id)])
+            return Response({'message': 'Auction deleted successfully'}, status=status.HTTP_200_OK)
         
         else:
             return Response({'error': 'Either auction_id or bid_id is required'}, status=status.HTTP_400_BAD_REQUEST)
+
+
+def parse_ids(data, name):
+    """Returns the list of positive integer ids under name, raising ValueError with the error message otherwise"""
+    ids = data.get(name, [])
+    if not isinstance(ids, list) or not all(isinstance(pk, int) and not isinstance(pk, bool) and pk > 0 for pk in ids):
+        raise ValueError('%s must be a list of ids' % name)
+    return list(dict.fromkeys(ids))
+
+
+class AdminBatchDeleteView(APIView):
+    """API endpoint for deleting many auctions and bids in one request (admin only)."""
+    permission_classes = [IsAdminUser]
+
+    @swagger_auto_schema(
+        operation_description="Delete many auctions and bids at once; auctions with many bids are deleted by a background job (admin only)",
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                'auction_ids': openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_INTEGER), description='IDs of the auctions to delete'),
+                'bid_ids': openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_INTEGER), description='IDs of the bids to delete'),
+            }
+        ),
+        responses={
+            200: "Counts of the deleted auctions and bids",
+            202: "Bids deleted, auctions being deleted by the returned background job",
+            400: "Bad Request - Invalid or too many ids",
+            401: "Unauthorized",
+            403: "Forbidden - Not an admin"
+        }
+    )
+    def post(self, request):
+        """Deletes the listed bids, then the listed auctions, inline or in a background job (admin only)."""
+        if not hasattr(request.data, 'get'):
+            return Response({'error': 'Expected a JSON object'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            auction_ids = parse_ids(request.data, 'auction_ids')
+            bid_ids = parse_ids(request.data, 'bid_ids')
+        except ValueError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        max_ids = deletion.get_setting('MAX_BATCH_IDS')
+        if len(auction_ids) + len(bid_ids) > max_ids:
+            return Response({'error': 'At most %d ids per request' % max_ids}, status=status.HTTP_400_BAD_REQUEST)
+
+        deleted_bids = deletion.delete_bids(bid_ids) if bid_ids else 0
+        auction_ids = list(Auction.objects.filter(id__in=auction_ids).order_by('id').values_list('id', flat=True))
+        if auction_ids and deletion.bids_to_delete(auction_ids) > deletion.get_setting('INLINE_MAX_BIDS'):
+            job = deletion.create_job(auction_ids, request.user)
+            return Response({
+                'deleted_bids': deleted_bids,
+                'deleted_auctions': 0,
+                'job': DeletionJobSerializer(job).data
+            }, status=status.HTTP_202_ACCEPTED)
+        return Response({
+            'deleted_bids': deleted_bids,
+            'deleted_auctions': deletion.delete_auctions(auction_ids) if auction_ids else 0,
+            'job': None
+        }, status=status.HTTP_200_OK)
+
+
+class AdminDeletionJobView(APIView):
+    """API endpoint reporting the progress of a background deletion (admin only)."""
+    permission_classes = [IsAdminUser]
+
+    @swagger_auto_schema(
+        operation_description="Show a background deletion job and its progress (admin only)",
+        responses={
+            200: "The job, with deleted_bids of total_bids done so far",
+            401: "Unauthorized",
+            403: "Forbidden - Not an admin",
+            404: "Job not found"
+        }
+    )
+    def get(self, request, job_id):
+        """View a deletion job's status and progress (admin only)."""
+        job = DeletionJob.objects.filter(id=job_id).first()
+        if job is None:
+            return Response({'error': 'Job not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(DeletionJobSerializer(job).data, status=status.HTTP_200_OK)
+
+
+class AdminBidHistoryView(APIView):
+    """API endpoint for reading an auction's bids, archived or not (admin only)."""
+    permission_classes = [IsAdminUser]
+
+    @swagger_auto_schema(
+        operation_description="List an auction's bids in the order they were placed, including archived bids, one page at a time (admin only)",
+        manual_parameters=[
+            openapi.Parameter('cursor', openapi.IN_QUERY, type=openapi.TYPE_STRING, description='Cursor returned as next_cursor by the previous page'),
+            openapi.Parameter('limit', openapi.IN_QUERY, type=openapi.TYPE_INTEGER, description='Page size (default %d, max %d)' % (DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE)),
+        ],
+        responses={
+            200: "Page of bids, the next cursor and the archive summary (null until archived)",
+            400: "Bad Request - Invalid cursor or limit",
+            401: "Unauthorized",
+            403: "Forbidden - Not an admin",
+            404: "Auction not found"
+        }
+    )
+    def get(self, request, auction_id):
+        """View an auction's bid history from the hot and archive tables (admin only)."""
+        params = request.query_params
+        cursor = params.get('cursor')
+        limit = params.get('limit', str(DEFAULT_PAGE_SIZE))
+        if cursor is not None and not cursor.isdigit():
+            return Response({'error': 'Invalid cursor'}, status=status.HTTP_400_BAD_REQUEST)
+        if not limit.isdigit() or not 1 <= int(limit) <= MAX_PAGE_SIZE:
+            return Response({'error': 'limit must be between 1 and %d' % MAX_PAGE_SIZE}, status=status.HTTP_400_BAD_REQUEST)
+        if not Auction.objects.filter(id=auction_id).exists():
+            return Response({'error': 'Auction not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        limit = int(limit)
+        rows = list(bid_history(auction_id, int(cursor) if cursor else None)[:limit + 1])
+        next_cursor = str(rows[limit - 1].id) if len(rows) > limit else None
+        archive = AuctionArchive.objects.filter(auction_id=auction_id).first()
+        return Response({
+            'results': bid_reader.encode_rows(rows[:limit]),
+            'next_cursor': next_cursor,
+            'archive': AuctionArchiveSerializer(archive).data if archive else None,
+        }, status=status.HTTP_200_OK)
+
+
+class MetricsView(View):
+    """Prometheus endpoint serving this process's request metrics."""
+
+    def get(self, request):
+        """Returns the aggregates in the Prometheus text format."""
+        if not metrics.is_authorized(request):
+            return HttpResponse('Unauthorized\n', status=status.HTTP_401_UNAUTHORIZED, content_type='text/plain')
+        return HttpResponse(metrics.registry.render(), content_type=metrics.CONTENT_TYPE)
@@ -0,0 +1,6 @@
+"""Benchmarks for the auction API
+
+Each module is runnable from the project directory, e.g.
+``python -m benchmarks.bid_ingestion``. Benchmarks run against a throwaway copy
+of the database built the same way as the test database.
+"""
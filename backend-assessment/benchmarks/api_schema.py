@@ -0,0 +1,100 @@
+"""Measures worker cold start and schema endpoint latency with the stored OpenAPI schema
+
+Cold start is timed in fresh interpreters from django.setup() until the URLconf
+is loaded, as a worker does before its first request: once as the URLconf now
+loads, leaving drf_yasg unimported, and once also importing drf_yasg and
+building every swagger_auto_schema definition, as loading the views used to.
+
+Latency compares drf_yasg's schema view without a cache, which walks every view
+on each request (cache_timeout=0, as /swagger.json/ used to be served), with
+the stored schema on first use, when warm, and revalidated with If-None-Match.
+
+    python -m benchmarks.api_schema --starts 10 --requests 200
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from benchmarks.common import setup_django
+
+START_SCRIPT = '''
+import sys, time
+started = time.perf_counter()
+import django
+django.setup()
+from django.urls import get_resolver
+get_resolver().url_patterns
+if sys.argv[1] == 'eager':
+    import drf_yasg.views
+    from auction import api_docs
+    api_docs.apply_pending()
+print(time.perf_counter() - started)
+'''
+
+
+def cold_start(mode):
+    """Returns the seconds a fresh interpreter takes to set up Django and load the URLconf"""
+    result = subprocess.run(
+        [sys.executable, '-c', START_SCRIPT, mode], capture_output=True, text=True, check=True,
+        env=dict(os.environ, DJANGO_SETTINGS_MODULE='simple_auction.settings'),
+    )
+    return float(result.stdout)
+
+
+def timed(call, requests):
+    """Returns the median milliseconds of call() over the given number of requests"""
+    timings = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        call()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--starts', type=int, default=10, help='Fresh interpreters per cold start case')
+    parser.add_argument('--requests', type=int, default=200, help='Requests per latency case')
+    args = parser.parse_args()
+
+    for mode, name in (('eager', 'drf_yasg at startup'), ('lazy', 'drf_yasg on first use')):
+        starts = [cold_start(mode) for _ in range(args.starts)]
+        print('cold start, %-22s median %6.1f ms  min %6.1f ms' % (
+            name, statistics.median(starts) * 1000, min(starts) * 1000,
+        ))
+
+    setup_django()
+    from django.test import Client
+    from django.test.utils import setup_test_environment
+    from rest_framework import permissions
+    from rest_framework.test import APIRequestFactory
+    from auction import api_docs
+
+    setup_test_environment()
+    client = Client()
+    started = time.perf_counter()
+    response = client.get('/swagger.json/')
+    first = (time.perf_counter() - started) * 1000
+    etag = response['ETag']
+
+    from drf_yasg.views import get_schema_view
+    uncached = get_schema_view(api_docs.INFO.build(), public=True, permission_classes=(permissions.AllowAny,)).without_ui(cache_timeout=0)
+    request = APIRequestFactory().get('/swagger.json/')
+    cases = (
+        ('drf_yasg, no cache', lambda: uncached(request, format='.json').render()),
+        ('stored, first use', None),
+        ('stored', lambda: client.get('/swagger.json/')),
+        ('stored, yaml', lambda: client.get('/swagger.yaml/')),
+        ('stored, 304', lambda: client.get('/swagger.json/', HTTP_IF_NONE_MATCH=etag)),
+    )
+    print('schema: %d bytes of JSON' % len(response.content))
+    for name, call in cases:
+        print('%-22s %8.2f ms' % (name, first if call is None else timed(call, args.requests)))
+
+
+if __name__ == '__main__':
+    main()
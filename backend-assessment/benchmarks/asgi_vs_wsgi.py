@@ -0,0 +1,102 @@
+"""Compares the WSGI (DRF) and native ASGI endpoints for bids and live auction reads
+
+By default both handlers are driven in process against a throwaway database:
+the WSGI handler from a pool of threads, the ASGI handler from concurrent tasks.
+In-process numbers include the test clients' own overhead and one GIL shared by
+client and server, so treat them as indicative and compare deployments over HTTP.
+To measure real deployments, start the two servers against the same database and
+pass their URLs, a bearer token and an active auction id:
+
+    gunicorn simple_auction.wsgi -w 4 --threads 32 -b 127.0.0.1:8000
+    uvicorn simple_auction.asgi:application --workers 4 --port 8001
+    python -m benchmarks.asgi_vs_wsgi --wsgi-url http://127.0.0.1:8000 \\
+        --asgi-url http://127.0.0.1:8001 --token <access> --auction-id <id>
+"""
+
+import argparse
+import itertools
+import json
+from datetime import timedelta
+from decimal import Decimal
+
+from benchmarks.common import benchmark_database, setup_django
+from benchmarks.loadgen import json_body, run_asgi_in_process, run_http, run_wsgi_in_process, summarize
+
+ENDPOINTS = {
+    'wsgi': {'bid': '/api/bid/', 'live': '/api/auctions/live/'},
+    'asgi': {'bid': '/api/async/bid/', 'live': '/api/async/auctions/live/'},
+}
+
+
+def request_factory(deployment, scenario, token, auction_id):
+    """Returns make_request(i) for a scenario against one deployment's endpoints"""
+    path = ENDPOINTS[deployment][scenario]
+    if scenario == 'live':
+        return lambda i: ('GET', path, {}, None)
+    amounts = itertools.count(1)
+    headers = {'Authorization': 'Bearer ' + token}
+    return lambda i: ('POST', path, headers, json_body({'auction_id': auction_id, 'amount': str(next(amounts))}))
+
+
+def seed():
+    """Creates a bidder, a few live auctions and one auction to bid on; returns (token, auction_id)"""
+    from django.contrib.auth.models import User
+    from django.utils import timezone
+    from rest_framework_simplejwt.tokens import RefreshToken
+    from auction.models import Auction
+
+    user = User.objects.create_user(username='bench', password='pass')
+    now = timezone.now()
+    auctions = Auction.objects.bulk_create([
+        Auction(title='Item %d' % i, description='Benchmark', starting_price=Decimal('1.00'),
+                start_time=now - timedelta(hours=1), end_time=now + timedelta(hours=2), creator=user)
+        for i in range(50)
+    ])
+    return str(RefreshToken.for_user(user).access_token), auctions[0].id
+
+
+def reset_auction(auction_id):
+    """Clears bids between runs so both deployments bid against the same starting state"""
+    from auction.models import Auction, Bid
+    Bid.objects.filter(auction_id=auction_id).delete()
+    Auction.objects.filter(id=auction_id).update(current_high_amount=None, current_high_bid=None, bid_count=0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--concurrency', type=int, default=500)
+    parser.add_argument('--requests', type=int, default=2000, help='Requests per scenario and deployment')
+    parser.add_argument('--scenario', choices=['bid', 'live', 'all'], default='all')
+    parser.add_argument('--wsgi-url')
+    parser.add_argument('--asgi-url')
+    parser.add_argument('--token', help='Access token for the bid scenario against running servers')
+    parser.add_argument('--auction-id', type=int, help='Active auction for the bid scenario against running servers')
+    args = parser.parse_args()
+
+    scenarios = ['bid', 'live'] if args.scenario == 'all' else [args.scenario]
+    results = []
+    if args.wsgi_url or args.asgi_url:
+        for deployment, url in (('wsgi', args.wsgi_url), ('asgi', args.asgi_url)):
+            for scenario in scenarios if url else []:
+                if scenario == 'bid' and not (args.token and args.auction_id):
+                    parser.error('--token and --auction-id are required for the bid scenario')
+                make_request = request_factory(deployment, scenario, args.token, args.auction_id)
+                results.append((deployment, scenario, summarize(run_http(url, make_request, args.concurrency, args.requests))))
+    else:
+        setup_django()
+        with benchmark_database():
+            token, auction_id = seed()
+            for scenario in scenarios:
+                for deployment, run in (('wsgi', run_wsgi_in_process), ('asgi', run_asgi_in_process)):
+                    reset_auction(auction_id)
+                    make_request = request_factory(deployment, scenario, token, auction_id)
+                    results.append((deployment, scenario, summarize(run(make_request, args.concurrency, args.requests))))
+
+    for deployment, scenario, summary in results:
+        print('%-4s %-4s %8.1f req/s  p50 %8.2f ms  p99 %8.2f ms  %s' % (
+            deployment, scenario, summary['rps'], summary['p50_ms'], summary['p99_ms'], json.dumps(summary['statuses'])
+        ))
+
+
+if __name__ == '__main__':
+    main()
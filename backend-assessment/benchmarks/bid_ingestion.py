@@ -0,0 +1,83 @@
+"""Compares accepted bids per second for per-request and group commit bid ingestion
+
+Fires bids at a single hot auction through EnterBidView from many threads, once
+with every bid in its own transaction and once with BID_GROUP_COMMIT enabled.
+
+    python -m benchmarks.bid_ingestion --bidders 64 --bids 4000
+"""
+
+import argparse
+import itertools
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+
+from benchmarks.common import benchmark_database, setup_django
+
+
+def run_mode(mode, bidders, total_bids):
+    """Places total_bids bids from the given number of threads and returns the counts"""
+    from django.contrib.auth.models import User
+    from django.db import OperationalError, connection
+    from django.test import override_settings
+    from django.utils import timezone
+    from rest_framework.test import APIRequestFactory, force_authenticate
+    from auction.models import Auction
+    from auction.views import EnterBidView
+
+    user = User.objects.create_user(username='bench-%s' % mode, password='pass')
+    now = timezone.now()
+    auction = Auction.objects.create(
+        title='Hot item', description='Benchmark', starting_price=Decimal('1.00'),
+        start_time=now - timedelta(hours=1), end_time=now + timedelta(hours=1), creator=user
+    )
+    factory = APIRequestFactory()
+    view = EnterBidView.as_view()
+    amounts = itertools.count(1)
+
+    def bid(_):
+        request = factory.post('/api/bid/', {'auction_id': auction.id, 'amount': str(next(amounts))}, format='json')
+        force_authenticate(request, user=user)
+        try:
+            return view(request).status_code
+        except OperationalError:
+            # e.g. "database is locked" once the busy timeout expires
+            return 500
+        finally:
+            connection.close()
+
+    with override_settings(BID_GROUP_COMMIT={'ENABLED': mode == 'group'}):
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=bidders) as executor:
+            codes = list(executor.map(bid, range(total_bids)))
+        elapsed = time.perf_counter() - started
+    return {
+        'mode': mode,
+        'accepted': codes.count(200),
+        'rejected': codes.count(400),
+        'errors': len(codes) - codes.count(200) - codes.count(400),
+        'seconds': elapsed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--bidders', type=int, default=64, help='Concurrent bidding threads')
+    parser.add_argument('--bids', type=int, default=2000, help='Bids placed per mode')
+    parser.add_argument('--mode', choices=['direct', 'group', 'both'], default='both')
+    args = parser.parse_args()
+
+    setup_django()
+    modes = ['direct', 'group'] if args.mode == 'both' else [args.mode]
+    with benchmark_database():
+        for mode in modes:
+            result = run_mode(mode, args.bidders, args.bids)
+            print('%-6s accepted %5d  rejected %5d  errors %3d  %7.2fs  %8.1f accepted bids/s  %8.1f decided bids/s' % (
+                result['mode'], result['accepted'], result['rejected'], result['errors'], result['seconds'],
+                result['accepted'] / result['seconds'], (result['accepted'] + result['rejected']) / result['seconds'],
+            ))
+
+
+if __name__ == '__main__':
+    main()
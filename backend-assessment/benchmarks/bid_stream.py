@@ -0,0 +1,88 @@
+"""Measures memory per idle bid stream subscriber and the cost of fanning out a bid
+
+Parks the given number of subscribers on one event loop, each in its own task
+waiting for events the way a stream response does, then publishes bids from
+another thread, as the bid views do, and times until every subscriber has the
+latest one.
+
+    python -m benchmarks.bid_stream --subscribers 20000 --bids 20
+"""
+
+import argparse
+import asyncio
+import threading
+import time
+import tracemalloc
+
+from benchmarks.common import setup_django
+
+
+async def run(subscribers, bids):
+    """Returns memory and fan-out figures for one auction with the given subscribers"""
+    from auction.events import broker, encode_event
+
+    auction_id = 1
+    payloads = [encode_event('bid', {'auction': auction_id, 'amount': '%d.00' % i}, i) for i in range(bids)]
+    finished = 0
+    done = asyncio.Event()
+
+    async def consume(subscriber):
+        # Queues coalesce under load, so a subscriber is done once it has the last bid
+        nonlocal finished
+        while (await subscriber.get())[-1] is not payloads[-1]:
+            pass
+        finished += 1
+        if finished == subscribers:
+            done.set()
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    parked = [broker.subscribe(auction_id) for _ in range(subscribers)]
+    tasks = [asyncio.create_task(consume(subscriber)) for subscriber in parked]
+    await asyncio.sleep(0)
+    per_subscriber = (tracemalloc.get_traced_memory()[0] - before) / subscribers
+    tracemalloc.stop()
+
+    publish_seconds = []
+
+    def publish():
+        for payload in payloads:
+            started = time.perf_counter()
+            broker.publish(auction_id, payload)
+            publish_seconds.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    thread = threading.Thread(target=publish)
+    thread.start()
+    await done.wait()
+    elapsed = time.perf_counter() - started
+    thread.join()
+
+    await asyncio.gather(*tasks)
+    for subscriber in parked:
+        broker.unsubscribe(subscriber)
+    return {
+        'bytes_per_subscriber': per_subscriber,
+        'publish_ms': max(publish_seconds) * 1000,
+        'fan_out_ms': elapsed * 1000,
+        'dropped': sum(subscriber.dropped for subscriber in parked),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--subscribers', type=int, default=20000, help='Idle streams on one auction')
+    parser.add_argument('--bids', type=int, default=20, help='Bids published to them')
+    args = parser.parse_args()
+
+    setup_django()
+    result = asyncio.run(run(args.subscribers, args.bids))
+    print('%d subscribers  %.0f bytes each (subscriber and task)  slowest publish %.2f ms  '
+          'all %d bids delivered in %.1f ms  %d coalesced away' % (
+        args.subscribers, result['bytes_per_subscriber'], result['publish_ms'], args.bids, result['fan_out_ms'],
+        result['dropped'],
+    ))
+
+
+if __name__ == '__main__':
+    main()
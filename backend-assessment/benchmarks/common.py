@@ -0,0 +1,41 @@
+"""Helpers shared by the benchmark modules"""
+
+import os
+from contextlib import contextmanager
+
+import django
+
+
+def setup_django():
+    """Configures Django for a standalone benchmark process"""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'simple_auction.settings')
+    django.setup()
+
+
+@contextmanager
+def benchmark_database():
+    """Creates and migrates a throwaway database, destroying it on exit"""
+    from django.db import connection, connections
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    setup_test_environment()
+    old_name = connection.settings_dict['NAME']
+    remove_wal_files(connection.settings_dict['TEST']['NAME'])
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        yield
+    finally:
+        connections.close_all()
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        remove_wal_files(connection.settings_dict['TEST']['NAME'])
+        teardown_test_environment()
+
+
+def remove_wal_files(name):
+    """Deletes the WAL files left by connections other threads never closed.
+
+    They must not be replayed into the next database created under that name.
+    """
+    for suffix in ('-wal', '-shm'):
+        if name and os.path.exists('%s%s' % (name, suffix)):
+            os.remove('%s%s' % (name, suffix))
@@ -0,0 +1,87 @@
+"""Measures auction reads polled with If-None-Match against full responses
+
+Seeds auctions that are all live, then times each polled read twice: without
+If-None-Match, as polling clients used to download it, and with the ETag of the
+previous response, answered with 304 while nothing changed. Covers the public
+live listing (served from the cache), one auction's detail and a page of the
+admin listing, reporting the median latency, the queries and the bytes sent.
+
+    python -m benchmarks.conditional --auctions 500 --repeat 200
+"""
+
+import argparse
+import statistics
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from benchmarks.common import benchmark_database, setup_django
+
+
+def seed(auctions):
+    """Creates live auctions with one bid each and returns the admin"""
+    from django.contrib.auth.models import User
+    from django.utils import timezone
+    from auction.bidding import place_bid
+    from auction.models import Auction
+
+    admin = User.objects.create_superuser(username='admin', password='pass')
+    bidder = User.objects.create_user(username='bidder', password='pass')
+    now = timezone.now()
+    created = Auction.objects.bulk_create([Auction(
+        title='Item %d' % i, description='Benchmark item with a description of a typical length ' * 3,
+        starting_price=Decimal('1.00'), start_time=now - timedelta(hours=1), end_time=now + timedelta(hours=1 + i),
+        creator=admin,
+    ) for i in range(auctions)])
+    for auction in created:
+        place_bid(auction.id, bidder, Decimal('5.00'))
+    return admin, created
+
+
+def measure(get, repeat):
+    """Returns the median milliseconds, queries and body bytes of get() over repeat calls"""
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        response = get()
+        timings.append(time.perf_counter() - started)
+    with CaptureQueriesContext(connection) as queries:
+        response = get()
+    return statistics.median(timings) * 1000, len(queries), len(response.content), response.status_code
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--auctions', type=int, default=500, help='Live auctions seeded')
+    parser.add_argument('--repeat', type=int, default=200, help='Requests per case')
+    args = parser.parse_args()
+
+    setup_django()
+    with benchmark_database():
+        from asgiref.sync import async_to_sync
+        from django.test import AsyncClient, Client
+        from rest_framework.test import APIClient
+
+        admin, auctions = seed(args.auctions)
+        client, async_client, admin_client = Client(), AsyncClient(), APIClient()
+        admin_client.force_authenticate(admin)
+        aget = async_to_sync(async_client.get)
+        reads = (
+            ('live listing', lambda **headers: client.get('/api/auctions/live/', headers=headers)),
+            ('auction detail', lambda **headers: aget('/api/async/auction/%d/' % auctions[0].id, headers=headers)),
+            ('admin page of 100', lambda **headers: admin_client.get('/api/admin/auction/', {'limit': 100}, headers=headers)),
+        )
+        print('%d live auctions' % args.auctions)
+        print('%-20s %-16s %10s %8s %10s' % ('read', 'request', 'median', 'queries', 'bytes'))
+        for name, get in reads:
+            etag = get()['ETag']
+            for label, headers in (('full', {}), ('If-None-Match', {'If-None-Match': etag})):
+                median, queries, size, status_code = measure(lambda: get(**headers), args.repeat)
+                print('%-20s %-16s %7.3f ms %8d %10d  (%d)' % (name, label, median, queries, size, status_code))
+
+
+if __name__ == '__main__':
+    main()
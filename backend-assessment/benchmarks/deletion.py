@@ -0,0 +1,92 @@
+"""Measures deleting an auction with many bids through the ORM against the chunked path
+
+Seeds two auctions with the same number of bids, interleaved in id order with
+each other as bids on concurrent auctions are. Deletes one with auction.delete()
+in a single write transaction, as the admin endpoint used to, and the other with
+delete_auctions(), reporting the total time, the longest time the write lock is
+held and the growth of the process's peak memory for each.
+
+    python -m benchmarks.deletion --bids 200000
+"""
+
+import argparse
+import resource
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from benchmarks.common import benchmark_database, setup_django
+
+INSERT_CHUNK = 10000
+
+
+def seed(bids):
+    """Creates two auctions with the given number of bids each and returns them"""
+    from django.contrib.auth.models import User
+    from django.utils import timezone
+    from auction.models import Auction, Bid
+
+    seller = User.objects.create_user(username='seller', password='pass')
+    bidder = User.objects.create_user(username='bidder', password='pass')
+    now = timezone.now()
+    auctions = [Auction.objects.create(
+        title='Item %d' % i, description='Benchmark item', starting_price=Decimal('1.00'),
+        start_time=now - timedelta(hours=1), end_time=now + timedelta(hours=1), creator=seller,
+    ) for i in range(2)]
+    for start in range(0, bids, INSERT_CHUNK):
+        Bid.objects.bulk_create([
+            Bid(auction=auction, bidder=bidder, amount=Decimal(i + 2))
+            for i in range(start, min(start + INSERT_CHUNK, bids)) for auction in auctions
+        ])
+    for auction in auctions:
+        auction.refresh_current_high()
+    return auctions
+
+
+def peak_mib():
+    """Returns the process's peak resident memory in MiB"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--bids', type=int, default=200000, help='Bids on each auction')
+    parser.add_argument('--chunk-size', type=int, default=1000, help='Bids deleted per transaction by the chunked path')
+    args = parser.parse_args()
+
+    setup_django()
+    with benchmark_database():
+        from auction.deletion import delete_auctions
+        from auction.sqlite import write_transaction
+
+        started = time.perf_counter()
+        orm_auction, chunked_auction = seed(args.bids)
+        print('seeded 2 auctions with %d bids each in %.1f s' % (args.bids, time.perf_counter() - started))
+
+        # Chunked first: the ORM path's peak memory would hide its growth
+        chunks = []
+        last = [time.perf_counter()]
+
+        def progress(rows):
+            now = time.perf_counter()
+            chunks.append(now - last[0])
+            last[0] = now
+
+        before, started = peak_mib(), time.perf_counter()
+        delete_auctions([chunked_auction.id], chunk_size=args.chunk_size, progress=progress)
+        elapsed = time.perf_counter() - started
+        print('chunked      total %7.2f s  longest chunk %8.1f ms  peak memory +%6.0f MiB' % (
+            elapsed, max(chunks) * 1000, peak_mib() - before,
+        ))
+
+        before, started = peak_mib(), time.perf_counter()
+        with write_transaction():
+            orm_auction.delete()
+        elapsed = time.perf_counter() - started
+        print('orm cascade  total %7.2f s  one transaction %6.1f ms  peak memory +%6.0f MiB' % (
+            elapsed, elapsed * 1000, peak_mib() - before,
+        ))
+
+
+if __name__ == '__main__':
+    main()
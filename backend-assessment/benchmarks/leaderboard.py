@@ -0,0 +1,112 @@
+"""Measures top-N bid reads from the in-memory leaderboard against sorting the bids in SQL
+
+Seeds auctions with the given number of bids each and times, per read of the
+top N bids: auction.bids ordered by Bid.Meta.ordering in SQL and serialized,
+the leaderboard rebuilding an evicted board, the leaderboard serving a resident
+board after reading the auction's version, and a whole GET /api/auction/<id>/bids/?top=N served from memory. Also
+times recording an accepted bid on a resident board.
+
+    python -m benchmarks.leaderboard --bids 100000 --top 10
+"""
+
+import argparse
+import statistics
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from benchmarks.common import benchmark_database, setup_django
+
+INSERT_CHUNK = 10000
+
+
+def seed(auctions, bids):
+    """Creates auctions with the given number of bids each, placed in increasing amounts, and returns them"""
+    from django.contrib.auth.models import User
+    from django.utils import timezone
+    from auction.models import Auction, Bid
+
+    seller = User.objects.create_user(username='seller', password='pass')
+    bidder = User.objects.create_user(username='bidder', password='pass')
+    now = timezone.now()
+    created = [Auction.objects.create(
+        title='Item %d' % i, description='Benchmark item', starting_price=Decimal('1.00'),
+        start_time=now - timedelta(hours=1), end_time=now + timedelta(hours=1), creator=seller,
+    ) for i in range(auctions)]
+    for auction in created:
+        for start in range(0, bids, INSERT_CHUNK):
+            Bid.objects.bulk_create([
+                Bid(auction=auction, bidder=bidder, amount=Decimal(i + 2))
+                for i in range(start, min(start + INSERT_CHUNK, bids))
+            ])
+        auction.refresh_current_high()
+    return created
+
+
+def timed(call, repeat):
+    """Returns the median milliseconds of call(i) over repeat calls"""
+    timings = []
+    for i in range(repeat):
+        started = time.perf_counter()
+        call(i)
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--auctions', type=int, default=5, help='Auctions seeded')
+    parser.add_argument('--bids', type=int, default=100000, help='Bids on each auction')
+    parser.add_argument('--top', type=int, default=10, help='Bids per read')
+    parser.add_argument('--repeat', type=int, default=200, help='Reads per case')
+    args = parser.parse_args()
+
+    setup_django()
+    with benchmark_database():
+        from django.test import Client
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from auction.leaderboard import Leaderboards, get_leaderboards
+        from auction.models import Bid
+        from auction.read_serializers import bid_reader
+
+        started = time.perf_counter()
+        auctions = seed(args.auctions, args.bids)
+        print('seeded %d auctions with %d bids each in %.1f s' % (args.auctions, args.bids, time.perf_counter() - started))
+        ids = [auction.id for auction in auctions]
+        top = args.top
+
+        def sql(i):
+            return bid_reader.encode_instances(auctions[i % len(auctions)].bids.all()[:top])
+
+        def rebuild(i):
+            # One resident board: every read evicts the previous auction's
+            return evicting.top(ids[i % len(ids)], top)
+
+        evicting = Leaderboards(max_auctions=1)
+        resident = Leaderboards()
+        client = Client()
+        for auction_id in ids:
+            resident.top(auction_id, top)
+            get_leaderboards().top(auction_id, top)
+        with CaptureQueriesContext(connection) as queries:
+            client.get('/api/auction/%d/bids/' % ids[0], {'top': top})
+        bid = Bid(id=10 ** 9, auction_id=ids[0], bidder_id=auctions[0].creator_id, amount=Decimal(10 ** 7))
+        bid.timestamp = auctions[0].start_time
+        # At the board's own version, so every call takes the insert path
+        bid.auction_version = resident.boards[ids[0]].version
+
+        cases = (
+            ('sql order by -amount', sql),
+            ('leaderboard, rebuild', rebuild),
+            ('leaderboard, resident', lambda i: resident.top(ids[i % len(ids)], top)),
+            ('endpoint, resident', lambda i: client.get('/api/auction/%d/bids/' % ids[i % len(ids)], {'top': top})),
+            ('record accepted bid', lambda i: resident.record_bids([bid])),
+        )
+        print('top %d of %d bids, endpoint queries when resident: %d' % (top, args.bids, len(queries)))
+        for name, call in cases:
+            print('%-24s %9.3f ms' % (name, timed(call, args.repeat)))
+
+
+if __name__ == '__main__':
+    main()
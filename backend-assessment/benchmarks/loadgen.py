@@ -0,0 +1,236 @@
+"""Load generation against the Django app, in process or over HTTP
+
+Every runner takes ``make_request(i)`` returning ``(method, path, headers, body)``
+for the i-th request and returns the per-request latencies and status codes, which
+summarize() turns into throughput and latency percentiles. QueryCounter counts the
+queries the app runs meanwhile in this process.
+"""
+
+import asyncio
+import json
+import math
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+
+class RunResult:
+    """Latencies (seconds) and status codes of one load run"""
+
+    def __init__(self):
+        self.latencies = []
+        self.statuses = Counter()
+        self.seconds = 0.0
+        self.extra = {}
+
+    def record(self, started, status_code):
+        self.latencies.append(time.perf_counter() - started)
+        self.statuses[status_code] += 1
+
+
+def percentile(sorted_values, fraction):
+    """Returns the nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[max(math.ceil(fraction * len(sorted_values)) - 1, 0)]
+
+
+def summarize(result):
+    """Returns throughput and latency percentiles (milliseconds) of a run as a dict"""
+    latencies = sorted(result.latencies)
+    summary = {
+        'requests': len(latencies),
+        'seconds': round(result.seconds, 3),
+        'rps': round(len(latencies) / result.seconds, 1) if result.seconds else 0.0,
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+        'statuses': {str(code): count for code, count in sorted(result.statuses.items(), key=lambda item: str(item[0]))},
+    }
+    summary.update(result.extra)
+    return summary
+
+
+class QueryCounter:
+    """Counts the database queries run by requests handled in this process while active.
+
+    Django sends request_started on the thread that runs the view's database work
+    (also under ASGI), so the counter is installed on that thread's connection then.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.lock = threading.Lock()
+        self.installed = []
+
+    def __call__(self, execute, sql, params, many, context):
+        with self.lock:
+            self.count += 1
+        return execute(sql, params, many, context)
+
+    def install(self, **kwargs):
+        from django.db import connection
+        if self not in connection.execute_wrappers:
+            connection.execute_wrappers.append(self)
+            self.installed.append(connection.execute_wrappers)
+
+    def __enter__(self):
+        from django.core.signals import request_started
+        request_started.connect(self.install)
+        return self
+
+    def __exit__(self, *exc_info):
+        from django.core.signals import request_started
+        request_started.disconnect(self.install)
+        for wrappers in self.installed:
+            if self in wrappers:
+                wrappers.remove(self)
+        self.installed.clear()
+
+
+def _counter(total):
+    """Returns a thread-safe function handing out request numbers until total is reached"""
+    lock = threading.Lock()
+    state = {'next': 0}
+
+    def take():
+        with lock:
+            if state['next'] >= total:
+                return None
+            state['next'] += 1
+            return state['next'] - 1
+    return take
+
+
+def run_wsgi_in_process(make_request, concurrency, total):
+    """Drives the WSGI handler with django.test.Client from a pool of threads"""
+    from django.db import connection
+    from django.test import Client
+
+    result = RunResult()
+    take = _counter(total)
+
+    def worker():
+        client = Client(raise_request_exception=False)
+        try:
+            while (i := take()) is not None:
+                method, path, headers, body = make_request(i)
+                started = time.perf_counter()
+                response = client.generic(method, path, body or b'', content_type='application/json', headers=headers)
+                result.record(started, response.status_code)
+        finally:
+            connection.close()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for future in [executor.submit(worker) for _ in range(concurrency)]:
+            future.result()
+    result.seconds = time.perf_counter() - started
+    return result
+
+
+def run_asgi_in_process(make_request, concurrency, total):
+    """Drives the ASGI handler with django.test.AsyncClient from concurrent tasks"""
+    from django.test import AsyncClient
+
+    result = RunResult()
+    take = _counter(total)
+
+    async def worker():
+        client = AsyncClient(raise_request_exception=False)
+        while (i := take()) is not None:
+            method, path, headers, body = make_request(i)
+            started = time.perf_counter()
+            response = await client.generic(method, path, body or b'', content_type='application/json', headers=headers)
+            result.record(started, response.status_code)
+
+    async def main():
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        result.seconds = time.perf_counter() - started
+
+    asyncio.run(main())
+    return result
+
+
+class HTTPConnection:
+    """Keep-alive HTTP/1.1 connection speaking just enough of the protocol for benchmarking"""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = self.writer = None
+
+    async def request(self, method, path, headers=None, body=None):
+        """Sends one request and returns (status, body)"""
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        body = body or b''
+        lines = ['%s %s HTTP/1.1' % (method, path), 'Host: %s:%d' % (self.host, self.port),
+                 'Content-Length: %d' % len(body), 'Content-Type: application/json']
+        lines.extend('%s: %s' % item for item in (headers or {}).items())
+        self.writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode() + body)
+        await self.writer.drain()
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionError('Connection closed by server')
+        status_code = int(status_line.split()[1])
+        response_headers = {}
+        while (line := await self.reader.readline()) not in (b'\r\n', b'\n', b''):
+            name, _, value = line.decode('latin-1').partition(':')
+            response_headers[name.strip().lower()] = value.strip()
+        if response_headers.get('transfer-encoding') == 'chunked':
+            chunks = []
+            while (size := int((await self.reader.readline()).strip() or b'0', 16)):
+                chunks.append(await self.reader.readexactly(size))
+                await self.reader.readline()
+            await self.reader.readline()
+            payload = b''.join(chunks)
+        else:
+            payload = await self.reader.readexactly(int(response_headers.get('content-length', 0)))
+        if response_headers.get('connection') == 'close':
+            self.close()
+        return status_code, payload
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+
+def run_http(base_url, make_request, concurrency, total):
+    """Drives a running server over keep-alive HTTP connections, one per concurrent client"""
+    parts = urlsplit(base_url)
+    host, port = parts.hostname, parts.port or 80
+    prefix = parts.path.rstrip('/')
+    result = RunResult()
+    take = _counter(total)
+
+    async def worker():
+        connection = HTTPConnection(host, port)
+        while (i := take()) is not None:
+            method, path, headers, body = make_request(i)
+            started = time.perf_counter()
+            try:
+                status_code, _ = await connection.request(method, prefix + path, headers, body)
+            except (ConnectionError, OSError, asyncio.IncompleteReadError):
+                connection.close()
+                status_code = 'error'
+            result.record(started, status_code)
+        connection.close()
+
+    async def main():
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        result.seconds = time.perf_counter() - started
+
+    asyncio.run(main())
+    return result
+
+
+def json_body(data):
+    """Encodes a request payload"""
+    return json.dumps(data).encode()
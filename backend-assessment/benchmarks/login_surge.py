@@ -0,0 +1,100 @@
+"""Measures bid latency while a burst of logins hashes passwords
+
+A few threads place bids back to back through EnterBidView while many others
+log in through LoginView, once with no logins, once hashing on the request
+threads (PASSWORD_HASHING['ENABLED'] off) and once on the bounded pool.
+
+    python -m benchmarks.login_surge --bidders 4 --logins 32 --seconds 10
+"""
+
+import argparse
+import itertools
+import threading
+import time
+from collections import Counter
+from datetime import timedelta
+from decimal import Decimal
+
+from benchmarks.common import benchmark_database, setup_django
+from benchmarks.loadgen import percentile
+
+
+def run_mode(mode, bidders, logins, seconds):
+    """Runs bidders and login threads for the given time and returns bid latencies and login outcomes"""
+    from django.conf import settings
+    from django.contrib.auth.models import User
+    from django.db import OperationalError, connection
+    from django.test import override_settings
+    from django.utils import timezone
+    from rest_framework.test import APIRequestFactory, force_authenticate
+    from auction.hashers import reset_pool
+    from auction.models import Auction
+    from auction.views import EnterBidView, LoginView
+
+    bidder = User.objects.create_user(username='bidder-%s' % mode, password='pass')
+    now = timezone.now()
+    auctions = [Auction.objects.create(
+        title='Item %d' % i, description='Benchmark', starting_price=Decimal('1.00'),
+        start_time=now - timedelta(hours=1), end_time=now + timedelta(hours=1), creator=bidder
+    ) for i in range(bidders)]
+    factory = APIRequestFactory()
+    bid_view, login_view = EnterBidView.as_view(), LoginView.as_view()
+    deadline = time.monotonic() + seconds
+    latencies, outcomes = [], Counter()
+
+    def bid(auction):
+        try:
+            for amount in itertools.count(1):
+                if time.monotonic() > deadline:
+                    return
+                request = factory.post('/api/bid/', {'auction_id': auction.id, 'amount': str(amount)}, format='json')
+                force_authenticate(request, user=bidder)
+                started = time.perf_counter()
+                try:
+                    bid_view(request)
+                except OperationalError:
+                    pass
+                latencies.append(time.perf_counter() - started)
+        finally:
+            connection.close()
+
+    def login():
+        try:
+            while time.monotonic() < deadline:
+                request = factory.post('/api/login/', {'username': bidder.username, 'password': 'pass'}, format='json')
+                outcomes[login_view(request).status_code] += 1
+        finally:
+            connection.close()
+
+    hashing = dict(settings.PASSWORD_HASHING, ENABLED=mode != 'inline')
+    with override_settings(PASSWORD_HASHING=hashing):
+        reset_pool()
+        threads = [threading.Thread(target=bid, args=(auction,)) for auction in auctions]
+        threads += [threading.Thread(target=login) for _ in range(logins if mode != 'idle' else 0)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        reset_pool()
+    return sorted(latencies), outcomes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--bidders', type=int, default=4, help='Threads placing bids')
+    parser.add_argument('--logins', type=int, default=32, help='Threads logging in')
+    parser.add_argument('--seconds', type=float, default=10, help='Duration of each mode')
+    args = parser.parse_args()
+
+    setup_django()
+    with benchmark_database():
+        for mode in ('idle', 'inline', 'pooled'):
+            latencies, outcomes = run_mode(mode, args.bidders, args.logins, args.seconds)
+            print('%-6s bids %6d  p50 %7.2f ms  p99 %8.2f ms  logins %s' % (
+                mode, len(latencies), percentile(latencies, 0.50) * 1000, percentile(latencies, 0.99) * 1000,
+                dict(sorted(outcomes.items())),
+            ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""Measures rows per second of the model serializers against the precompiled read serializers
+
+Seeds auctions with one bid each, then for every row count renders the first
+rows of each table to JSON both ways: ModelSerializer(many=True) over model
+instances, and the RowSerializer over .values_list() rows. Both timings include
+the query. The bodies are compared byte for byte before timing.
+
+    python -m benchmarks.read_serializers --rows 10000 100000 --repeat 3
+"""
+
+import argparse
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from benchmarks.common import benchmark_database, setup_django
+
+INSERT_CHUNK = 10000
+
+
+def seed(rows):
+    """Bulk inserts the given number of auctions, half of them with a high bid"""
+    from django.contrib.auth.models import User
+    from django.utils import timezone
+    from auction.models import Auction, Bid
+
+    seller = User.objects.create_user(username='seller', password='pass')
+    bidder = User.objects.create_user(username='bidder', password='pass')
+    now = timezone.now()
+    for start in range(0, rows, INSERT_CHUNK):
+        auctions = Auction.objects.bulk_create([Auction(
+            title='Item %d' % i, description='Benchmark item %d' % i, starting_price=Decimal('%d.%02d' % (i % 1000, i % 100)),
+            start_time=now - timedelta(hours=1), end_time=now + timedelta(seconds=i), creator=seller,
+        ) for i in range(start, min(start + INSERT_CHUNK, rows))])
+        Bid.objects.bulk_create([Bid(
+            auction=auction, bidder=bidder, amount=auction.starting_price + 1,
+        ) for auction in auctions])
+    Auction.objects.filter(id__in=Bid.objects.filter(id__lte=rows // 2).values('auction_id')).update(
+        current_high_amount=Decimal('1000.00'), bid_count=1,
+    )
+
+
+def measure(render, repeat):
+    """Returns the best time of render() over repeat runs and its output"""
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        body = render()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, body
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000], help='Row counts to serialize')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per measurement, the best one is kept')
+    args = parser.parse_args()
+
+    setup_django()
+    with benchmark_database():
+        from rest_framework.renderers import JSONRenderer
+        from auction.models import Auction, Bid
+        from auction.read_serializers import auction_reader, bid_reader
+        from auction.serializers import AuctionSerializer, BidSerializer
+
+        seed(max(args.rows))
+        renderer = JSONRenderer()
+        for rows in args.rows:
+            for name, model, serializer_class, reader in (
+                ('auctions', Auction, AuctionSerializer, auction_reader), ('bids', Bid, BidSerializer, bid_reader),
+            ):
+                queryset = model.objects.order_by('id')[:rows]
+                before, expected = measure(lambda: renderer.render(serializer_class(queryset.all(), many=True).data), args.repeat)
+                after, body = measure(lambda: renderer.render(reader.serialize(queryset)), args.repeat)
+                assert body == expected, 'read serializer output differs for %s' % name
+                print('%-8s %7d rows  serializer %9.0f rows/s  precompiled %9.0f rows/s  %.1fx' % (
+                    name, rows, rows / before, rows / after, before / after,
+                ))
+
+
+if __name__ == '__main__':
+    main()
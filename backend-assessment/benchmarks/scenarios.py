@@ -0,0 +1,125 @@
+"""Load scenarios of the benchmark suite
+
+Each scenario seeds the benchmark database and returns ``make_request(i)`` for
+the runners in benchmarks/loadgen.py. Setup runs again before every target, so
+each target starts from the same state; the tag keeps its rows apart.
+"""
+
+import itertools
+from datetime import timedelta
+from decimal import Decimal
+
+from benchmarks.loadgen import json_body
+
+PASSWORD = 'bench-pass'
+INSERT_CHUNK = 10000
+
+
+class Scenario:
+    """Named setup function with the number of requests it runs by default"""
+
+    def __init__(self, setup, requests):
+        self.setup = setup
+        self.requests = requests
+        self.description = setup.__doc__
+
+
+def create_users(prefix, count, **fields):
+    """Bulk inserts users sharing one password hash and returns them"""
+    from django.contrib.auth.hashers import make_password
+    from django.contrib.auth.models import User
+
+    password = make_password(PASSWORD)
+    User.objects.bulk_create([
+        User(username='%s-%d' % (prefix, i), password=password, **fields) for i in range(count)
+    ], batch_size=INSERT_CHUNK)
+    return list(User.objects.filter(username__startswith=prefix + '-').order_by('id'))
+
+
+def bearer(user):
+    """Returns the Authorization header of an access token for the user"""
+    from auction.authentication import ClaimsRefreshToken
+    return {'Authorization': 'Bearer ' + str(ClaimsRefreshToken.for_user(user).access_token)}
+
+
+def create_auctions(creator, count, hours=2):
+    """Bulk inserts active auctions and returns their ids in order"""
+    from django.utils import timezone
+    from auction.models import Auction
+
+    now = timezone.now()
+    ids = []
+    for start in range(0, count, INSERT_CHUNK):
+        auctions = Auction.objects.bulk_create([
+            Auction(title='Item %d' % i, description='Benchmark item', starting_price=Decimal('1.00'),
+                    start_time=now - timedelta(hours=1), end_time=now + timedelta(hours=hours, seconds=i), creator=creator)
+            for i in range(start, min(start + INSERT_CHUNK, count))
+        ])
+        ids.extend(auction.id for auction in auctions)
+    return ids
+
+
+def signup_storm(tag, options):
+    """POST /api/signup/ with a new username per request"""
+    return lambda i: ('POST', '/api/signup/', {}, json_body({'username': '%s-new-%d' % (tag, i), 'password': PASSWORD}))
+
+
+def login_storm(tag, options):
+    """POST /api/login/ cycling through one user per concurrent client"""
+    users = create_users('%s-login' % tag, options.concurrency)
+    bodies = [json_body({'username': user.username, 'password': PASSWORD}) for user in users]
+    return lambda i: ('POST', '/api/login/', {}, bodies[i % len(bodies)])
+
+
+def hot_auction(tag, options):
+    """POST /api/bid/ on one auction from one bidder per concurrent client, each bid one unit higher"""
+    seller, *bidders = create_users('%s-hot' % tag, options.concurrency + 1)
+    auction_id, = create_auctions(seller, 1)
+    headers = [bearer(bidder) for bidder in bidders]
+    amounts = itertools.count(2)
+    return lambda i: ('POST', '/api/bid/', headers[i % len(headers)], json_body({
+        'auction_id': auction_id, 'amount': str(next(amounts)),
+    }))
+
+
+def cold_auctions(tag, options):
+    """POST /api/bid/ spread round robin over many auctions with little contention each"""
+    seller, *bidders = create_users('%s-cold' % tag, options.concurrency + 1)
+    auction_ids = create_auctions(seller, options.auctions)
+    headers = [bearer(bidder) for bidder in bidders]
+    return lambda i: ('POST', '/api/bid/', headers[i % len(headers)], json_body({
+        'auction_id': auction_ids[i % len(auction_ids)], 'amount': str(i // len(auction_ids) + 2),
+    }))
+
+
+def admin_listing(tag, options):
+    """GET /api/admin/auction/ pages spread over a large table, following real cursors"""
+    from django.contrib.auth.models import User
+    from auction.models import Auction
+    from auction.pagination import paginate
+
+    seller, _ = User.objects.get_or_create(username='listing-seller')
+    missing = options.listing_rows - Auction.objects.filter(creator=seller).count()
+    if missing > 0:
+        create_auctions(seller, missing)
+    admin, = create_users('%s-admin' % tag, 1, is_staff=True, is_superuser=True)
+    headers = bearer(admin)
+    # Walk the listing once to collect every page's cursor
+    queryset = Auction.objects.values_list('end_time', 'id', named=True)
+    cursors, cursor = [''], None
+    while True:
+        _, cursor = paginate(queryset, cursor, options.page_size)
+        if cursor is None:
+            break
+        cursors.append('&cursor=' + cursor)
+    path = '/api/admin/auction/?limit=%d' % options.page_size
+    return lambda i: ('GET', path + cursors[i % len(cursors)], headers, None)
+
+
+SCENARIOS = {
+    'signup': Scenario(signup_storm, requests=200),
+    'login': Scenario(login_storm, requests=200),
+    'hot_auction': Scenario(hot_auction, requests=2000),
+    'cold_auctions': Scenario(cold_auctions, requests=2000),
+    'admin_listing': Scenario(admin_listing, requests=500),
+}
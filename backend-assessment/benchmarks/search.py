@@ -0,0 +1,106 @@
+"""Measures full-text auction search latency against a LIKE scan
+
+Seeds auctions whose titles and descriptions draw words from a skewed
+vocabulary (a few very common words, many rare ones), through the triggers that
+maintain the FTS5 index. Then, for queries of rare, common and prefixed words
+with and without filters, times the first page of search() and of a naive
+title__icontains | description__icontains filter on the query's last word.
+
+    python -m benchmarks.search --rows 1000000 --repeat 20
+"""
+
+import argparse
+import random
+import statistics
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from benchmarks.common import benchmark_database, setup_django
+
+INSERT_CHUNK = 10000
+COMMON_WORDS = ['vintage', 'camera', 'lamp', 'chair', 'watch', 'guitar', 'table', 'bike', 'print', 'ring']
+RARE_WORDS = ['word%05d' % i for i in range(20000)]
+
+QUERIES = (
+    ('rare word', {'query': 'word00420'}),
+    ('common word', {'query': 'vintage'}),
+    ('two common words', {'query': 'vintage camera'}),
+    ('prefix', {'query': 'word004*'}),
+    ('common, active', {'query': 'camera', 'active': True}),
+    ('common, price range', {'query': 'lamp', 'min_price': Decimal('100'), 'max_price': Decimal('200')}),
+)
+
+
+def words(rng, count):
+    """Returns count words, each common one time in four and otherwise drawn from the long tail"""
+    return ' '.join(
+        rng.choice(COMMON_WORDS) if rng.random() < 0.25 else RARE_WORDS[int(rng.paretovariate(1.2)) % len(RARE_WORDS)]
+        for _ in range(count)
+    )
+
+
+def seed(rows):
+    """Bulk inserts the given number of auctions, half of them still open"""
+    from django.contrib.auth.models import User
+    from django.utils import timezone
+    from auction.models import Auction
+
+    rng = random.Random(42)
+    seller = User.objects.create_user(username='seller', password='pass')
+    now = timezone.now()
+    for start in range(0, rows, INSERT_CHUNK):
+        Auction.objects.bulk_create([Auction(
+            title=words(rng, 3), description=words(rng, 12), starting_price=Decimal(i % 1000),
+            start_time=now - timedelta(hours=1), end_time=now + timedelta(hours=1 if i % 2 else -0.5), creator=seller,
+        ) for i in range(start, min(start + INSERT_CHUNK, rows))])
+
+
+def measure(run, repeat):
+    """Returns the median and worst time of run() in milliseconds"""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings), max(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1000000, help='Auctions to seed')
+    parser.add_argument('--repeat', type=int, default=20, help='Runs per query')
+    parser.add_argument('--limit', type=int, default=20, help='Page size')
+    parser.add_argument('--scan-repeat', type=int, default=3, help='Runs per query of the LIKE scan')
+    args = parser.parse_args()
+
+    setup_django()
+    with benchmark_database():
+        from django.db.models import Q
+        from auction.models import Auction
+        from auction.search import filter_auctions, rebuild_index, search
+
+        started = time.perf_counter()
+        seed(args.rows)
+        print('seeded %d auctions through the index triggers in %.1f s' % (args.rows, time.perf_counter() - started))
+        started = time.perf_counter()
+        rebuild_index()
+        print('rebuilt and optimized the index in %.1f s' % (time.perf_counter() - started))
+
+        for name, params in QUERIES:
+            params = dict(params)
+            query = params.pop('query')
+            matches = len(search(query, limit=args.limit, **params)[0])
+            median, worst = measure(lambda: search(query, limit=args.limit, **params), args.repeat)
+            last = query.split()[-1].rstrip('*')
+            scan = filter_auctions(Auction.objects.all(), **params).filter(
+                Q(title__icontains=last) | Q(description__icontains=last)
+            ).order_by('id')
+            scan_median, scan_worst = measure(lambda: list(scan[:args.limit]), args.scan_repeat)
+            print('%-20s %3d results  fts5 median %7.2f ms  max %7.2f ms  like scan median %8.2f ms' % (
+                name, matches, median, worst, scan_median,
+            ))
+
+
+if __name__ == '__main__':
+    main()
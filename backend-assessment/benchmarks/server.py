@@ -0,0 +1,96 @@
+"""Serves the app over HTTP from a separate process for the benchmark suite
+
+Runs Django's threaded WSGI server against the given database file without
+migrating it, and answers GET /__benchmark__/queries with the number of
+queries its requests have run so far. local_server() starts one on a free port.
+
+    python -m benchmarks.server --database test_db.sqlite3 --port 8765
+"""
+
+import argparse
+import contextlib
+import json
+import logging
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from benchmarks.common import setup_django
+from benchmarks.loadgen import QueryCounter
+
+QUERIES_PATH = '/__benchmark__/queries'
+STARTUP_TIMEOUT = 30
+
+
+def counting_application(application, counter):
+    """Wraps a WSGI application to expose the query counter"""
+    def wrapper(environ, start_response):
+        if environ['PATH_INFO'] == QUERIES_PATH:
+            body = json.dumps({'queries': counter.count}).encode()
+            start_response('200 OK', [('Content-Type', 'application/json'), ('Content-Length', str(len(body)))])
+            return [body]
+        return application(environ, start_response)
+    return wrapper
+
+
+@contextlib.contextmanager
+def local_server(database, hash_iterations=None, rate_limits=False):
+    """Starts a server process on a free local port and yields its base URL"""
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        port = probe.getsockname()[1]
+    command = [sys.executable, '-m', 'benchmarks.server', '--database', str(database), '--port', str(port)]
+    if hash_iterations:
+        command += ['--hash-iterations', str(hash_iterations)]
+    if rate_limits:
+        command.append('--rate-limits')
+    process = subprocess.Popen(command, cwd=Path(__file__).resolve().parent.parent)
+    try:
+        deadline = time.monotonic() + STARTUP_TIMEOUT
+        while True:
+            try:
+                socket.create_connection(('127.0.0.1', port), timeout=1).close()
+                break
+            except OSError:
+                if process.poll() is not None or time.monotonic() > deadline:
+                    raise RuntimeError('benchmark server did not start')
+                time.sleep(0.1)
+        yield 'http://127.0.0.1:%d' % port
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database', required=True, help='SQLite file of an already migrated database')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--hash-iterations', type=int, help='Override PASSWORD_HASHING ITERATIONS')
+    parser.add_argument('--rate-limits', action='store_true', help='Keep RATE_LIMITS on')
+    args = parser.parse_args()
+
+    setup_django()
+    from django.conf import settings
+    from django.core.servers.basehttp import run
+    from django.core.wsgi import get_wsgi_application
+    from django.db import connection
+
+    settings.DATABASES['default']['NAME'] = args.database
+    connection.settings_dict['NAME'] = args.database
+    if args.hash_iterations:
+        settings.PASSWORD_HASHING = dict(settings.PASSWORD_HASHING, ITERATIONS=args.hash_iterations)
+    if not args.rate_limits:
+        settings.RATE_LIMITS = dict(settings.RATE_LIMITS, ENABLED=False)
+    application = get_wsgi_application()
+    # One log line per request would slow the server down
+    logging.getLogger('django.server').setLevel(logging.CRITICAL)
+    logging.getLogger('django.request').setLevel(logging.CRITICAL)
+
+    with QueryCounter() as counter:
+        run('127.0.0.1', args.port, counting_application(application, counter), threading=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+"""Runs the API load scenarios against the app and saves the results as JSON
+
+Scenarios (benchmarks/scenarios.py): signup and login storms, a single hot
+auction bid on by one user per concurrent client, bids spread over many cold
+auctions, and admin listing pages over a large table. Targets:
+
+    wsgi    the WSGI handler in process, driven by django.test.Client threads
+    asgi    the ASGI handler in process, driven by AsyncClient tasks
+    server  a separate process serving the app over HTTP (benchmarks/server.py)
+
+Every (scenario, target) pair reports throughput, p50/p95/p99 latency, the
+response status counts and the database queries per request. In-process numbers
+share one GIL between clients and app, so compare them with each other and use
+the server target for absolute figures. --output writes the results to a JSON
+file, --compare prints the change against an earlier one. PBKDF2 at its
+production cost makes the storms slow; --hash-iterations lowers it. Every client
+comes from one address, so RATE_LIMITS would turn most requests away with 429:
+they are off unless --rate-limits, and each target starts from empty buckets.
+
+    python -m benchmarks.suite --scenarios login hot_auction --targets wsgi server \\
+        --concurrency 32 --hash-iterations 20000 --output results.json
+"""
+
+import argparse
+import contextlib
+import json
+import logging
+import platform
+import urllib.request
+from datetime import datetime, timezone
+
+import django
+
+from benchmarks.common import benchmark_database, setup_django
+from benchmarks.loadgen import QueryCounter, run_asgi_in_process, run_http, run_wsgi_in_process, summarize
+from benchmarks.scenarios import SCENARIOS
+from benchmarks.server import QUERIES_PATH, local_server
+
+TARGETS = ('wsgi', 'asgi', 'server')
+
+
+def server_queries(url):
+    """Returns the number of queries the benchmark server has run so far"""
+    with urllib.request.urlopen(url + QUERIES_PATH) as response:
+        return json.load(response)['queries']
+
+
+def run_target(target, make_request, concurrency, total, url=None):
+    """Runs one scenario against one target and returns its summary"""
+    if target == 'server':
+        before = server_queries(url)
+        result = run_http(url, make_request, concurrency, total)
+        queries = server_queries(url) - before
+    else:
+        run = run_wsgi_in_process if target == 'wsgi' else run_asgi_in_process
+        with QueryCounter() as counter:
+            result = run(make_request, concurrency, total)
+        queries = counter.count
+    summary = summarize(result)
+    summary['queries_per_request'] = round(queries / total, 2) if total else 0.0
+    return summary
+
+
+def compare(results, baseline_path):
+    """Prints throughput and p95 changes against the results of an earlier run"""
+    with open(baseline_path) as baseline_file:
+        baseline = {(row['scenario'], row['target']): row for row in json.load(baseline_file)['results']}
+    for row in results:
+        old = baseline.get((row['scenario'], row['target']))
+        if old is None:
+            continue
+        print('%-13s %-6s rps %+7.1f%%  p95 %+7.1f%%  queries/req %+.2f' % (
+            row['scenario'], row['target'],
+            (row['rps'] / old['rps'] - 1) * 100 if old['rps'] else 0.0,
+            (row['p95_ms'] / old['p95_ms'] - 1) * 100 if old['p95_ms'] else 0.0,
+            row['queries_per_request'] - old['queries_per_request'],
+        ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scenarios', nargs='+', choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument('--targets', nargs='+', choices=TARGETS, default=list(TARGETS))
+    parser.add_argument('--concurrency', type=int, default=32, help='Concurrent clients (and bidders or login users)')
+    parser.add_argument('--requests', type=int, help='Requests per scenario and target (default per scenario)')
+    parser.add_argument('--auctions', type=int, default=1000, help='Auctions of the cold_auctions scenario')
+    parser.add_argument('--listing-rows', type=int, default=100000, help='Auctions of the admin_listing scenario')
+    parser.add_argument('--page-size', type=int, default=100, help='Page size of the admin_listing scenario')
+    parser.add_argument('--hash-iterations', type=int, help='Override PASSWORD_HASHING ITERATIONS')
+    parser.add_argument('--rate-limits', action='store_true', help='Keep RATE_LIMITS on, measuring the 429 path')
+    parser.add_argument('--output', help='Write the results to this JSON file')
+    parser.add_argument('--compare', help='Results file of an earlier run to compare with')
+    args = parser.parse_args()
+
+    setup_django()
+    from django.conf import settings
+    from django.db import connection
+    from django.test import override_settings
+    from auction.throttling import reset_limiter
+
+    # Rejected bids and shed logins are expected and would flood the output
+    logging.getLogger('django.request').setLevel(logging.CRITICAL)
+    hashing = dict(settings.PASSWORD_HASHING)
+    if args.hash_iterations:
+        hashing['ITERATIONS'] = args.hash_iterations
+    rate_limits = settings.RATE_LIMITS if args.rate_limits else dict(settings.RATE_LIMITS, ENABLED=False)
+
+    started_at = datetime.now(timezone.utc).isoformat()
+    results = []
+    with benchmark_database(), override_settings(PASSWORD_HASHING=hashing, RATE_LIMITS=rate_limits):
+        database = connection.settings_dict['NAME']
+        server = local_server(database, args.hash_iterations, args.rate_limits) if 'server' in args.targets else None
+        with server or contextlib.nullcontext() as url:
+            for name in args.scenarios:
+                scenario = SCENARIOS[name]
+                total = args.requests or scenario.requests
+                for target in args.targets:
+                    make_request = scenario.setup('%s-%s' % (target, name), args)
+                    # Buckets drained by the previous target must not carry over
+                    reset_limiter()
+                    summary = run_target(target, make_request, args.concurrency, total, url)
+                    results.append(dict(scenario=name, target=target, **summary))
+                    print('%-13s %-6s %8.1f req/s  p50 %8.2f ms  p95 %8.2f ms  p99 %8.2f ms  %6.2f queries/req  %s' % (
+                        name, target, summary['rps'], summary['p50_ms'], summary['p95_ms'], summary['p99_ms'],
+                        summary['queries_per_request'], json.dumps(summary['statuses']),
+                    ))
+
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump({
+                'started_at': started_at,
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'options': vars(args),
+                'results': results,
+            }, output, indent=2)
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""Measures the per-request cost of the token bucket rate limits
+
+Times TokenBucketThrottle.allow_request() on a bid request, the check DRF runs
+before the view: with one hot client that stays under its limits, with a flood
+from one client that is turned away, and with requests from many distinct
+clients overflowing the bucket LRU (MAX_KEYS is set to a quarter of their
+buckets). Each case runs with local buckets and with
+SHARED counting in the configured cache.
+
+    python -m benchmarks.throttling --requests 200000 --clients 20000
+"""
+
+import argparse
+import time
+
+from benchmarks.common import setup_django
+
+
+def measure(check, requests):
+    """Returns the mean microseconds per check(i) over the given number of requests"""
+    started = time.perf_counter()
+    for i in range(requests):
+        check(i)
+    return (time.perf_counter() - started) / requests * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=200000, help='Checks per case')
+    parser.add_argument('--clients', type=int, default=20000, help='Distinct clients of the churn case')
+    args = parser.parse_args()
+
+    setup_django()
+    from django.contrib.auth.models import AnonymousUser
+    from django.test import override_settings
+    from rest_framework.parsers import JSONParser
+    from rest_framework.request import Request
+    from rest_framework.test import APIRequestFactory
+    from auction.throttling import TokenBucketThrottle, reset_limiter
+    from auction.views import EnterBidView
+
+    factory = APIRequestFactory()
+    view = EnterBidView()
+    throttle = TokenBucketThrottle()
+
+    def request(ip, auction_id):
+        drf_request = Request(factory.post('/api/bid/', {'auction_id': auction_id, 'amount': '10'}, format='json', REMOTE_ADDR=ip), parsers=[JSONParser()])
+        drf_request.user = AnonymousUser()
+        drf_request.data  # parsed once, as the view would
+        return drf_request
+
+    hot = request('10.0.0.1', 1)
+    many = [request('10.%d.%d.%d' % (i >> 16 & 255, i >> 8 & 255, i & 255), i + 1) for i in range(args.clients)]
+    cases = (
+        ('hot client, allowed', {'bid': {'ip': '1000000000/s'}}, lambda i: throttle.allow_request(hot, view)),
+        ('flood, turned away', {'bid': {'ip': '1/d'}}, lambda i: throttle.allow_request(hot, view)),
+        ('distinct clients', {'bid': {'ip': '10/s', 'auction': '500/s'}},
+         lambda i: throttle.allow_request(many[i % len(many)], view)),
+    )
+    print('%-22s %12s %12s' % ('case', 'local', 'shared'))
+    for name, scopes, check in cases:
+        timings = []
+        for shared in (False, True):
+            reset_limiter()
+            with override_settings(RATE_LIMITS={'SCOPES': scopes, 'SHARED': shared, 'MAX_KEYS': args.clients // 2}):
+                timings.append(measure(check, args.requests))
+        print('%-22s %9.2f us %9.2f us' % (name, *timings))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""Measures token refresh throughput against a large simplejwt blacklist
+
+Fills the outstanding token table with the given number of rows, blacklists a
+share of them, then refreshes a valid token through TokenRefreshView with the
+in-memory revocation index disabled (one blacklist query per refresh) and
+enabled. Filler rows store a placeholder instead of the encoded token to keep
+the database small; lookups never read that column.
+
+    python -m benchmarks.token_refresh --outstanding 10000000 --refreshes 5000
+"""
+
+import argparse
+import time
+import uuid
+from datetime import timedelta
+
+from benchmarks.common import benchmark_database, setup_django
+
+INSERT_CHUNK = 100000
+
+
+def seed(outstanding, blacklisted_share):
+    """Inserts the filler tokens with raw executemany and returns a user to refresh for"""
+    from django.contrib.auth.models import User
+    from django.db import connection, transaction
+    from django.utils import timezone
+    from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+    user = User.objects.create_user(username='bench', password='pass')
+    now = timezone.now()
+    expires = now + timedelta(days=1)
+    every = round(1 / blacklisted_share) if blacklisted_share else 0
+    tokens, blacklist = OutstandingToken._meta.db_table, BlacklistedToken._meta.db_table
+    with connection.cursor() as cursor:
+        for start in range(0, outstanding, INSERT_CHUNK):
+            rows = range(start, min(start + INSERT_CHUNK, outstanding))
+            with transaction.atomic():
+                cursor.executemany(
+                    'INSERT INTO {} (user_id, jti, token, created_at, expires_at) VALUES (%s, %s, %s, %s, %s)'.format(tokens),
+                    ((user.id, uuid.uuid4().hex, '-', now, expires) for _ in rows),
+                )
+        if every:
+            cursor.execute(
+                'INSERT INTO {} (token_id, blacklisted_at) SELECT id, %s FROM {} WHERE id %% %s = 0'.format(blacklist, tokens),
+                [now, every],
+            )
+    return user
+
+
+def run(user, refreshes, enabled):
+    """Refreshes one token repeatedly and returns (refreshes per second, blacklist queries per refresh)"""
+    from django.db import connection
+    from django.test import override_settings
+    from rest_framework.test import APIRequestFactory
+    from rest_framework_simplejwt.views import TokenRefreshView
+    from auction.authentication import ClaimsRefreshToken
+    from auction.revocation import get_index, reset_index
+
+    factory = APIRequestFactory()
+    view = TokenRefreshView.as_view()
+    body = {'refresh': str(ClaimsRefreshToken.for_user(user))}
+    with override_settings(TOKEN_REVOCATION_INDEX={'ENABLED': enabled}):
+        reset_index()
+        if enabled:
+            loading = time.perf_counter()
+            get_index()
+            print('  index loaded in %.2fs' % (time.perf_counter() - loading))
+        blacklist_queries = 0
+
+        def count_blacklist_queries(execute, sql, params, many, context):
+            nonlocal blacklist_queries
+            blacklist_queries += 'blacklistedtoken' in sql
+            return execute(sql, params, many, context)
+
+        started = time.perf_counter()
+        with connection.execute_wrapper(count_blacklist_queries):
+            for _ in range(refreshes):
+                assert view(factory.post('/api/token/refresh/', body, format='json')).status_code == 200
+        elapsed = time.perf_counter() - started
+    return refreshes / elapsed, blacklist_queries / refreshes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--outstanding', type=int, default=10000000, help='Outstanding token rows')
+    parser.add_argument('--blacklisted', type=float, default=0.01, help='Share of them blacklisted')
+    parser.add_argument('--refreshes', type=int, default=5000, help='Refreshes per mode')
+    args = parser.parse_args()
+
+    setup_django()
+    with benchmark_database():
+        seeding = time.perf_counter()
+        user = seed(args.outstanding, args.blacklisted)
+        print('seeded %d outstanding tokens in %.1fs' % (args.outstanding, time.perf_counter() - seeding))
+        for enabled in (False, True):
+            rate, queries = run(user, args.refreshes, enabled)
+            print('%-9s %8.1f refreshes/s  %.2f blacklist queries per refresh' % (
+                'index' if enabled else 'database', rate, queries,
+            ))
+
+
+if __name__ == '__main__':
+    main()
@@ -41,6 +41,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'auction.metrics.MetricsMiddleware',
+    'auction.routing.ReadYourWritesMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -52,8 +54,67 @@ MIDDLEWARE = [
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'auction.authentication.ClaimsJWTAuthentication',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'auction.metrics.TimedJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_THROTTLE_CLASSES': [
+        'auction.throttling.TokenBucketThrottle',
+    ],
+}
+
+# Token bucket rate limits of the views naming a throttle_scope (see
+# auction/throttling.py): per scope, the user, ip and auction buckets each hold
+# 'tokens/period' tokens refilled over the period. Set SHARED when several
+# workers share a cache server so the limits hold across them.
+RATE_LIMITS = {
+    'ENABLED': True,
+    'SHARED': False,
+    'MAX_KEYS': 100000,
+    'SCOPES': {
+        'bid': {'user': '10/s', 'ip': '50/s', 'auction': '500/s'},
+        'signup': {'ip': '10/m'},
+        'login': {'ip': '30/m'},
+    },
+}
+
+# POST /api/bid/ and /api/auction/ requests sent with an Idempotency-Key header
+# keep their first response for TTL_SECONDS and replay it to retries; duplicates
+# arriving meanwhile wait up to WAIT_SECONDS for it (see auction/idempotency.py)
+IDEMPOTENCY = {
+    'ENABLED': True,
+    'TTL_SECONDS': 24 * 60 * 60,
+    'LOCK_SECONDS': 30,
+    'WAIT_SECONDS': 5,
+}
+
+# The OpenAPI schema behind /swagger.json, /swagger/ and /redoc/ is generated on
+# first use; builds that run `python manage.py generate_api_schema` set PATH to
+# the file it writes so workers never generate it (see auction/api_docs.py)
+API_SCHEMA = {
+    'PATH': None,
+}
+
+# Per-view request metrics served at /metrics (see auction/metrics.py). Requests
+# slower than SLOW_REQUEST_SECONDS are logged with their queries (None disables
+# the log); set TOKEN to require 'Authorization: Bearer <token>' from scrapers
+REQUEST_METRICS = {
+    'ENABLED': True,
+    'BUCKETS': (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+    'SLOW_REQUEST_SECONDS': 1.0,
+    'SLOW_REQUEST_MAX_QUERIES': 100,
+    'TOKEN': None,
+}
+
+# Build request users from token claims instead of a query per request, falling
+# back to a per-process LRU of User rows (see auction/authentication.py). Other
+# processes' staff or active flag changes are seen within USER_CACHE_TTL seconds
+JWT_CLAIMS_AUTH = {
+    'ENABLED': True,
+    'USER_CACHE_SIZE': 10000,
+    'USER_CACHE_TTL': 60,
 }
 
 # JWT Settings
@@ -78,6 +139,18 @@ SIMPLE_JWT = {
     'SLIDING_TOKEN_REFRESH_EXP_CLAIM': 'refresh_exp',
     'SLIDING_TOKEN_LIFETIME': timedelta(minutes=5),
     'SLIDING_TOKEN_REFRESH_LIFETIME': timedelta(days=1),
+    'TOKEN_OBTAIN_SERIALIZER': 'auction.authentication.ClaimsTokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'auction.authentication.ClaimsTokenRefreshSerializer',
+}
+
+# In-memory index of revoked refresh token JTIs (see auction/revocation.py); other
+# processes' revocations are polled for every REFRESH_SECONDS, or seen at once
+# when the workers share the default cache
+TOKEN_REVOCATION_INDEX = {
+    'ENABLED': True,
+    'FALSE_POSITIVE_RATE': 0.01,
+    'MIN_CAPACITY': 100000,
+    'REFRESH_SECONDS': 5,
 }
 
 ROOT_URLCONF = 'simple_auction.urls'
@@ -106,9 +179,136 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # Take the write lock when a transaction begins so concurrent bids
+            # queue on the busy timeout instead of failing on lock upgrade
+            'transaction_mode': 'IMMEDIATE',
+        },
+        # Keep each thread's connection (and its pragmas and page cache) across requests
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'TEST': {
+            # File-backed so tests can exercise concurrent connections
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
+    },
+    # Local read replica: a second SQLite file refreshed from the primary with
+    # `python manage.py sync_replicas`. Unused until listed in DATABASE_ROUTING.
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'replica.sqlite3',
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'TEST': {
+            'NAME': BASE_DIR / 'test_replica.sqlite3',
+        },
+    },
+}
+
+DATABASE_ROUTERS = ['auction.routing.PrimaryReplicaRouter']
+
+# Aliases serving request reads of the replicated apps' models, and how long a
+# user's reads stay on the primary after they write (see auction/routing.py).
+# The sticky marks are kept in the default cache, which must be shared by the
+# workers when there are several
+DATABASE_ROUTING = {
+    'REPLICAS': [],
+    'APPS': ['auction'],
+    'STICKY_SECONDS': 5,
+}
+
+# Pragmas applied to every new SQLite connection, and whether this process
+# serializes its write transactions on one lock (see auction/sqlite.py)
+SQLITE_PROFILE = {
+    'ENABLED': True,
+    'BUSY_TIMEOUT_MS': 30000,
+    'JOURNAL_MODE': 'WAL',
+    'SYNCHRONOUS': 'NORMAL',
+    'MMAP_SIZE': 256 * 1024 * 1024,
+    'CACHE_SIZE_KIB': 64000,
+    'SERIALIZE_WRITES': True,
+}
+
+# Full-text search ranks at most this many of the newest matching auctions,
+# which bounds the cost of very common words (see auction/search.py)
+AUCTION_SEARCH = {
+    'MAX_CANDIDATES': 2000,
+}
+
+# GET /api/auction/<id>/bids/?top=N serves up to SIZE of an auction's highest
+# bids from memory, keeping the boards of at most MAX_AUCTIONS auctions read
+# lately and rebuilding evicted ones from the database (see auction/leaderboard.py)
+BID_LEADERBOARD = {
+    'SIZE': 50,
+    'MAX_AUCTIONS': 1000,
+}
+
+# Auction deletions remove bids in chunks of CHUNK_SIZE, one short transaction
+# each; beyond INLINE_MAX_BIDS bids they run as background jobs, on a thread of
+# the web process when RUN_IN_PROCESS and otherwise (or after a restart) through
+# `python manage.py run_deletion_jobs` (see auction/deletion.py)
+DELETION_JOBS = {
+    'CHUNK_SIZE': 1000,
+    'PAUSE_SECONDS': 0,
+    'INLINE_MAX_BIDS': 10000,
+    'MAX_BATCH_IDS': 1000,
+    'RUN_IN_PROCESS': True,
+    'STALE_SECONDS': 60,
+}
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'simple-auction',
+        # Room for one live listing entry per auction: past the default of 300,
+        # culling drops entries and the listing's counters (and so its ETag)
+        'OPTIONS': {'MAX_ENTRIES': 10000},
     }
 }
 
+# Seconds the public live auction listing is served from cache before a refresh
+LIVE_AUCTIONS_CACHE_TIMEOUT = 60
+
+# Opt-in group commit for bid surges: bids are queued and decided in micro-batches,
+# each committed with one transaction (see auction/group_commit.py)
+BID_GROUP_COMMIT = {
+    'ENABLED': False,
+    'MAX_BATCH_SIZE': 200,
+    'MAX_WAIT_MS': 2,
+}
+
+# Amount a registered maximum (proxy) bid raises the price by when outbidding
+PROXY_BID_INCREMENT = '1.00'
+
+# Server-sent bid streams (see auction/events.py): events a slow subscriber may
+# fall behind before its oldest are dropped, and the idle keep-alive interval
+BID_STREAM = {
+    'QUEUE_SIZE': 16,
+    'HEARTBEAT_SECONDS': 15,
+}
+
+# Password hashing runs on a bounded thread pool (see auction/hashers.py). Logins
+# and signups beyond WORKERS + MAX_QUEUE concurrent hashes get a 503 with
+# Retry-After. Changing ITERATIONS rehashes each password on its next login.
+PASSWORD_HASHERS = [
+    'auction.hashers.PooledPBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+
+PASSWORD_HASHING = {
+    'ENABLED': True,
+    'WORKERS': 2,
+    'MAX_QUEUE': 32,
+    'RETRY_AFTER_SECONDS': 1,
+    'ITERATIONS': 1000000,
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -1,28 +1,13 @@
 from django.contrib import admin
 from django.urls import path, include
-from rest_framework import permissions
-from drf_yasg.views import get_schema_view
-from drf_yasg import openapi
-
-schema_view = get_schema_view(
-    openapi.Info(
-        title="Auction API",
-        default_version='v1',
-        description="API for a simple auction system",
-        terms_of_service="https://www.google.com/policies/terms/",
-        contact=openapi.Contact(email="contact@auction.local"),
-        license=openapi.License(name="BSD License"),
-    ),
-    public=True,
-    permission_classes=(permissions.AllowAny,),
-)
+from auction import api_docs
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include('auction.urls')),
     
-    # Swagger documentation URLs
-    path('swagger<format>/', schema_view.without_ui(cache_timeout=0), name='schema-json'),
-    path('swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
-    path('redoc/', schema_view.with_ui('redoc', cache_timeout=0), name='schema-redoc'),
+    # Swagger documentation URLs, importing drf_yasg on first use (see auction/api_docs.py)
+    path('swagger<format>/', api_docs.schema_view, name='schema-json'),
+    path('swagger/', api_docs.swagger_ui_view, name='schema-swagger-ui'),
+    path('redoc/', api_docs.redoc_view, name='schema-redoc'),
 ]
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'simple_auction.settings')
 
 application = get_wsgi_application()
+
+# Proxy bid books are built from the database when the worker starts
+from auction.proxy import build_engine  # noqa: E402
+
+build_engine()